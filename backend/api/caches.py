@@ -0,0 +1,52 @@
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_version(name):
+    """Текущая версия набора данных, входящая в ключи кеша."""
+    return cache.get_or_set(f'version:{name}', time.time_ns, None)
+
+
+def get_versions(*names):
+    """Версии нескольких наборов данных за одно обращение к кешу."""
+    keys = [f'version:{name}' for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, time.time_ns, None)
+    return [versions[key] for key in keys]
+
+
+def get_modified(name):
+    """Время (unix) последнего изменения набора данных name."""
+    return cache.get_or_set(f'modified:{name}', time.time, None)
+
+
+def bump_version(name):
+    """Делает устаревшими все записи кеша, построенные на версии name.
+
+    Внутри транзакции версия меняется только после коммита: иначе
+    параллельный запрос успел бы прочитать старые строки и сохранить
+    их в кеш под новой версией.
+    """
+    transaction.on_commit(partial(write_version, name))
+
+
+def write_version(name):
+    try:
+        cache.incr(f'version:{name}')
+    except ValueError:
+        cache.set(f'version:{name}', time.time_ns(), None)
+    cache.set(f'modified:{name}', time.time(), None)
+
+
+def cache_stream(key, chunks, timeout=None):
+    """Отдаёт чанки дальше и кладёт собранный результат в кеш."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(parts), timeout)
@@ -1,5 +1,16 @@
 from django_filters import rest_framework
+from rest_framework.exceptions import ValidationError
+
+from recipes.inverted_index import filter_ids, recipe_index
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+# Параметры, которые отвечает инвертированный индекс продуктов.
+INGREDIENT_FILTERS = (
+    'ingredients_all', 'ingredients_any', 'ingredients_none',
+    'ingredients_have', 'missing',
+)
+MAX_FILTER_INGREDIENTS = 50
 
 
 class IngredientFilter(rest_framework.FilterSet):
@@ -12,6 +23,10 @@ class IngredientFilter(rest_framework.FilterSet):
         fields = ('name',)
 
 
+class NumberInFilter(rest_framework.BaseInFilter, rest_framework.NumberFilter):
+    pass
+
+
 class RecipeFilter(rest_framework.FilterSet):
     author = rest_framework.CharFilter(
         field_name='author__id',
@@ -32,19 +47,87 @@ class RecipeFilter(rest_framework.FilterSet):
         method='filter_is_favorited',
         label='В избранном'
     )
+    search = rest_framework.CharFilter(
+        method='filter_search',
+        label='Поиск по названию и описанию'
+    )
+    ingredients_all = NumberInFilter(
+        method='filter_by_index',
+        label='Есть все эти продукты (id через запятую)'
+    )
+    ingredients_any = NumberInFilter(
+        method='filter_by_index',
+        label='Есть хотя бы один из продуктов'
+    )
+    ingredients_none = NumberInFilter(
+        method='filter_by_index',
+        label='Нет ни одного из продуктов'
+    )
+    ingredients_have = NumberInFilter(
+        method='filter_by_index',
+        label='Продукты в наличии'
+    )
+    missing = rest_framework.NumberFilter(
+        method='filter_by_index',
+        min_value=0,
+        label='Скольких продуктов из наличия может не хватать'
+    )
+    ordering = rest_framework.ChoiceFilter(
+        choices=(('trending', 'Сначала популярные'),),
+        method='filter_ordering',
+        label='Сортировка'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
+        fields = [
+            'author', 'tags', 'is_in_shopping_cart', 'is_favorited', 'search',
+            *INGREDIENT_FILTERS, 'ordering',
+        ]
+
+    def filter_queryset(self, recipes):
+        """Фильтры по продуктам применяются разом, одним запросом к индексу."""
+        recipes = super().filter_queryset(recipes)
+        data = self.form.cleaned_data
+        if not any(data.get(name) for name in INGREDIENT_FILTERS[:4]):
+            return recipes
+        lists = {}
+        for name in INGREDIENT_FILTERS[:4]:
+            lists[name] = [int(pk) for pk in data.get(name) or ()]
+            if len(lists[name]) > MAX_FILTER_INGREDIENTS:
+                raise ValidationError({name: (
+                    f'Не больше {MAX_FILTER_INGREDIENTS} продуктов.'
+                )})
+        ids, exclude = recipe_index.search(
+            all_of=lists['ingredients_all'],
+            any_of=lists['ingredients_any'],
+            none_of=lists['ingredients_none'],
+            have=lists['ingredients_have'] if data.get(
+                'ingredients_have'
+            ) else None,
+            missing=int(data.get('missing') or 0),
+        )
+        return filter_ids(recipes, ids, exclude)
+
+    def filter_by_index(self, recipes, name, value):
+        return recipes
 
     def filter_is_in_shopping_cart(self, recipes, name, value):
         user = self.request.user
         if user.is_authenticated and value:
-            return recipes.filter(shopping_carts__user=user)
+            return recipes.filter(is_in_shopping_cart=True)
         return recipes
 
     def filter_is_favorited(self, recipes, name, value):
         user = self.request.user
         if user.is_authenticated and value:
-            return recipes.filter(favourites__user=user)
+            return recipes.filter(is_favorited=True)
         return recipes
+
+    def filter_search(self, recipes, name, value):
+        return search_recipes(recipes, value)
+
+    def filter_ordering(self, recipes, name, value):
+        # Счёт пересчитывает refresh_trending; сортировку держит индекс
+        # recipe_trending_idx.
+        return recipes.order_by('-trending_score', *Recipe._meta.ordering)
@@ -0,0 +1,65 @@
+import threading
+from bisect import bisect_left
+
+from api.caches import get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный индекс продуктов в памяти процесса для автодополнения.
+
+    Строится лениво при первом запросе и перестраивается, когда меняется
+    версия ingredients (её сбрасывают сигналы сохранения и удаления
+    Ingredient). В установившемся режиме поиск не обращается к базе.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.entries = ([], [])
+
+    def get_entries(self):
+        version = get_version('ingredients')
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.build(version)
+        return self.entries
+
+    def build(self, version):
+        ingredients = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit
+            in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        self.entries = (
+            [key for key, *_ in ingredients],
+            [
+                {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+                for _, pk, name, measurement_unit in ingredients
+            ],
+        )
+        self.version = version
+
+    def search(self, query):
+        """Сначала совпадения по началу названия, затем по вхождению.
+
+        Вхождения ранжируются по позиции найденной подстроки.
+        """
+        keys, items = self.get_entries()
+        query = query.strip().lower()
+        if not query:
+            return items
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        contains = sorted(
+            (position, index)
+            for index, key in enumerate(keys)
+            if (position := key.find(query)) > 0
+        )
+        return items[start:end] + [items[index] for _, index in contains]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,76 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.caches import get_modified, get_version
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы и кеш ответа для справочных данных.
+
+    ETag и Last-Modified строятся по версии version_name, которую
+    сбрасывают сигналы при изменении модели; ETag зависит и от
+    выбранного по Accept формата (ответ помечен Vary: Accept). Ответ
+    304 отдаётся до обращения к базе и сериализации, а данные ответа
+    хранятся в кеше до следующей смены версии, но не дольше
+    REFERENCE_DATA_CACHE_TIMEOUT: ключ есть у каждого URL, и записи
+    старых версий должны истекать.
+    """
+
+    version_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ).data
+        )
+
+    def conditional_response(self, get_data):
+        request = self.request
+        version = get_version(self.version_name)
+        modified = int(get_modified(self.version_name))
+        # JSON и браузерный API — разные представления одного URL.
+        digest = hashlib.sha1(
+            f'{request.get_full_path()} {request.accepted_media_type}'.encode()
+        ).hexdigest()[:16]
+        headers = {
+            'ETag': f'"{version}-{digest}"',
+            'Vary': 'Accept',
+            'Last-Modified': http_date(modified),
+            'Cache-Control': (
+                f'public, max-age={settings.REFERENCE_DATA_MAX_AGE}'
+            ),
+        }
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            not_modified = (
+                '*' in parse_etags(if_none_match)
+                or headers['ETag'] in parse_etags(if_none_match)
+            )
+        else:
+            since = parse_http_date_safe(
+                request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+            )
+            not_modified = since is not None and modified <= since
+        if not_modified:
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        key = f'response:{self.version_name}:{version}:{digest}'
+        data = cache.get(key)
+        if data is None:
+            data = get_data()
+            cache.set(key, data, settings.REFERENCE_DATA_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
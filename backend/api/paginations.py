@@ -1,6 +1,269 @@
+import base64
+import binascii
+import json
+from functools import partial
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.caches import get_versions
+from recipes.feed import feed_recipes
+
+
+def estimate_count(model):
+    """Число строк таблицы по статистике планировщика PostgreSQL.
+
+    None, если оценки нет или таблица слишком мала, чтобы ей доверять.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_ESTIMATE_MIN_ROWS:
+        return None
+    return int(row[0])
+
+
+class CountPaginator(Paginator):
+    """Paginator, которому число объектов считает пагинация DRF."""
+
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list)
 
 
-class LimitPagination(PageNumberPagination):
+class KeysetPagination(PageNumberPagination):
+    """Выдача по ключу сортировки без COUNT(*) и OFFSET.
+
+    Страница продолжается от позиции, зашитой в курсор (параметр cursor,
+    для первой страницы пустой), поэтому время ответа не зависит от
+    глубины. Подкласс может вернуть False из use_cursor(), и тогда
+    выдача идёт по номерам страниц.
+    """
+
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    cursor_mode = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        values, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param, '')
+        )
+        size = self.get_page_size(request)
+        page = self.get_window(queryset, values, reverse, size + 1)
+        has_more = len(page) > size
+        page = page[:size]
+        if reverse:
+            page.reverse()
+        has_next = values is not None if reverse else has_more
+        has_previous = has_more if reverse else values is not None
+        self.next_link = self.previous_link = None
+        if page and has_next:
+            self.next_link = self.cursor_link(page[-1], False)
+        if page and has_previous:
+            self.previous_link = self.cursor_link(page[0], True)
+        return page
+
+    def use_cursor(self, request):
+        return True
+
+    def get_window(self, queryset, values, reverse, size):
+        """Первые size объектов строго после позиции values."""
+        queryset = queryset.order_by(*(
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.ordering
+        ))
+        if values is not None:
+            queryset = queryset.filter(self.position_filter(values, reverse))
+        return list(queryset[:size])
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'results': data,
+        })
+
+    def get_ordering(self, queryset):
+        """Поля сортировки с направлением; pk замыкает ключ.
+
+        Сортировка по аннотациям (например, релевантности поиска) в курсор
+        не попадает: выдача идёт по остальным полям модели.
+        """
+        pk = queryset.model._meta.pk.name
+        ordering = [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in (
+                queryset.query.order_by or queryset.model._meta.ordering
+            )
+        ]
+        ordering = [
+            (pk if name == 'pk' else name, descending)
+            for name, descending in ordering
+            if name == 'pk' or self.is_field(queryset.model, name)
+        ]
+        if pk not in (name for name, _ in ordering):
+            ordering.append((pk, False))
+        return ordering
+
+    @staticmethod
+    def is_field(model, name):
+        try:
+            model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def position_filter(self, values, reverse):
+        """Условие «строго после позиции» для составного ключа."""
+        condition, equal = Q(), Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            reverse, values = json.loads(base64.urlsafe_b64decode(cursor))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ], bool(reverse)
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_link(self, obj, reverse):
+        values = [
+            self.model._meta.get_field(name).value_to_string(obj)
+            for name, _ in self.ordering
+        ]
+        cursor = base64.urlsafe_b64encode(
+            json.dumps([int(reverse), values]).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+
+class LimitPagination(KeysetPagination):
+    """Постраничная выдача с параметром limit.
+
+    Если view объявляет get_count_versions(), число объектов берётся из
+    кеша по view, набору фильтров запроса и версиям данных, от которых
+    оно зависит. Кеш и версии общие для всех процессов (см. CACHES), а
+    версии сбрасываются после коммита изменений, так что закешированное
+    число не переживает изменения данных. Если view включает
+    count_estimate, а в запросе нет ни фильтров, ни условий, на
+    PostgreSQL используется оценка планировщика по всей таблице, и тогда
+    в ответе count_exact = false.
+
+    С параметром cursor выдача идёт по ключу, как в KeysetPagination.
+    """
+
+    count_exact = True
+
+    def use_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request, self.view = request, view
+        self.django_paginator_class = partial(
+            CountPaginator, counter=self.get_count
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_count(self, queryset):
+        get_count_versions = getattr(self.view, 'get_count_versions', None)
+        versions = get_count_versions() if get_count_versions else None
+        if versions is None:
+            return queryset.count()
+        filters = sorted(
+            (name, sorted(values))
+            for name, values in self.request.query_params.lists()
+            if name not in (
+                self.page_query_param,
+                self.page_size_query_param,
+                self.cursor_query_param,
+            )
+        )
+        key = 'count:{}.{}:{}:{}:{}'.format(
+            type(self.view).__name__,
+            getattr(self.view, 'action', None),
+            queryset.model._meta.label_lower,
+            ':'.join(
+                f'{name}={version}'
+                for name, version in zip(versions, get_versions(*versions))
+            ),
+            sha1(urlencode(filters, doseq=True).encode()).hexdigest(),
+        )
+        cached = cache.get(key)
+        if cached is None:
+            estimate = None
+            if getattr(self.view, 'count_estimate', False) and not (
+                filters or queryset.query.where
+            ):
+                estimate = estimate_count(queryset.model)
+            cached = (
+                (queryset.count(), True) if estimate is None
+                else (estimate, False)
+            )
+            cache.set(key, cached, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        count, self.count_exact = cached
+        return count
+
+
+class FeedPagination(KeysetPagination):
+    """Лента подписок: всегда по курсору, окно строит feed_recipes."""
+
+    max_page_size = 100
+
+    def get_window(self, queryset, values, reverse, size):
+        return list(feed_recipes(
+            queryset, self.request.user,
+            position=values, reverse=reverse, limit=size,
+        ))
@@ -0,0 +1,133 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+from api.utils import generate_shopping_list
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер файла со списком покупок.
+
+    stream() отдаёт файл кусками по мере чтения строк из базы; PDF
+    отдаётся одним куском (см. ShoppingListPdfRenderer). Ответы с
+    ошибками рендерит JSONRenderer (см. RecipeViewSet.finalize_response).
+    """
+
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, ingredients, recipes):
+        raise NotImplementedError
+
+
+class ShoppingListTxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients, recipes):
+        for line in generate_shopping_list(ingredients, recipes):
+            yield f'{line}\n'.encode()
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients, recipes):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Продукт', 'Единица измерения', 'Количество')
+        ).encode()
+        for item in ingredients.iterator():
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['total_amount'],
+            )).encode()
+
+
+class ShoppingListPdfRenderer(ShoppingListRenderer):
+    """PDF собирается в памяти целиком и отдаётся одним куском.
+
+    reportlab пишет документ только в save(): таблица объектов и
+    ссылки на страницы известны лишь в конце. Строки списка при этом
+    всё равно читаются из базы итератором.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+
+    def stream(self, ingredients, recipes):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        height = A4[1]
+        margin = 50
+        line_height = self.font_size * 1.5
+        text = None
+        for line in generate_shopping_list(ingredients, recipes):
+            if text is None or text.getY() < margin:
+                if text is not None:
+                    pdf.drawText(text)
+                    pdf.showPage()
+                text = pdf.beginText(margin, height - margin)
+                text.setFont(self.font_name, self.font_size, line_height)
+            text.textLine(line)
+        pdf.drawText(text)
+        pdf.save()
+        yield buffer.getvalue()
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Выбор формата списка покупок.
+
+    Формат из ?format= важнее заголовка Accept. Если Accept не подходит
+    ни к одному формату (например, клиент запросил application/json),
+    отдаётся txt, как и до появления форматов. Неизвестный ?format=
+    даёт 404.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            file_format = format_suffix or request.query_params.get(
+                self.settings.URL_FORMAT_OVERRIDE
+            )
+            if file_format:
+                renderers = self.filter_renderers(renderers, file_format)
+            return renderers[0], renderers[0].media_type
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTxtRenderer,
+    ShoppingListCsvRenderer,
+    ShoppingListPdfRenderer,
+)
@@ -1,26 +1,55 @@
 from collections import Counter
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.utils import get_recipes_limit
 from recipes.models import (
     Tag,
     Ingredient,
+    Job,
     RecipeIngredient,
     Recipe,
 )
-from recipes.constans import MIN_AMOUNT, MIN_COOKING_TIME
+from recipes.inverted_index import recipe_index
+from recipes.constans import MAX_BULK_RECIPES, MIN_AMOUNT, MIN_COOKING_TIME
+from recipes.thumbnails import thumbnail_urls
 
 User = get_user_model()
 
 
+class ThumbnailsField(serializers.Field):
+    """Ссылки на уменьшенные копии картинки: {размер: {формат: url}}."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        urls = thumbnail_urls(instance, self.image_field)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {
+            size: {
+                extension: request.build_absolute_uri(url)
+                for extension, url in formats.items()
+            }
+            for size, formats in urls.items()
+        }
+
+
 class UserSerializer(DjoserUserSerializer):
     avatar = Base64ImageField(
         required=False,
         allow_null=True
     )
+    avatar_thumbnails = ThumbnailsField('avatar')
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed'
     )
@@ -32,13 +61,16 @@ class UserSerializer(DjoserUserSerializer):
             if field != 'password'
         ) + (
             'avatar',
+            'avatar_thumbnails',
             'is_subscribed',
         )
 
-    def get_is_subscribed(self, followers):
+    def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return user.is_authenticated and user.followers.filter(
-            follower=followers
+            author=author
         ).exists()
 
 
@@ -54,11 +86,38 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, проверяемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        keys = []
+        for pk in data:
+            if isinstance(pk, bool) or not str(pk).isdigit():
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+            keys.append(int(pk))
+        objects = child.get_queryset().in_bulk(keys)
+        for pk in keys:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in keys]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        child = cls(queryset=kwargs.pop('queryset'))
+        return BulkManyRelatedField(child_relation=child, **kwargs)
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    # Существование продуктов проверяет одним запросом
+    # PostRecipeSerializer.validate_ingredients.
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -73,9 +132,19 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class UserRecipesSerializer(serializers.ModelSerializer):
+    image_thumbnails = ThumbnailsField('image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnails', 'cooking_time')
+        read_only_fields = fields
+
+
+class SimilarRecipeSerializer(UserRecipesSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(UserRecipesSerializer.Meta):
+        fields = (*UserRecipesSerializer.Meta.fields, 'similarity')
         read_only_fields = fields
 
 
@@ -93,24 +162,35 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart'
     )
+    image_thumbnails = ThumbnailsField('image')
 
     class Meta:
         model = Recipe
-        exclude = ('created_at',)
+        exclude = (
+            'created_at',
+            'favourites_count',
+            'short_link_hits',
+            'image_thumbnailed',
+            'trending_score',
+        )
 
     def get_is_in_favorite(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.favourites.filter(recipe=obj).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.shopping_carts.filter(recipe=obj).exists())
 
 
 class PostRecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         required=True,
         many=True
@@ -145,6 +225,21 @@ class PostRecipeSerializer(serializers.ModelSerializer):
                 f'Обнаружены дублирующиеся объекты: {duplicates}'
             )
 
+    def validate_ingredients(self, ingredients):
+        ids = [ingredient['ingredient_id'] for ingredient in ingredients]
+        existing = set(
+            Ingredient.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        if len(existing) < len(set(ids)):
+            raise serializers.ValidationError([
+                {} if pk in existing else {'id': [
+                    f'Недопустимый первичный ключ "{pk}" - '
+                    'объект не существует.'
+                ]}
+                for pk in ids
+            ])
+        return ingredients
+
     def validate(self, attrs):
         tags = attrs.get('tags')
         ingredients = attrs.get('recipe_ingredients')
@@ -162,7 +257,7 @@ class PostRecipeSerializer(serializers.ModelSerializer):
                 'Набор ingredients не может быть пустым'
             )
         ingredients_ids = [
-            ingredient.get('ingredient').id for ingredient in ingredients
+            ingredient['ingredient_id'] for ingredient in ingredients
         ]
         self.dublicate_ingredients_tags(ingredients_ids)
         self.dublicate_ingredients_tags(tags)
@@ -170,14 +265,42 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         return attrs
 
     def recipe_ingredients_create(self, recipe, ingredients_data):
-        RecipeIngredient.objects.bulk_create(
+        rows = RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
                 **ingredient_data
             )
             for ingredient_data in ingredients_data
         )
+        # bulk_create не шлёт сигналов, индекс продуктов обновляется здесь.
+        recipe_index.publish(
+            (recipe.pk, row.ingredient_id, True) for row in rows
+        )
 
+    def recipe_ingredients_update(self, recipe, ingredients_data):
+        """Меняет только строки продуктов, которые отличаются."""
+        amounts = {
+            ingredient['ingredient_id']: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        changed, removed = [], []
+        for row in RecipeIngredient.objects.filter(recipe=recipe):
+            amount = amounts.pop(row.ingredient_id, None)
+            if amount is None:
+                removed.append(row.pk)
+            elif amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.recipe_ingredients_create(recipe, [
+            {'ingredient_id': pk, 'amount': amount}
+            for pk, amount in amounts.items()
+        ])
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients')
         tags_data = validated_data.pop('tags')
@@ -186,12 +309,14 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         self.recipe_ingredients_create(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        # Сохранение рецепта в конце сбрасывает его кеш: bulk-операции
+        # над продуктами сигналов не шлют.
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
         instance.tags.set(tags_data)
-        instance.recipe_ingredients.all().delete()
-        self.recipe_ingredients_create(instance, ingredients_data)
+        self.recipe_ingredients_update(instance, ingredients_data)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
@@ -202,10 +327,7 @@ class PostRecipeSerializer(serializers.ModelSerializer):
 
 
 class UserSubscriberSerializer(UserSerializer):
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = serializers.SerializerMethodField()
 
     class Meta:
@@ -217,14 +339,21 @@ class UserSubscriberSerializer(UserSerializer):
         )
 
     def get_recipes(self, user):
-        return UserRecipesSerializer(
-            user.recipes.all()[
-                :int(self.context.get('request').GET.get(
-                    'recipes_limit', 10 ** 10
-                ))
-            ],
-            many=True
-        ).data
+        if hasattr(user, 'latest_recipes'):
+            recipes = user.latest_recipes
+        else:
+            recipes = user.recipes.all()[
+                :get_recipes_limit(self.context.get('request'))
+            ]
+        return UserRecipesSerializer(recipes, many=True).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -233,3 +362,24 @@ class AvatarSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('avatar',)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'name', 'status', 'attempts', 'result', 'error',
+            'created_at', 'updated_at',
+        )
+        read_only_fields = fields
+
+    def to_representation(self, job):
+        data = super().to_representation(job)
+        request = self.context.get('request')
+        if request and isinstance(data['result'], dict) and (
+            'file' in data['result']
+        ):
+            data['result']['url'] = request.build_absolute_uri(
+                reverse('api:jobs-download', args=[job.pk])
+            )
+        return data
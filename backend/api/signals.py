@@ -0,0 +1,108 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save
+)
+from django.dispatch import receiver
+
+from api.caches import bump_version
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscription,
+    Tag,
+    User,
+)
+from recipes.thumbnails import thumbnails_ready
+
+# Поля автора, которые выводятся внутри рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version('tags')
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    bump_version(f'recipe:{instance.pk}')
+    bump_version('recipes')
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_ingredients(instance, **kwargs):
+    bump_version(f'recipe:{instance.recipe_id}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = pk_set or () if reverse else (instance.pk,)
+    for recipe_id in recipe_ids:
+        bump_version(f'recipe:{recipe_id}')
+    bump_version('recipes')
+
+
+@receiver([post_save, post_delete], sender=Favourite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_user_lists(instance, **kwargs):
+    bump_version(f'lists:{instance.user_id}')
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscriptions(instance, **kwargs):
+    bump_version(f'subscriptions:{instance.follower_id}')
+
+
+def author_fields(instance):
+    """Загруженные значения полей автора; отложенные поля пропускаются."""
+    return {
+        name: str(instance.__dict__[name] or '')
+        for name in AUTHOR_FIELDS if name in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(instance, **kwargs):
+    instance._author_fields = author_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(instance, created, update_fields=None, **kwargs):
+    """Сбрасывает версию автора, только если изменились его поля.
+
+    При сохранении без update_fields поля сравниваются со значениями
+    при загрузке; отложенное поле считается изменённым.
+    """
+    fields, instance._author_fields = (
+        instance._author_fields, author_fields(instance)
+    )
+    if created:
+        return
+    if update_fields is None:
+        changed = (
+            len(fields) < len(AUTHOR_FIELDS)
+            or fields != instance._author_fields
+        )
+    else:
+        changed = AUTHOR_FIELDS.intersection(update_fields)
+    if changed:
+        bump_version(f'user:{instance.pk}')
+
+
+@receiver(thumbnails_ready, sender=Recipe)
+def invalidate_recipe_thumbnails(pk, **kwargs):
+    bump_version(f'recipe:{pk}')
+
+
+@receiver(thumbnails_ready, sender=User)
+def invalidate_author_thumbnails(pk, **kwargs):
+    bump_version(f'user:{pk}')
@@ -0,0 +1,32 @@
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+
+from api.renderers import SHOPPING_LIST_RENDERERS
+from api.utils import shopping_list_ingredients, shopping_list_recipes
+from recipes.jobs import task
+from recipes.storage import private_storage
+
+User = get_user_model()
+
+
+@task
+def render_shopping_list(user_id, file_format):
+    """Собирает список покупок в закрытый файл.
+
+    Файл отдаёт только /api/jobs/<id>/download/ владельцу задачи, а
+    удаляется он вместе с задачей.
+    """
+    user = User.objects.get(pk=user_id)
+    renderer = next(
+        renderer for renderer in SHOPPING_LIST_RENDERERS
+        if renderer.format == file_format
+    )()
+    name = private_storage.save(
+        f'shopping_lists/{uuid4().hex}.{file_format}',
+        ContentFile(b''.join(renderer.stream(
+            shopping_list_ingredients(user), shopping_list_recipes(user)
+        )))
+    )
+    return {'file': name, 'filename': f'{renderer.filename}.{file_format}'}
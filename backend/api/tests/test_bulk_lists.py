@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.constans import MAX_BULK_RECIPES
+from recipes.models import Favourite, Recipe, ShoppingCart, User
+
+
+class BulkListsTests(APITestCase):
+    """Пакетное добавление и удаление в избранное и корзину."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com'
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=cls.user,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                image_thumbnailed='recipes/image/recipe.png',
+            )
+            for pk in range(1, 9)
+        )
+        Favourite.objects.create(user=cls.user, recipe_id=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, url, recipes):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                url, {'recipes': recipes}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(item['id'], item['status']) for item in response.data[
+            'results'
+        ]]
+
+    def favourites_counts(self):
+        return dict(Recipe.objects.values_list('pk', 'favourites_count'))
+
+    def test_favorite(self):
+        self.assertEqual(
+            self.send('post', '/api/recipes/favorite/', [1, 2, 3, 2, 99]),
+            [(1, 'exists'), (2, 'added'), (3, 'added'), (99, 'not_found')]
+        )
+        counts = self.favourites_counts()
+        self.assertEqual((counts[1], counts[2], counts[3]), (1, 1, 1))
+        self.assertEqual(
+            self.send('delete', '/api/recipes/favorite/', [1, 2, 4, 99]),
+            [(1, 'removed'), (2, 'removed'), (4, 'absent'), (99, 'not_found')]
+        )
+        self.assertEqual(
+            set(Favourite.objects.values_list('recipe_id', flat=True)), {3}
+        )
+        counts = self.favourites_counts()
+        self.assertEqual((counts[1], counts[2], counts[3]), (0, 0, 1))
+
+    def test_shopping_cart_visible_in_list(self):
+        response = self.client.get('/api/recipes/?is_in_shopping_cart=1')
+        self.assertEqual(response.data['count'], 0)
+        # bulk_create сигналов не шлёт: версию списков сбрасывает view.
+        self.send('post', '/api/recipes/shopping_cart/', [5, 6])
+        response = self.client.get('/api/recipes/?is_in_shopping_cart=1')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            {recipe['id'] for recipe in response.data['results']}, {5, 6}
+        )
+        self.assertEqual(ShoppingCart.objects.count(), 2)
+
+    def test_queries_do_not_grow(self):
+        counts = []
+        for ids in ([2], [3, 4, 5, 6, 7, 8]):
+            with CaptureQueriesContext(connection) as queries:
+                self.send('post', '/api/recipes/favorite/', ids)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid(self):
+        for recipes in ([], ['x'], [0], list(range(1, MAX_BULK_RECIPES + 2))):
+            response = self.client.post(
+                '/api/recipes/favorite/', {'recipes': recipes}, format='json'
+            )
+            self.assertEqual(response.status_code, 400, recipes)
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': [1]}, format='json'
+        )
+        self.assertEqual(response.status_code, 401)
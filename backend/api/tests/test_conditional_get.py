@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+
+from recipes.models import Tag
+
+
+class ConditionalGetTests(APITestCase):
+    """ETag, Last-Modified и кеш ответов справочников."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_etag(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Vary'], 'Accept')
+        self.assertIn('max-age', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # У другого URL и другого формата свой ETag.
+        for url, headers in (
+            (f'/api/tags/{self.tag.pk}/', {}),
+            ('/api/tags/', {'HTTP_ACCEPT': 'text/html'}),
+        ):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=etag, **headers
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_change_resets_etag(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', slug='lunch')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_if_modified_since(self):
+        modified = self.client.get('/api/tags/')['Last-Modified']
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_MODIFIED_SINCE=modified
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_MODIFIED_SINCE=http_date(0)
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_response(self):
+        self.client.get('/api/tags/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.data[0]['slug'], 'breakfast')
@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, Subscription, Tag, User
+
+
+class CachedCountTests(APITestCase):
+    """Кеш и оценка числа объектов в постраничной выдаче."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        Recipe.objects.bulk_create(
+            cls.recipe(pk) for pk in range(1, 6)
+        )
+        cls.tag.recipes.set([1, 2])
+
+    @classmethod
+    def recipe(cls, pk):
+        return Recipe(
+            id=pk,
+            name=f'Рецепт {pk}',
+            author=cls.author,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def count(self, url='/api/recipes/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['count'], response.data.get('count_exact')
+
+    def test_cached_until_version_changes(self):
+        self.assertEqual(self.count(), (5, True))
+        # bulk_create сигналов не шлёт: число остаётся закешированным.
+        Recipe.objects.bulk_create([self.recipe(6)])
+        self.assertEqual(self.count(), (5, True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe(7).save()
+        self.assertEqual(self.count(), (7, True))
+
+    def test_filters_in_key(self):
+        self.assertEqual(self.count('/api/recipes/?tags=breakfast'), (2, True))
+        self.assertEqual(self.count('/api/recipes/'), (5, True))
+        self.assertEqual(
+            self.count('/api/recipes/?tags=breakfast&limit=1'), (2, True)
+        )
+
+    @patch('api.paginations.estimate_count', return_value=1000)
+    def test_estimate_only_without_filters(self, estimate):
+        self.assertEqual(self.count(), (1000, False))
+        self.assertEqual(self.count('/api/recipes/?tags=breakfast'), (2, True))
+        follower = User.objects.create(
+            username='follower', email='follower@example.com'
+        )
+        Subscription.objects.create(follower=follower, author=self.author)
+        self.client.force_authenticate(follower)
+        self.assertEqual(
+            self.count('/api/users/subscriptions/'), (1, True)
+        )
+        estimate.assert_called_once_with(Recipe)
+
+    def test_subscriptions_per_user(self):
+        counts = []
+        for pk in (1, 2):
+            follower = User.objects.create(
+                username=f'follower{pk}', email=f'follower{pk}@example.com'
+            )
+            Subscription.objects.bulk_create(
+                Subscription(follower=follower, author=author)
+                for author in User.objects.exclude(pk=follower.pk)[:pk]
+            )
+            self.client.force_authenticate(follower)
+            counts.append(self.count('/api/users/subscriptions/'))
+        self.assertEqual(counts, [(1, True), (2, True)])
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, Subscription, User
+
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+URL = '/api/recipes/feed/?limit=3'
+
+
+class FeedTests(APITestCase):
+    """Лента рецептов авторов из подписок по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.follower = User.objects.create(
+            username='follower', email='follower@example.com'
+        )
+        authors = User.objects.bulk_create(
+            User(id=pk, username=f'author{pk}', email=f'{pk}@example.com')
+            for pk in (11, 12, 13)
+        )
+        # Рецепты авторов перемежаются по времени; у каждого третьего
+        # одинаковый created_at, порядок внутри группы задаёт id.
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=authors[pk % 3],
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                image_thumbnailed='recipes/image/recipe.png',
+                created_at=CREATED_AT + timedelta(
+                    hours=0 if pk % 3 == 0 else pk
+                ),
+            )
+            for pk in range(1, 16)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(follower=cls.follower, author=author)
+            for author in authors[:2]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.follower)
+
+    def walk(self, url, link='next'):
+        """id всех страниц, пройденных от url по ссылкам link."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_walk_forward_and_back(self):
+        expected = list(Recipe.objects.filter(
+            author_id__in=(11, 12)
+        ).values_list('pk', flat=True))
+        self.assertEqual(len(expected), 10)
+        pages = self.walk(URL)
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+        response = self.client.get(URL)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+        last = [recipe['id'] for recipe in response.data['results']]
+        backward = self.walk(response.data['previous'], 'previous')
+        self.assertEqual(sum(reversed(backward), []) + last, expected)
+
+    def test_new_recipe_first(self):
+        Recipe.objects.create(
+            id=99,
+            name='Новый',
+            author_id=11,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+            created_at=CREATED_AT + timedelta(days=1),
+        )
+        response = self.client.get(URL)
+        self.assertEqual(response.data['results'][0]['id'], 99)
+
+    def test_queries_do_not_grow(self):
+        counts = []
+        url = URL
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            counts.append(len(queries))
+            url = response.data['next']
+        self.assertEqual(len(set(counts[1:])), 1)
+
+    def test_no_subscriptions(self):
+        self.client.force_authenticate(User.objects.get(pk=13))
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(URL).status_code, 401)
@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient
+
+
+class IngredientIndexTests(APITestCase):
+    """Автодополнение продуктов из индекса в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'Сахар', 'сахарная пудра', 'ванильный сахар',
+                'тростниковый сахар', 'соль', 'Мука',
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data]
+
+    def test_prefix_before_substring(self):
+        self.assertEqual(self.search('САХ'), [
+            'Сахар', 'сахарная пудра', 'ванильный сахар',
+            'тростниковый сахар',
+        ])
+        self.assertEqual(self.search('  мук '), ['Мука'])
+        self.assertEqual(self.search('перец'), [])
+
+    def test_empty_query_lists_all(self):
+        self.assertEqual(self.search(''), [
+            'ванильный сахар', 'Мука', 'Сахар', 'сахарная пудра', 'соль',
+            'тростниковый сахар',
+        ])
+
+    def test_no_queries_when_built(self):
+        self.search('сах')
+        with self.assertNumQueries(0):
+            self.search('соль')
+
+    def test_rebuilt_after_change(self):
+        self.assertEqual(self.search('перец'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='перец', measurement_unit='г')
+        self.assertEqual(self.search('перец'), ['перец'])
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from recipes.jobs import claim, run
+from recipes.models import (
+    Ingredient, Job, Recipe, RecipeIngredient, ShoppingCart, User
+)
+
+PRIVATE_MEDIA_ROOT = tempfile.mkdtemp()
+URL = '/api/recipes/download_shopping_cart/async/'
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=PRIVATE_MEDIA_ROOT)
+class ShoppingListJobTests(APITestCase):
+    """Список покупок фоновой задачей и выдача файла владельцу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com'
+        )
+        cls.other = User.objects.create(
+            username='other', email='other@example.com'
+        )
+        ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            name='Блины',
+            author=cls.user,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=200
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PRIVATE_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_download(self):
+        response = self.client.post(URL, {'format': 'csv'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_url = f'/api/jobs/{response.data["id"]}/'
+        self.assertEqual(response['Location'], f'http://testserver{job_url}')
+        self.assertEqual(response.data['status'], Job.PENDING)
+        self.assertEqual(
+            self.client.get(f'{job_url}download/').status_code, 404
+        )
+        run(claim())
+        data = self.client.get(job_url).data
+        self.assertEqual(data['status'], Job.DONE)
+        self.assertEqual(
+            data['result']['url'], f'http://testserver{job_url}download/'
+        )
+        response = self.client.get(f'{job_url}download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'filename="shopping_list.csv"', response['Content-Disposition']
+        )
+        self.assertIn(
+            'мука,г,200', b''.join(response.streaming_content).decode()
+        )
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(job_url).status_code, 404)
+        self.assertEqual(
+            self.client.get(f'{job_url}download/').status_code, 404
+        )
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.get(f'{job_url}download/').status_code, 401
+        )
+
+    def test_unknown_format(self):
+        response = self.client.post(URL, {'format': 'xml'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.paginations import LimitPagination
+from recipes.models import Recipe, Subscription, User
+
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Выдача по курсору: переходы вперёд и назад по ссылкам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        # У нечётных рецептов одинаковый created_at: порядок внутри
+        # группы задаёт только id.
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=cls.author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                created_at=(
+                    CREATED_AT if pk % 2 else CREATED_AT.replace(day=pk)
+                ),
+                trending_score=pk % 2,
+            )
+            for pk in range(1, 14)
+        )
+
+    def walk(self, url, link='next'):
+        """id всех страниц, пройденных от url по ссылкам link."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def last_page_url(self, url):
+        response = self.client.get(url)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+        return response.data['previous'], response.data['results']
+
+    def assert_walks(self, url, expected):
+        pages = self.walk(url)
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(pages[:-1]))
+        previous, last = self.last_page_url(url)
+        backward = self.walk(previous, 'previous')
+        self.assertEqual(
+            sum(reversed(backward), []) + [recipe['id'] for recipe in last],
+            expected
+        )
+
+    def test_default_ordering_with_equal_created_at(self):
+        self.assert_walks(
+            '/api/recipes/?cursor=&limit=4',
+            list(Recipe.objects.values_list('id', flat=True))
+        )
+
+    def test_trending_ordering_with_equal_scores(self):
+        self.assert_walks(
+            '/api/recipes/?cursor=&limit=4&ordering=trending',
+            list(Recipe.objects.order_by(
+                '-trending_score', '-created_at', 'id'
+            ).values_list('id', flat=True))
+        )
+
+    def test_cursor_round_trip(self):
+        pagination = LimitPagination()
+        queryset = Recipe.objects.all()
+        pagination.model = queryset.model
+        pagination.ordering = pagination.get_ordering(queryset)
+        pagination.request = APIRequestFactory().get('/api/recipes/')
+        self.assertEqual(
+            pagination.ordering, [('created_at', True), ('id', False)]
+        )
+        recipe = queryset[5]
+        for reverse in (False, True):
+            link = pagination.cursor_link(recipe, reverse)
+            cursor = link.split('cursor=')[1]
+            self.assertEqual(
+                pagination.decode_cursor(cursor),
+                ([recipe.created_at, recipe.id], reverse)
+            )
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'WzAsIFsxXV0=', 'WzAsIFsieCIsIDFdXQ=='):
+            response = self.client.get(f'/api/recipes/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_subscriptions(self):
+        follower = User.objects.create(
+            username='follower', email='follower@example.com'
+        )
+        authors = User.objects.bulk_create(
+            User(username=f'автор {pk % 3}{pk}', email=f'{pk}@example.com')
+            for pk in range(7)
+        )
+        authors = User.objects.filter(email__in=[
+            author.email for author in authors
+        ])
+        Subscription.objects.bulk_create(
+            Subscription(follower=follower, author=author)
+            for author in authors
+        )
+        self.client.force_authenticate(follower)
+        self.assert_walks(
+            '/api/users/subscriptions/?cursor=&limit=3',
+            list(authors.order_by('username', 'id').values_list(
+                'id', flat=True
+            ))
+        )
@@ -0,0 +1,121 @@
+from django.core.cache import cache
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import (
+    Favourite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Subscription, Tag, User
+)
+
+URL = '/api/recipes/1/'
+
+
+class RecipeDetailCacheTests(APITestCase):
+    """Кеш рецепта: общий payload и флаги каждого пользователя поверх."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.reader = User.objects.create(
+            username='reader', email='reader@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            id=1,
+            name='Блины',
+            author=cls.author,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=100
+        )
+        Favourite.objects.create(user=cls.reader, recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipe)
+        Subscription.objects.create(follower=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user=None, client=None):
+        client = client or self.client
+        client.force_authenticate(user)
+        response = client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cache_hit(self):
+        first = self.get(self.reader)
+        with self.assertNumQueries(1):
+            second = self.get(self.reader)
+        self.assertEqual(first, second)
+
+    def test_viewer_flags(self):
+        data = self.get(self.reader)
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertTrue(data['author']['is_subscribed'])
+        for user in (self.author, None):
+            data = self.get(user)
+            self.assertFalse(data['is_favorited'])
+            self.assertFalse(data['is_in_shopping_cart'])
+            self.assertFalse(data['author']['is_subscribed'])
+
+    def assert_changed(self, change, check):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        check(self.get())
+
+    def test_recipe_change(self):
+        def change():
+            self.recipe.name = 'Оладьи'
+            self.recipe.save()
+        self.assert_changed(
+            change, lambda data: self.assertEqual(data['name'], 'Оладьи')
+        )
+
+    def test_ingredient_amount_change(self):
+        def change():
+            row = RecipeIngredient.objects.get(recipe=self.recipe)
+            row.amount = 200
+            row.save()
+        self.assert_changed(
+            change,
+            lambda data: self.assertEqual(
+                data['ingredients'][0]['amount'], 200
+            )
+        )
+
+    def test_tag_change(self):
+        def change():
+            self.tag.name = 'Ужин'
+            self.tag.save()
+        self.assert_changed(
+            change,
+            lambda data: self.assertEqual(data['tags'][0]['name'], 'Ужин')
+        )
+
+    def test_author_change(self):
+        def change():
+            self.author.first_name = 'Иван'
+            self.author.save()
+        self.assert_changed(
+            change,
+            lambda data: self.assertEqual(
+                data['author']['first_name'], 'Иван'
+            )
+        )
+
+    def test_host_in_key(self):
+        local = self.get()
+        other = self.get(client=APIClient(HTTP_HOST='127.0.0.1'))
+        self.assertTrue(local['image'].startswith('http://testserver/'))
+        self.assertTrue(other['image'].startswith('http://127.0.0.1/'))
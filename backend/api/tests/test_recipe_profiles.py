@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, Subscription, Tag, User
+)
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAA'
+    'FklEQVR4nGP8z8DAwMDAxMDAwMDAAAANHQEDasKb6QAAAABJRU5ErkJggg=='
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeProfilesTests(APITestCase):
+    """Профили запросов RecipeViewSet: число запросов не растёт с данными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.reader = User.objects.create(
+            username='reader', email='reader@example.com'
+        )
+        Subscription.objects.create(follower=cls.reader, author=cls.author)
+        Tag.objects.bulk_create(
+            Tag(id=pk, name=f'Тег {pk}', slug=f'tag{pk}')
+            for pk in range(1, 4)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(id=pk, name=f'Продукт {pk}', measurement_unit='г')
+            for pk in range(1, 9)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=cls.author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+            )
+            for pk in range(1, 7)
+        )
+        # У рецепта i ровно i продуктов.
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=pk, ingredient_id=ingredient, amount=1)
+            for pk in range(1, 7)
+            for ingredient in range(1, pk + 1)
+        )
+        for recipe in Recipe.objects.all():
+            recipe.tags.set([1, 2])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.reader)
+
+    def count_queries(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return len(queries), response.data
+
+    def test_retrieve(self):
+        small, _ = self.count_queries('get', '/api/recipes/1/')
+        large, data = self.count_queries('get', '/api/recipes/6/')
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['ingredients']), 6)
+        self.assertEqual(len(data['tags']), 2)
+        self.assertTrue(data['author']['is_subscribed'])
+
+    def test_list(self):
+        small, _ = self.count_queries('get', '/api/recipes/?limit=1')
+        large, data = self.count_queries('get', '/api/recipes/?limit=6')
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['results']), 6)
+
+    def payload(self, ingredients):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'tags': [1, 2, 3],
+            'ingredients': [
+                {'id': pk, 'amount': 2} for pk in range(1, ingredients + 1)
+            ],
+        }
+
+    def test_create_and_update(self):
+        self.client.force_authenticate(self.author)
+        small, _ = self.count_queries(
+            'post', '/api/recipes/', self.payload(1)
+        )
+        large, data = self.count_queries(
+            'post', '/api/recipes/', self.payload(8)
+        )
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['ingredients']), 8)
+        self.assertEqual(len(data['tags']), 3)
+        self.assertFalse(data['is_favorited'])
+        _, data = self.count_queries(
+            'patch', f'/api/recipes/{data["id"]}/',
+            dict(self.payload(3), name='Переименован')
+        )
+        self.assertEqual(data['name'], 'Переименован')
+        self.assertEqual(
+            [item['id'] for item in data['ingredients']], [1, 2, 3]
+        )
@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+URL = '/api/recipes/1/'
+# Картинку сериализатор требует и при частичном обновлении.
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAA'
+    'FklEQVR4nGP8z8DAwMDAxMDAwMDAAAANHQEDasKb6QAAAABJRU5ErkJggg=='
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeUpdateTests(APITestCase):
+    """Обновление продуктов рецепта по разнице и проверка id пачкой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        Tag.objects.bulk_create(
+            Tag(id=pk, name=f'Тег {pk}', slug=f'tag{pk}') for pk in (1, 2)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(id=pk, name=f'Продукт {pk}', measurement_unit='г')
+            for pk in range(1, 6)
+        )
+        recipe = Recipe.objects.create(
+            id=1,
+            name='Рецепт',
+            author=cls.author,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+        recipe.tags.set([1])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=pk)
+            for pk in (1, 2, 3)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, ingredients, tags=(1,)):
+        return self.client.patch(URL, {
+            'image': IMAGE,
+            'tags': list(tags),
+            'ingredients': [
+                {'id': pk, 'amount': amount} for pk, amount in ingredients
+            ],
+        }, format='json')
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in RecipeIngredient.objects.filter(recipe_id=1)
+        }
+
+    def test_only_changed_rows_written(self):
+        before = self.rows()
+        response = self.patch([(1, 1), (2, 20), (4, 4)], tags=(1, 2))
+        self.assertEqual(response.status_code, 200, response.data)
+        after = self.rows()
+        self.assertEqual(set(after), {1, 2, 4})
+        self.assertEqual(after[1], before[1])
+        self.assertEqual(after[2], (before[2][0], 20))
+        self.assertEqual(
+            [(item['id'], item['amount']) for item in response.data[
+                'ingredients'
+            ]],
+            [(1, 1), (2, 20), (4, 4)]
+        )
+        self.assertEqual([tag['id'] for tag in response.data['tags']], [1, 2])
+
+    def test_unchanged_update_writes_no_rows(self):
+        before = self.rows()
+        response = self.patch([(pk, pk) for pk in (1, 2, 3)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rows(), before)
+
+    def test_unknown_ids(self):
+        response = self.patch([(1, 1), (98, 1), (2, 1), (99, 1)])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['ingredients']
+        self.assertEqual(errors[0], {})
+        self.assertIn('98', str(errors[1]['id'][0]))
+        self.assertEqual(errors[2], {})
+        self.assertIn('99', str(errors[3]['id'][0]))
+        response = self.patch([(1, 1)], tags=(1, 77))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('77', str(response.data['tags']))
+        self.assertEqual(set(self.rows()), {1, 2, 3})
+
+    def test_validation_queries_do_not_grow(self):
+        counts = []
+        for size in (1, 5):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.patch(
+                    [(pk, 1) for pk in range(1, size + 1)] + [(99, 1)],
+                    tags=(1, 2) if size > 1 else (1,)
+                )
+            self.assertEqual(response.status_code, 400)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,65 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, Tag, User
+
+
+class RecipeSearchTests(APITestCase):
+    """Полнотекстовый поиск рецептов по названию и описанию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        for pk, name, text in (
+            (1, 'Блины на молоке', 'Тонкие блины.'),
+            (2, 'Оладьи', 'Пышные, на кефире; подавать с блинным соусом.'),
+            (3, 'Борщ', 'Свёкла, капуста и молоко не нужно.'),
+            (4, 'Салат', 'Огурцы и помидоры.'),
+        ):
+            Recipe.objects.create(
+                id=pk,
+                name=name,
+                author=author,
+                text=text,
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                image_thumbnailed='recipes/image/recipe.png',
+            )
+        cls.tag.recipes.set([2, 3])
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, params=''):
+        response = self.client.get(
+            f'/api/recipes/?limit=10&{urlencode({"search": query})}{params}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_prefix_and_rank(self):
+        # Совпадение в названии выше совпадения в описании.
+        self.assertEqual(self.search('блин'), [1, 2])
+        self.assertEqual(self.search('МОЛОК'), [1, 3])
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('блины молоке'), [1])
+        self.assertEqual(self.search('блины огурцы'), [])
+
+    def test_no_words(self):
+        self.assertEqual(self.search('!!! ...'), [])
+
+    def test_with_tags(self):
+        self.assertEqual(self.search('блин', '&tags=breakfast'), [2])
+
+    def test_index_follows_changes(self):
+        recipe = Recipe.objects.get(pk=4)
+        recipe.name = 'Салат с блинами'
+        recipe.save()
+        Recipe.objects.filter(pk=1).delete()
+        self.assertEqual(self.search('блин'), [4, 2])
@@ -0,0 +1,122 @@
+import csv
+from io import StringIO
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, ShoppingCart, User
+)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListTests(APITestCase):
+    """Выгрузка списка покупок: форматы, выбор формата и кеш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com'
+        )
+        Ingredient.objects.bulk_create((
+            Ingredient(id=1, name='мука', measurement_unit='г'),
+            Ingredient(id=2, name='яйца', measurement_unit='шт'),
+        ))
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=cls.user,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                # Копии картинки «уже построены»: файла в тестах нет.
+                image_thumbnailed='recipes/image/recipe.png',
+            )
+            for pk in (1, 2, 3)
+        )
+        RecipeIngredient.objects.bulk_create((
+            RecipeIngredient(recipe_id=1, ingredient_id=1, amount=100),
+            RecipeIngredient(recipe_id=2, ingredient_id=1, amount=50),
+            RecipeIngredient(recipe_id=2, ingredient_id=2, amount=3),
+            RecipeIngredient(recipe_id=3, ingredient_id=2, amount=1),
+        ))
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe_id=pk) for pk in (1, 2)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def download(self, url=URL, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        content = (
+            b''.join(response.streaming_content)
+            if response.streaming else response.content
+        )
+        return response, content
+
+    def test_txt(self):
+        response, content = self.download()
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        self.assertIn('shopping_list.txt', response['Content-Disposition'])
+        lines = content.decode().splitlines()
+        self.assertIn('1. Мука (г) — 150', lines)
+        self.assertIn('2. Яйца (шт) — 3', lines)
+        self.assertIn('- Рецепт 2 (автор: user)', lines)
+
+    def test_csv(self):
+        response, content = self.download(f'{URL}?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(list(csv.reader(StringIO(content.decode()))), [
+            ['Продукт', 'Единица измерения', 'Количество'],
+            ['мука', 'г', '150'],
+            ['яйца', 'шт', '3'],
+        ])
+
+    def test_pdf(self):
+        response, content = self.download(HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_negotiation(self):
+        response, _ = self.download(HTTP_ACCEPT='application/json')
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        response, _ = self.download(
+            f'{URL}?format=csv', HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(self.client.get(f'{URL}?format=xml').status_code, 404)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_cache(self):
+        first, content = self.download()
+        self.assertTrue(first.streaming)
+        second, cached = self.download()
+        self.assertFalse(second.streaming)
+        self.assertEqual(cached, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.create(user=self.user, recipe_id=3)
+        response, content = self.download()
+        self.assertTrue(response.streaming)
+        self.assertIn('2. Яйца (шт) — 4', content.decode())
+        self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.get(pk=1)
+            recipe.name = 'Блины'
+            recipe.save()
+        response, content = self.download()
+        self.assertTrue(response.streaming)
+        self.assertIn('- Блины (автор: user)', content.decode())
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.counters import recount
+from recipes.models import Recipe, Subscription, User
+
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class SubscriptionsTests(APITestCase):
+    """Страница подписок с последними рецептами каждого автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.follower = User.objects.create(
+            username='follower', email='follower@example.com'
+        )
+        cls.authors = User.objects.bulk_create(
+            User(id=pk, username=f'author{pk}', email=f'{pk}@example.com')
+            for pk in range(10, 16)
+        )
+        # У автора 10 + i ровно i рецептов; чем больше номер, тем новее.
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {author.pk}-{number}',
+                author=author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                created_at=CREATED_AT + timedelta(days=number),
+            )
+            for author in cls.authors
+            for number in range(author.pk - 10)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(follower=cls.follower, author=author)
+            for author in cls.authors
+        )
+        recount(apps)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.follower)
+
+    def get(self, query=''):
+        response = self.client.get(f'/api/users/subscriptions/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_latest_recipes(self):
+        data = self.get('recipes_limit=2&limit=10')
+        self.assertEqual(data['count'], 6)
+        for author in data['results']:
+            total = author['id'] - 10
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(author['recipes_count'], total)
+            self.assertEqual(
+                [recipe['name'] for recipe in author['recipes']],
+                [
+                    f'Рецепт {author["id"]}-{number}'
+                    for number in range(total - 1, max(total - 3, -1), -1)
+                ]
+            )
+
+    def test_recipes_limit(self):
+        for query, expected in (
+            ('recipes_limit=0', 0),
+            ('recipes_limit=-1', 0),
+            # Без числа действует MAX_RECIPES_LIMIT: все 5 рецептов.
+            ('recipes_limit=x', 5),
+        ):
+            authors = self.get(f'{query}&limit=10')['results']
+            by_id = {author['id']: author['recipes'] for author in authors}
+            self.assertEqual(len(by_id[15]), expected, query)
+
+    def test_queries_do_not_grow_with_page(self):
+        counts = []
+        for limit in (1, 6):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.get(f'limit={limit}&recipes_limit=3')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
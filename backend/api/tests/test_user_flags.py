@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Favourite, Recipe, ShoppingCart, User
+
+
+class UserFlagsTests(APITestCase):
+    """is_favorited и is_in_shopping_cart приходят аннотацией запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.user = User.objects.create(
+            username='user', email='user@example.com'
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=cls.author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+            )
+            for pk in range(1, 9)
+        )
+        Favourite.objects.bulk_create(
+            Favourite(user=cls.user, recipe_id=pk) for pk in (1, 3)
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe_id=pk) for pk in (3, 4)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def flags(self, url='/api/recipes/?limit=8'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart']
+            )
+            for recipe in response.data['results']
+        }
+
+    def test_flags_for_user(self):
+        self.client.force_authenticate(self.user)
+        flags = self.flags()
+        self.assertEqual(flags[1], (True, False))
+        self.assertEqual(flags[3], (True, True))
+        self.assertEqual(flags[4], (False, True))
+        self.assertEqual(flags[2], (False, False))
+
+    def test_flags_for_anonymous(self):
+        self.assertEqual(
+            set(self.flags().values()), {(False, False)}
+        )
+
+    def test_queries_do_not_grow_with_page(self):
+        self.client.force_authenticate(self.user)
+        counts = []
+        for limit in (2, 8):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.flags(f'/api/recipes/?limit={limit}')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from api.views import (
     UserViewSet,
     IngredientViewSet,
+    JobViewSet,
     RecipeViewSet,
     TagViewSet,
 )
@@ -15,6 +16,7 @@ router.register('users', UserViewSet, basename='users')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredient')
 router.register('recipes', RecipeViewSet, basename='recipe')
+router.register('jobs', JobViewSet, basename='jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
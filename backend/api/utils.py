@@ -1,27 +1,123 @@
+import hashlib
 from datetime import datetime
 
+from django.db import connection
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+
+from api.caches import get_versions
+from recipes.constans import MAX_RECIPES_LIMIT
+from recipes.models import Recipe, RecipeIngredient, ShoppingCart
+
+MONTHS_RU = [
+    'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+    'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
+]
+
+
+def shopping_list_ingredients(user):
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_carts__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name')
+
+
+def shopping_list_recipes(user):
+    return Recipe.objects.filter(
+        shopping_carts__user=user
+    ).values('name', 'author__username').distinct()
+
+
+def shopping_list_title():
+    return 'Список покупок ({}):'.format(
+        MONTHS_RU[datetime.now().month - 1]
+    )
+
 
 def generate_shopping_list(ingredients, recipes):
-    months_ru = [
-        'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
-        'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
-    ]
-    current_month = datetime.now().month
-    shopping_list = [
-        'Список покупок ({}):'.format(months_ru[current_month - 1]), ''
-    ]
-    shopping_list.extend(
-        '{}. {} ({}) — {}'.format(
+    """Построчно формирует список покупок, не загружая его в память."""
+    yield shopping_list_title()
+    yield ''
+    for i, item in enumerate(ingredients.iterator(), start=1):
+        yield '{}. {} ({}) — {}'.format(
             i,
             item['ingredient__name'].capitalize(),
             item['ingredient__measurement_unit'],
             item['total_amount']
         )
-        for i, item in enumerate(ingredients, start=1)
+    yield 'Рецепты:'
+    for recipe in recipes.iterator():
+        yield '- {} (автор: {})'.format(
+            recipe['name'], recipe['author__username']
+        )
+
+
+def shopping_list_cache_key(user, file_format):
+    """Ключ кеша по содержимому корзины пользователя.
+
+    В ключ входят версии корзины, каждого рецепта в ней, авторов этих
+    рецептов и справочника продуктов, поэтому список устаревает только
+    от изменений, которые в него попадают.
+    """
+    cart = list(ShoppingCart.objects.filter(user=user).order_by(
+        'recipe_id'
+    ).values_list('recipe_id', 'recipe__author_id'))
+    names = [f'lists:{user.pk}', 'ingredients']
+    names.extend(f'recipe:{pk}' for pk, _ in cart)
+    names.extend(
+        f'user:{pk}' for pk in sorted({author for _, author in cart})
     )
-    shopping_list.append('Рецепты:')
-    shopping_list.extend(
-        '- {} (автор: {})'.format(recipe.name, recipe.author.username)
-        for recipe in recipes
+    digest = hashlib.sha256(','.join(
+        f'{name}={version}'
+        for name, version in zip(names, get_versions(*names))
+    ).encode()).hexdigest()
+    return 'shopping_list:{}:{}:{}'.format(
+        datetime.now().month, file_format, digest
     )
-    return '\n'.join(shopping_list)
+
+
+def get_recipes_limit(request):
+    """recipes_limit из запроса, ограниченный MAX_RECIPES_LIMIT."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return MAX_RECIPES_LIMIT
+    return min(max(limit, 0), MAX_RECIPES_LIMIT)
+
+
+def attach_latest_recipes(authors, limit):
+    """Раскладывает по авторам их последние limit рецептов.
+
+    Все рецепты выбираются одним запросом: ROW_NUMBER() OVER
+    (PARTITION BY author) нумерует рецепты каждого автора, а внешний
+    запрос отсекает лишние. Фильтр по оконной функции обёрнут в сырой
+    SQL, так как ORM Django 3.2 его не поддерживает.
+    """
+    for author in authors:
+        author.latest_recipes = []
+    if not authors or not limit:
+        return authors
+    ranked = Recipe.objects.filter(author__in=authors).annotate(
+        recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('created_at').desc(), F('id').desc()),
+        )
+    ).only(
+        'id', 'name', 'image', 'image_thumbnailed', 'cooking_time',
+        'author_id'
+    ).order_by()
+    sql, params = ranked.query.sql_with_params()
+    rank = connection.ops.quote_name('recipe_rank')
+    by_author = {author.pk: author for author in authors}
+    for recipe in Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE ranked.{rank} <= %s '
+        f'ORDER BY ranked.{rank}',
+        (*params, limit),
+    ):
+        by_author[recipe.author_id].latest_recipes.append(recipe)
+    return authors
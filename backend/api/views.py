@@ -1,21 +1,34 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse, Http404
+from django.core.cache import cache
+from django.db.models import (
+    Exists, OuterRef, Prefetch, Value, prefetch_related_objects
+)
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status, viewsets
+from rest_framework import generics, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from djoser.views import UserViewSet as DjoserUserViewSet
 
+from api.caches import bump_version, cache_stream, get_versions
 from api.filters import RecipeFilter, IngredientFilter
-from api.paginations import LimitPagination
+from api.indexes import ingredient_index
+from api.mixins import ConditionalGetMixin
+from api.paginations import FeedPagination, LimitPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import SHOPPING_LIST_RENDERERS, ShoppingListNegotiation
 from api.serializers import (
     UserSerializer,
     IngredientSerializer,
@@ -23,32 +36,50 @@ from api.serializers import (
     UserSubscriberSerializer,
     TagSerializer,
     UserRecipesSerializer,
-    AvatarSerializer
+    AvatarSerializer,
+    JobSerializer,
+    RecipeIdsSerializer,
+    SimilarRecipeSerializer,
 )
-from api.utils import generate_shopping_list
+from api.tasks import render_shopping_list
+from api.utils import (
+    attach_latest_recipes,
+    get_recipes_limit,
+    shopping_list_cache_key,
+    shopping_list_ingredients,
+    shopping_list_recipes,
+)
+from recipes.counters import actual_count
+from recipes.jobs import enqueue
 from recipes.models import (
     Favourite,
     Ingredient,
+    Job,
     Recipe,
     ShoppingCart,
     Tag,
+    SimilarRecipe,
     Subscription,
     RecipeIngredient
 )
+from recipes.shortlinks import encode_short_code, recipe_ids
+from recipes.storage import private_storage
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     http_method_names = ('get',)
+    version_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     http_method_names = ('get',)
+    version_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -57,17 +88,148 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     search_fields = ['name']
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: ingredient_index.search(
+                request.query_params.get('name', '')
+            )
+        )
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = PostRecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly,)
     pagination_class = LimitPagination
+    # Без фильтров выдача — вся таблица рецептов: число можно оценить.
+    count_estimate = True
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'feed'):
+            return self.get_read_queryset()
+        return self.annotate_user_flags(
+            Recipe.objects.select_related('author')
+        )
+
+    def get_count_versions(self):
+        """Версии данных, от которых зависит число рецептов в выдаче."""
+        versions = ['recipes', 'tags']
+        params = self.request.query_params
+        if self.request.user.is_authenticated and (
+            'is_favorited' in params or 'is_in_shopping_cart' in params
+        ):
+            versions.append(f'lists:{self.request.user.pk}')
+        return versions
+
+    def annotate_user_flags(self, recipes):
+        user = self.request.user
+        if not user.is_authenticated:
+            return recipes.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return recipes.annotate(
+            is_favorited=Exists(Favourite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    def subscription_flag(self, author):
+        user = self.request.user
+        if not user.is_authenticated:
+            return Value(False)
+        return Exists(Subscription.objects.filter(
+            follower=user, author=OuterRef(author)
+        ))
+
+    def get_read_prefetches(self):
+        """Связи рецепта, нужные GetRecipeSerializer."""
+        return (
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=self.subscription_flag('pk')
+                )
+            ),
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def get_read_queryset(self):
+        """Рецепты со всеми связями, нужными GetRecipeSerializer."""
+        return self.annotate_user_flags(Recipe.objects.all()).prefetch_related(
+            *self.get_read_prefetches()
+        )
+
+    def prefetch_saved(self, recipe):
+        """Подгружает связи в только что сохранённый рецепт.
+
+        Закешированные при сохранении автор и списки сбрасываются, чтобы
+        prefetch взял их заново со всеми аннотациями.
+        """
+        recipe._prefetched_objects_cache = {}
+        Recipe.author.field.delete_cached_value(recipe)
+        prefetch_related_objects([recipe], *self.get_read_prefetches())
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кеша с флагами текущего пользователя поверх.
+
+        Ключ кеша включает версии рецепта, его автора, тегов и продуктов,
+        поэтому любое их изменение даёт промах и пересборку. Ссылки на
+        картинки в ответе абсолютные, поэтому в ключ входят и схема с
+        хостом запроса.
+        """
+        viewer = generics.get_object_or_404(
+            self.annotate_user_flags(Recipe.objects.all()).annotate(
+                author_is_subscribed=self.subscription_flag('author')
+            ).values(
+                'author_id',
+                'is_favorited',
+                'is_in_shopping_cart',
+                'author_is_subscribed',
+            ),
+            pk=kwargs['pk']
+        )
+        key = 'recipe_detail:{}:{}:{}'.format(
+            kwargs['pk'],
+            ':'.join(map(str, get_versions(
+                f'recipe:{kwargs["pk"]}',
+                f'user:{viewer["author_id"]}',
+                'tags',
+                'ingredients',
+            ))),
+            hashlib.sha1(request.build_absolute_uri('/').encode()).hexdigest(),
+        )
+        data = cache.get(key)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        data['is_favorited'] = viewer['is_favorited']
+        data['is_in_shopping_cart'] = viewer['is_in_shopping_cart']
+        data['author']['is_subscribed'] = viewer['author_is_subscribed']
+        return Response(data)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        # Новый рецепт ещё не может быть ни в чьём избранном или корзине.
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        self.prefetch_saved(recipe)
+
+    def perform_update(self, serializer):
+        # Флаги пользователя пришли аннотацией из get_queryset().
+        self.prefetch_saved(serializer.save())
+        # UpdateModelMixin.update сбрасывает prefetch-кеш экземпляра после
+        # perform_update, поэтому ответ сериализуется (и кешируется в
+        # serializer.data) здесь.
+        serializer.data
 
     def add_recipe_to_favorite_or_shopping_cart(
             self, request, model, pk
@@ -86,51 +248,171 @@ class RecipeViewSet(viewsets.ModelViewSet):
             UserRecipesSerializer(recipe).data, status=status.HTTP_201_CREATED
         )
 
+    def bulk_favorite_or_shopping_cart(self, request, model):
+        """Добавляет или убирает пачку рецептов за несколько запросов.
+
+        Удаление идёт через QuerySet.delete() со всеми сигналами.
+        bulk_create сигналов не шлёт, поэтому после вставки счётчик
+        избранного пересчитывается по фактическим строкам, а версия
+        списков пользователя сбрасывается здесь же. Для каждого id
+        возвращается исход: added / exists / removed / absent /
+        not_found.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        user = request.user
+        found = set(
+            Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        linked = set(model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        if request.method == 'DELETE':
+            changed, outcomes = linked, ('removed', 'absent')
+            if changed:
+                model.objects.filter(user=user, recipe_id__in=changed).delete()
+        else:
+            changed, outcomes = found - linked, ('added', 'exists')
+            if changed:
+                model.objects.bulk_create(
+                    (model(user=user, recipe_id=pk) for pk in changed),
+                    ignore_conflicts=True
+                )
+                if model is Favourite:
+                    Recipe.objects.filter(pk__in=changed).update(
+                        favourites_count=actual_count(Favourite, 'recipe')
+                    )
+                bump_version(f'lists:{user.pk}')
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': 'not_found' if pk not in found
+                else outcomes[0] if pk in changed else outcomes[1],
+            }
+            for pk in ids
+        ]})
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок одной лентой, новые сначала."""
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
     @action(
         methods=['GET'],
         detail=True,
         url_path='get-link',
     )
     def get_short_link(self, request, pk):
-        if not Recipe.objects.filter(id=pk).exists():
+        if not pk.isdigit() or not recipe_ids.exists(int(pk)):
             raise Http404(f'Рецепт с id={pk} не найден.')
         return Response(
             {'short-link': request.build_absolute_uri(
-                reverse('recipes:redirect_short_link', args={pk})
+                reverse(
+                    'recipes:redirect_short_link',
+                    args=[encode_short_code(int(pk))]
+                )
             )},
             status=status.HTTP_200_OK
         )
 
+    @action(
+        methods=['GET'],
+        detail=True,
+    )
+    def similar(self, request, pk):
+        """Рецепты с похожим набором продуктов, самые похожие сначала.
+
+        Списки строит build_similar_recipes и обновляют фоновые задачи
+        refresh_similar; здесь это один запрос по индексу.
+        """
+        if not pk.isdigit() or not recipe_ids.exists(int(pk)):
+            raise Http404(f'Рецепт с id={pk} не найден.')
+        recipes = []
+        for row in SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related('similar').order_by('-score', '-similar_id'):
+            row.similar.similarity = row.score
+            recipes.append(row.similar)
+        return Response(SimilarRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Ошибки выгрузки списка покупок отдаются в JSON, а не под типом
+        # файла, который запросил клиент.
+        if (
+            self.action == 'download_shopping_cart'
+            and getattr(response, 'exception', False)
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
     @action(
         detail=False,
         methods=['GET'],
         url_path='download_shopping_cart',
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+        content_negotiation_class=ShoppingListNegotiation,
     )
-    def download_shopping_cart(self, request):
-        ingredients_in_recipe = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_carts__user=request.user
-            ).values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            ).annotate(
-                total_amount=Sum('amount')
-            ).order_by('ingredient__name')
-        )
-        recipes_in_cart = (
-            Recipe.objects.filter(shopping_carts__user=request.user)
-            .select_related('author')
-            .distinct()
+    def download_shopping_cart(self, request, **kwargs):
+        renderer = request.accepted_renderer
+        key = shopping_list_cache_key(request.user, renderer.format)
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(
+                content, content_type=renderer.content_type
+            )
+        else:
+            response = StreamingHttpResponse(
+                cache_stream(
+                    key,
+                    renderer.stream(
+                        shopping_list_ingredients(request.user),
+                        shopping_list_recipes(request.user),
+                    ),
+                    settings.SHOPPING_LIST_CACHE_TIMEOUT,
+                ),
+                content_type=renderer.content_type
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.filename}.{renderer.format}"'
         )
-        shopping_list_text = generate_shopping_list(
-            ingredients_in_recipe,
-            recipes_in_cart
+        return response
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='download_shopping_cart/async',
+        permission_classes=[IsAuthenticated],
+    )
+    def download_shopping_cart_async(self, request, **kwargs):
+        file_format = request.data.get('format', 'txt')
+        formats = [renderer.format for renderer in SHOPPING_LIST_RENDERERS]
+        if file_format not in formats:
+            raise ValidationError(
+                {'format': f'Допустимые форматы: {", ".join(formats)}.'}
+            )
+        job = enqueue(
+            render_shopping_list, user=request.user,
+            user_id=request.user.pk, file_format=file_format
         )
-        return FileResponse(
-            shopping_list_text,
-            as_attachment=True,
-            filename='shopping_list.txt',
-            content_type='text/plain; charset=utf-8'
+        return Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(
+                reverse('api:jobs-detail', args=[job.pk])
+            )}
         )
 
     @action(
@@ -153,12 +435,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, Favourite, pk=pk
         )
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_favorite_or_shopping_cart(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_favorite_or_shopping_cart(request, Favourite)
+
 
 class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = LimitPagination
 
+    def get_count_versions(self):
+        if self.action == 'subscriptions':
+            return [f'subscriptions:{self.request.user.pk}']
+        return None
+
     @action(
         methods=['GET'],
         url_path='me',
@@ -205,8 +510,12 @@ class UserViewSet(DjoserUserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(authors__follower=request.user)
-        page = self.paginate_queryset(queryset)
+        queryset = User.objects.filter(
+            authors__follower=request.user
+        ).annotate(is_subscribed=Value(True))
+        page = attach_latest_recipes(
+            self.paginate_queryset(queryset), get_recipes_limit(request)
+        )
         return self.get_paginated_response(
             UserSubscriberSerializer(
                 page, many=True, context={'request': request},
@@ -224,7 +533,10 @@ class UserViewSet(DjoserUserViewSet):
         serializer = AvatarSerializer(user, data=request.data)
         if request.method == 'DELETE':
             if user.avatar:
-                user.avatar.delete(save=True)
+                # Файл может быть общим с другими записями: его удалит
+                # collect_media, когда на него не останется ссылок.
+                user.avatar = None
+                user.save(update_fields=['avatar'])
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 'Аватар не найден', status=status.HTTP_404_NOT_FOUND
@@ -234,3 +546,28 @@ class UserViewSet(DjoserUserViewSet):
         return Response(
             serializer.data, status=status.HTTP_200_OK
         )
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Статус фоновой задачи; видны только свои задачи."""
+
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request, pk):
+        """Файл результата задачи из закрытого хранилища."""
+        job = self.get_object()
+        result = job.result if isinstance(job.result, dict) else {}
+        if job.status != Job.DONE or not private_storage.exists(
+            result.get('file') or ''
+        ):
+            raise Http404('Файл задачи не найден.')
+        return FileResponse(
+            private_storage.open(result['file']),
+            as_attachment=True,
+            filename=result.get('filename'),
+        )
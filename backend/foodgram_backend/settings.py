@@ -1,6 +1,8 @@
 import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.utils import get_random_secret_key
 
 from dotenv import load_dotenv
@@ -13,6 +15,8 @@ SECRET_KEY = os.getenv('SECRET_KEY', get_random_secret_key())
 
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1, localhost').split(', ')
 
 INSTALLED_APPS = [
@@ -81,6 +85,30 @@ else:
         }
     }
 
+# Версии наборов данных в api.caches и журнал recipes.inverted_index
+# живут в кеше и должны быть общими для gunicorn, воркеров очереди и
+# management-команд. Кеш в памяти процесса годится только для DEBUG.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', LOCAL_CACHE_BACKENDS[0] if DEBUG else ''
+)
+if not DEBUG and CACHE_BACKEND in ('', *LOCAL_CACHE_BACKENDS):
+    raise ImproperlyConfigured(
+        'При DEBUG=False нужен общий для всех процессов кеш: задайте '
+        'CACHE_BACKEND и CACHE_LOCATION, например '
+        'django_redis.cache.RedisCache и redis://redis:6379/1.'
+    )
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -116,6 +144,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы, которые отдаёт только API после проверки прав (результаты
+# фоновых задач); веб-сервер этот каталог не раздаёт.
+PRIVATE_MEDIA_ROOT = os.path.join(BASE_DIR, 'private')
+
+REFERENCE_DATA_MAX_AGE = 5 * 60
+REFERENCE_DATA_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+RECIPE_CACHE_TIMEOUT = 24 * 60 * 60
+SHORT_LINK_HITS_FLUSH_SIZE = 100
+SHORT_LINK_HITS_FLUSH_INTERVAL = 30
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_ESTIMATE_MIN_ROWS = 100_000
+# Стороны квадратов, в которые вписываются копии картинок.
+THUMBNAIL_SIZES = {'small': 100, 'medium': 480}
+# Под тестами копии строятся синхронно: потоки пула писали бы в
+# тестовую базу из своих соединений.
+THUMBNAIL_WORKERS = 0 if TESTING else int(os.getenv('THUMBNAIL_WORKERS', 2))
+JOB_RETRY_DELAY = 10
+# Задача считается брошенной, если воркер не отмечался столько секунд;
+# пока задача выполняется, он отмечается раз в JOB_HEARTBEAT_INTERVAL.
+JOB_TIMEOUT = 10 * 60
+JOB_HEARTBEAT_INTERVAL = 60
+JOB_RESULT_TTL = 24 * 60 * 60
+# За это время вклад добавления в избранное или корзину в популярность
+# рецепта уменьшается вдвое, с.
+TRENDING_HALF_LIFE = 3 * 24 * 60 * 60
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -1,3 +1,4 @@
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -5,3 +6,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
 application = get_wsgi_application()
+
+# Переходы по коротким ссылкам копятся только в процессах, которые
+# обслуживают запросы: остаток пишется в базу при их завершении.
+from recipes.shortlinks import hit_buffer  # noqa: E402
+
+atexit.register(hit_buffer.flush)
@@ -2,19 +2,21 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
-from django.db.models import Count
+from django.db.models import Count, Prefetch
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
 from .models import (
     Favourite,
     Ingredient,
+    Job,
     Recipe,
     RecipeIngredient,
     ShoppingCart,
     Tag,
     Subscription,
 )
+from .thumbnails import thumbnail_urls
 
 User = get_user_model()
 
@@ -22,13 +24,18 @@ admin.site.unregister(Group)
 
 
 class RecipesCountMixin:
-    @admin.display(description='Рецепты')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('recipes')
+        )
+
+    @admin.display(description='Рецепты', ordering='recipes_total')
     def recipes_count(self, object):
-        return object.recipes.count()
+        return object.recipes_total
 
 
 @admin.register(User)
-class UserAdmin(UserAdmin, RecipesCountMixin):
+class UserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
         ('Дополнительные поля',
          {'fields': ('avatar',)}),
@@ -40,8 +47,8 @@ class UserAdmin(UserAdmin, RecipesCountMixin):
         'last_name',
         'email',
         'avatar_preview',
-        'subscription_count',
-        'subscriber_count',
+        'subscriptions_count',
+        'subscribers_count',
         'recipes_count',
     )
     search_fields = ('username', 'email')
@@ -54,19 +61,11 @@ class UserAdmin(UserAdmin, RecipesCountMixin):
             return (
                 format_html(
                     '<img src="{}" width="50" height="50"; />',
-                    user.avatar.url
+                    thumbnail_urls(user, 'avatar')['small']['jpeg']
                 )
             )
         return 'Нет аватара'
 
-    @admin.display(description='Подписки')
-    def subscription_count(self, user):
-        return user.followers.count()
-
-    @admin.display(description='Подписчики')
-    def subscriber_count(self, user):
-        return user.authors.count()
-
 
 @admin.register(Subscription)
 class SubscribeAdmin(admin.ModelAdmin):
@@ -76,7 +75,7 @@ class SubscribeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin, RecipesCountMixin):
+class TagAdmin(RecipesCountMixin, admin.ModelAdmin):
     list_display = ('name', 'slug', 'recipes_count')
     search_fields = ('name', 'slug',)
 
@@ -88,8 +87,15 @@ class UserRecipeAdmin(admin.ModelAdmin):
     list_filter = ('recipe',)
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'user', 'status', 'attempts', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'updated_at')
+
+
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin, RecipesCountMixin):
+class IngredientAdmin(RecipesCountMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit', 'recipes_count',)
     search_fields = ('name', 'measurement_unit',)
     list_filter = ('measurement_unit',)
@@ -113,6 +119,8 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'tags_display',
         'favourite_count',
+        'short_link_hits',
+        'trending_score',
         'ingredients_display',
         'image_display',
     )
@@ -120,9 +128,15 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags', 'author',)
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(fav_count=Count('favourites'))
-        return queryset
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
 
     @admin.display(description='Время (мин)')
     def cooking_time_display(self, recipe):
@@ -136,7 +150,9 @@ class RecipeAdmin(admin.ModelAdmin):
     @admin.display(description='Картинка')
     @mark_safe
     def image_display(self, recipe):
-        return f'<img src="{recipe.image.url}" width="50" height="50">'
+        return '<img src="{}" width="50" height="50">'.format(
+            thumbnail_urls(recipe, 'image')['small']['jpeg']
+        )
 
     @admin.display(description='Продукты')
     @mark_safe
@@ -149,6 +165,6 @@ class RecipeAdmin(admin.ModelAdmin):
             recipe.recipe_ingredients.all()
         )
 
-    @admin.display(description='В избранном')
-    def favourite_count(self, favourite):
-        return favourite.fav_count
+    @admin.display(description='В избранном', ordering='favourites_count')
+    def favourite_count(self, recipe):
+        return recipe.favourites_count
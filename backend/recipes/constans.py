@@ -7,3 +7,5 @@ MAX_LENGTH_RECIPE_NAME = 256
 LIMIT_TEXT = 20
 MIN_COOKING_TIME = 1
 MIN_AMOUNT = 1
+MAX_RECIPES_LIMIT = 100
+MAX_BULK_RECIPES = 100
@@ -0,0 +1,40 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Модель-владелец счётчика, поле счётчика и связанная модель с полем,
+# по которому считаются строки.
+COUNTERS = (
+    ('recipes.User', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('recipes.User', 'subscriptions_count', 'recipes.Subscription',
+     'follower'),
+    ('recipes.User', 'subscribers_count', 'recipes.Subscription', 'author'),
+    ('recipes.Recipe', 'favourites_count', 'recipes.Favourite', 'recipe'),
+)
+
+
+def actual_count(related, related_field):
+    """Число строк related, ссылающихся через related_field на строку."""
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def recount(apps):
+    """Пересчитывает денормализованные счётчики.
+
+    Обновляются только строки, где значение разошлось с фактическим.
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    fixed = {}
+    for model_name, field, related_name, related_field in COUNTERS:
+        model = apps.get_model(model_name)
+        related = apps.get_model(related_name)
+        actual = actual_count(related, related_field)
+        fixed[f'{model.__name__}.{field}'] = model.objects.annotate(
+            actual=actual
+        ).exclude(**{field: F('actual')}).update(**{field: actual})
+    return fixed
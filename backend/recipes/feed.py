@@ -0,0 +1,87 @@
+from django.db import connection
+from django.db.models import Q
+
+from recipes.models import Recipe, Subscription
+
+RECIPES = Recipe._meta.db_table
+SUBSCRIPTIONS = Subscription._meta.db_table
+
+# Лента сливает хронологии авторов: у каждого из индекса (author,
+# -created_at, id) берётся не больше limit рецептов после позиции, и из
+# этих коротких списков выбираются limit первых. Работа зависит от числа
+# подписок и размера страницы, но не от числа рецептов у авторов и не
+# от глубины страницы.
+POSTGRESQL_FEED = (
+    f'SELECT recipe.id FROM {SUBSCRIPTIONS} AS subscription '
+    f'CROSS JOIN LATERAL ('
+    f'SELECT id, created_at FROM {RECIPES} '
+    f'WHERE author_id = subscription.author_id{{position}} '
+    f'ORDER BY {{order}} LIMIT %s'
+    f') AS recipe '
+    f'WHERE subscription.follower_id = %s '
+    f'ORDER BY {{outer_order}} LIMIT %s'
+)
+# В SQLite нет LATERAL: тот же список автора даёт коррелированный
+# подзапрос в условии соединения.
+SQLITE_FEED = (
+    f'SELECT recipe.id FROM {SUBSCRIPTIONS} AS subscription '
+    f'JOIN {RECIPES} AS recipe ON recipe.id IN ('
+    f'SELECT id FROM {RECIPES} '
+    f'WHERE author_id = subscription.author_id{{position}} '
+    f'ORDER BY {{order}} LIMIT %s'
+    f') '
+    f'WHERE subscription.follower_id = %s '
+    f'ORDER BY {{outer_order}} LIMIT %s'
+)
+
+
+def feed_recipes(recipes, follower, position=None, reverse=False, limit=6):
+    """Рецепты авторов, на которых подписан follower, новые сначала.
+
+    Порядок — сортировка Recipe по умолчанию (-created_at, id). position
+    — пара (created_at, id), строго после которой начинается выдача;
+    при reverse выдача идёт в обратную сторону (к более новым). Из
+    recipes берутся не больше limit рецептов в порядке выдачи.
+    """
+    ordering = ('created_at', '-id') if reverse else ('-created_at', 'id')
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        recipes = recipes.filter(author__in=Subscription.objects.filter(
+            follower=follower
+        ).values('author'))
+        if position is not None:
+            created_at, pk = position
+            after, before = ('gt', 'lt') if reverse else ('lt', 'gt')
+            recipes = recipes.filter(
+                Q(**{f'created_at__{after}': created_at})
+                | Q(created_at=created_at, **{f'id__{before}': pk})
+            )
+        return recipes.order_by(*ordering)[:limit]
+    sql = POSTGRESQL_FEED if connection.vendor == 'postgresql' else SQLITE_FEED
+    params = []
+    condition = ''
+    if position is not None:
+        created_at, pk = position
+        created_at = Recipe._meta.get_field('created_at').get_db_prep_value(
+            created_at, connection
+        )
+        # Граница по created_at отдельным условием — для диапазона индекса.
+        condition = (
+            ' AND created_at {0}= %s AND (created_at {0} %s OR id {1} %s)'
+        ).format(*('><' if reverse else '<>'))
+        params = [created_at, created_at, pk]
+    order = 'created_at {}, id {}'.format(
+        *(('ASC', 'DESC') if reverse else ('DESC', 'ASC'))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.format(
+                position=condition,
+                order=order,
+                outer_order=', '.join(
+                    f'recipe.{part}' for part in order.split(', ')
+                ),
+            ),
+            [*params, limit, follower.pk, limit]
+        )
+        ids = [pk for pk, in cursor.fetchall()]
+    return recipes.filter(pk__in=ids).order_by(*ordering)
@@ -0,0 +1,289 @@
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe, RecipeIngredient
+
+# Сколько записей журнала изменений процесс догоняет по одной; при
+# большем отставании (или вытесненной записи) индекс строится заново.
+MAX_LOG_GAP = 1000
+LOG_TIMEOUT = 24 * 60 * 60
+# Позиции единичных битов для каждого значения байта.
+BYTE_BITS = [
+    tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)
+]
+
+
+def to_bitmap(postings):
+    """Битовая карта (int) из отсортированного массива id."""
+    if isinstance(postings, int):
+        return postings
+    if not postings:
+        return 0
+    data = bytearray((postings[-1] >> 3) + 1)
+    for pk in postings:
+        data[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(data, 'little')
+
+
+def from_bitmap(bits):
+    """Отсортированный список id из битовой карты."""
+    ids = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        if byte:
+            base = index << 3
+            ids.extend(base + bit for bit in BYTE_BITS[byte])
+    return ids
+
+
+def contains(postings, pk):
+    if isinstance(postings, int):
+        return bool(postings >> pk & 1)
+    position = bisect_left(postings, pk)
+    return position < len(postings) and postings[position] == pk
+
+
+class RecipeIngredientIndex:
+    """Инвертированный индекс «продукт → рецепты» в памяти процесса.
+
+    Списки рецептов хранятся отсортированными массивами, а у частых
+    продуктов, где битовая карта компактнее, — битовой картой (int),
+    на которой пересечения и объединения выполняются целиком в C.
+    Индекс строится лениво из RecipeIngredient. Изменения состава
+    рецептов публикуются после коммита в журнал в кеше, и каждый
+    процесс догоняет его перед запросом; reset() заставляет все
+    процессы перестроить индекс (нужно после массовых вставок).
+    Журнал видят другие процессы, только если кеш общий (Redis, см.
+    CACHES): с локальным кешем индекс процесса отстаёт от чужих правок.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = self.sequence = None
+        self.postings = {}
+        self.sizes = array('H')
+        self.by_size = {}
+
+    # Журнал изменений.
+
+    @staticmethod
+    def current_generation():
+        return cache.get_or_set('recipe_index:generation', time.time_ns, None)
+
+    def publish(self, changes):
+        """Записывает изменения после коммита текущей транзакции.
+
+        Изменение — (recipe_id, ingredient_id, есть ли продукт в рецепте);
+        ingredient_id = None означает «перечитать рецепт из базы».
+        """
+        transaction.on_commit(partial(self.write_log, list(changes)))
+
+    def write_log(self, changes):
+        """Добавляет запись в журнал: сначала запись, потом номер.
+
+        Номер записи резервируется отдельным счётчиком, а sequence,
+        который читают процессы, растёт только после записи. Иначе
+        читатель мог увидеть номер без записи и перестроить индекс.
+        Пропуск остаётся возможен, только пока два процесса пишут
+        одновременно и второй успел раньше первого.
+        """
+        if not changes:
+            return
+        key = f'recipe_index:{self.current_generation()}'
+        cache.add(f'{key}:reserved', 0, None)
+        cache.add(f'{key}:sequence', 0, None)
+        number = cache.incr(f'{key}:reserved')
+        cache.set(f'{key}:{number}', changes, LOG_TIMEOUT)
+        cache.incr(f'{key}:sequence')
+
+    def reset(self):
+        cache.set('recipe_index:generation', time.time_ns(), None)
+
+    def sync(self):
+        """Догоняет журнал или перестраивает индекс."""
+        generation = self.current_generation()
+        sequence = cache.get(f'recipe_index:{generation}:sequence', 0)
+        if generation == self.generation and sequence == self.sequence:
+            return
+        with self.lock:
+            if generation != self.generation or not (
+                0 <= sequence - self.sequence <= MAX_LOG_GAP
+            ):
+                return self.build(generation, sequence)
+            keys = [
+                f'recipe_index:{generation}:{number}'
+                for number in range(self.sequence + 1, sequence + 1)
+            ]
+            entries = cache.get_many(keys)
+            if len(entries) < len(keys):
+                return self.build(generation, sequence)
+            for key in keys:
+                self.apply(entries[key])
+            self.sequence = sequence
+
+    def build(self, generation, sequence):
+        # Номер журнала взят до чтения базы: записи, уже вошедшие в
+        # снимок, при догонянии применятся повторно, и это безопасно.
+        self.postings, self.sizes, self.by_size = {}, array('H'), {}
+        rows = RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator(chunk_size=10000)
+        for ingredient_id, group in groupby(rows, key=itemgetter(0)):
+            postings = array('I', (pk for _, pk in group))
+            for pk in postings:
+                self.grow(pk)
+                self.sizes[pk] += 1
+            self.postings[ingredient_id] = postings
+        threshold = self.dense_threshold()
+        for ingredient_id, postings in self.postings.items():
+            if len(postings) > threshold:
+                self.postings[ingredient_id] = to_bitmap(postings)
+        by_size = {}
+        for pk, size in enumerate(self.sizes):
+            if size:
+                by_size.setdefault(size, array('I')).append(pk)
+        self.by_size = {
+            size: to_bitmap(ids) for size, ids in by_size.items()
+        }
+        self.generation, self.sequence = generation, sequence
+
+    # Изменение индекса.
+
+    def dense_threshold(self):
+        """Длина списка, после которой битовая карта не больше массива."""
+        return max(len(self.sizes) // 32, 64)
+
+    def grow(self, pk):
+        if pk >= len(self.sizes):
+            self.sizes.extend([0] * (pk + 1 - len(self.sizes)))
+
+    def apply(self, changes):
+        for recipe_id, ingredient_id, present in changes:
+            if ingredient_id is None:
+                self.refresh(recipe_id)
+            else:
+                self.toggle(recipe_id, ingredient_id, present)
+
+    def refresh(self, recipe_id):
+        actual = set(RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True))
+        for ingredient_id in actual.union(self.postings):
+            self.toggle(recipe_id, ingredient_id, ingredient_id in actual)
+
+    def toggle(self, recipe_id, ingredient_id, present):
+        postings = self.postings.get(ingredient_id, array('I'))
+        if contains(postings, recipe_id) == present:
+            return
+        if isinstance(postings, int):
+            postings ^= 1 << recipe_id
+        elif present:
+            postings.insert(bisect_left(postings, recipe_id), recipe_id)
+        else:
+            postings.pop(bisect_left(postings, recipe_id))
+        self.grow(recipe_id)
+        if not isinstance(postings, int) and (
+            len(postings) > self.dense_threshold()
+        ):
+            postings = to_bitmap(postings)
+        self.postings[ingredient_id] = postings
+        size = self.sizes[recipe_id]
+        if size:
+            self.by_size[size] ^= 1 << recipe_id
+        size += 1 if present else -1
+        self.sizes[recipe_id] = size
+        if size:
+            self.by_size[size] = self.by_size.get(size, 0) | 1 << recipe_id
+
+    # Запросы.
+
+    def bitmap(self, ingredient_id):
+        return to_bitmap(self.postings.get(ingredient_id, 0))
+
+    def with_missing(self, have, missing):
+        """Рецепты, где не хватает не больше missing продуктов из have.
+
+        ge[c] — рецепты, где из have есть хотя бы c продуктов; рецепт из
+        n продуктов подходит, если он входит в ge[n - missing].
+        """
+        have = [self.bitmap(pk) for pk in set(have)]
+        top = max(min(len(have), max(self.by_size, default=0) - missing), 0)
+        ge = [0] * (top + 1)
+        for bits in have:
+            for count in range(top, 1, -1):
+                ge[count] |= ge[count - 1] & bits
+            if top:
+                ge[1] |= bits
+        result = 0
+        for size, recipes in self.by_size.items():
+            if size <= missing:
+                result |= recipes
+            elif size - missing <= top:
+                result |= recipes & ge[size - missing]
+        return result
+
+    def search(self, all_of=(), any_of=(), none_of=(), have=None, missing=0):
+        """id рецептов по наборам продуктов и признак исключения.
+
+        Возвращает (ids, exclude): при exclude = True ids нужно
+        исключить из выдачи, иначе — оставить только их.
+        """
+        self.sync()
+        include = None
+        for pk in all_of:
+            bits = self.bitmap(pk)
+            include = bits if include is None else include & bits
+        if any_of:
+            bits = 0
+            for pk in any_of:
+                bits |= self.bitmap(pk)
+            include = bits if include is None else include & bits
+        if have is not None:
+            bits = self.with_missing(have, missing)
+            include = bits if include is None else include & bits
+        excluded = 0
+        for pk in none_of:
+            excluded |= self.bitmap(pk)
+        if include is None:
+            return from_bitmap(excluded), True
+        return from_bitmap(include & ~excluded), False
+
+
+def filter_ids(recipes, ids, exclude=False):
+    """Оставляет (или исключает) рецепты из длинного списка id.
+
+    Список передаётся одним параметром: массивом на PostgreSQL и
+    JSON-массивом на SQLite, поэтому размер запроса не растёт.
+    """
+    if not ids:
+        return recipes if exclude else recipes.none()
+    table = Recipe._meta.db_table
+    if connection.vendor == 'postgresql':
+        condition = RawSQL(
+            f'{table}.id = ANY(%s::bigint[])', [ids],
+            output_field=BooleanField()
+        )
+    elif connection.vendor == 'sqlite':
+        condition = RawSQL(
+            f'{table}.id IN (SELECT value FROM json_each(%s))',
+            [json.dumps(ids)], output_field=BooleanField()
+        )
+    else:
+        condition = Q(pk__in=ids)
+    return recipes.exclude(condition) if exclude else recipes.filter(
+        condition
+    )
+
+
+recipe_index = RecipeIngredientIndex()
@@ -0,0 +1,176 @@
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import Job
+from recipes.storage import private_storage
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: полное имя функции -> функция.
+TASKS = {}
+
+
+def task(func):
+    """Регистрирует функцию как задачу очереди.
+
+    Аргументы задачи хранятся в JSON, поэтому функция принимает только
+    именованные JSON-совместимые аргументы и возвращает JSON или None.
+    """
+    TASKS[f'{func.__module__}.{func.__name__}'] = func
+    return func
+
+
+def enqueue(func, user=None, priority=0, **payload):
+    """Ставит задачу в очередь; выполнит её процесс run_workers."""
+    name = f'{func.__module__}.{func.__name__}'
+    if name not in TASKS:
+        raise ValueError(f'Задача {name} не зарегистрирована.')
+    return Job.objects.create(
+        name=name, payload=payload, user=user, priority=priority
+    )
+
+
+def claim():
+    """Забирает следующую готовую задачу или возвращает None.
+
+    На PostgreSQL строки выбираются с FOR UPDATE SKIP LOCKED, и
+    воркеры не ждут друг друга. Условный UPDATE страхует СУБД без
+    блокировки строк: задачу получит только один воркер.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            pending = Job.objects.filter(
+                status=Job.PENDING,
+                run_after__lte=now,
+                attempts__lt=F('max_attempts'),
+            ).order_by('-priority', 'run_after', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            job = pending.first()
+            if job is None:
+                return None
+            claimed = Job.objects.filter(
+                pk=job.pk, status=Job.PENDING
+            ).update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                locked_at=now,
+                heartbeat_at=now,
+                updated_at=now,
+            )
+        if claimed:
+            job.status, job.attempts, job.locked_at = (
+                Job.RUNNING, job.attempts + 1, now
+            )
+            return job
+
+
+@contextmanager
+def heartbeat(job):
+    """Отмечает в heartbeat_at, что воркер жив, пока задача выполняется.
+
+    Отметки пишет отдельный поток со своим соединением с базой; после
+    выхода из блока поток останавливается и закрывает соединение.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                Job.objects.filter(
+                    pk=job.pk, locked_at=job.locked_at
+                ).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job):
+    """Выполняет задачу и записывает результат или ошибку.
+
+    Неудачная попытка возвращает задачу в очередь с экспоненциальной
+    задержкой, пока не исчерпан max_attempts. Если задачу уже вернули в
+    очередь как брошенную, итог этой попытки не записывается.
+    """
+    now = timezone.now()
+    try:
+        with heartbeat(job):
+            job.result = TASKS[job.name](**job.payload)
+    except Exception:
+        logger.exception('Задача %s упала', job)
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = now + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status, job.error = Job.DONE, ''
+    Job.objects.filter(pk=job.pk, locked_at=job.locked_at).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        locked_at=None,
+        heartbeat_at=None,
+        updated_at=timezone.now(),
+    )
+
+
+def release_stale():
+    """Разбирает задачи, чей воркер перестал отмечаться.
+
+    Задачи с исчерпанными попытками помечаются упавшими, остальные
+    возвращаются в очередь. Возвращает число разобранных задач.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error='Воркер перестал отвечать во время выполнения.',
+        locked_at=None,
+        heartbeat_at=None,
+        updated_at=now,
+    )
+    return failed + stale.update(
+        status=Job.PENDING, locked_at=None, heartbeat_at=None, updated_at=now
+    )
+
+
+def prune():
+    """Удаляет завершённые задачи старше JOB_RESULT_TTL с их файлами.
+
+    Файл результата задача кладёт в private_storage и указывает в
+    result['file'].
+    """
+    finished = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        updated_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_RESULT_TTL
+        ),
+    )
+    for result in finished.values_list('result', flat=True).iterator():
+        if isinstance(result, dict) and result.get('file'):
+            private_storage.delete(result['file'])
+    return finished.delete()[0]
@@ -0,0 +1,661 @@
+import base64
+import json
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import count
+from typing import Callable, Optional
+from urllib.parse import parse_qs, quote, urlsplit
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.urls import router
+from recipes.counters import recount
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    Job,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    SimilarRecipe,
+    Subscription,
+    Tag,
+    User,
+)
+from recipes.shortlinks import encode_short_code, hit_buffer
+from recipes.similar import build_similar
+from recipes.storage import private_storage
+from recipes.trending import refresh_trending
+
+PASSWORD = 'Bench-pa55word'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+IMAGE_NAME = 'recipes/image/bench.png'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+EXTRA_ROUTES = ('api:login', 'api:logout', 'recipes:redirect_short_link')
+
+
+@dataclass
+class Scenario:
+    """Один замеряемый запрос.
+
+    prepare вызывается перед каждым повтором (вне замера) и возвращает
+    клиент, url и тело запроса.
+    """
+
+    name: str
+    method: str
+    prepare: Callable[[], tuple]
+    budget: Optional[int]
+    status: int = 200
+
+
+@dataclass
+class Result:
+    scenario: Scenario
+    view_name: str
+    queries: int = 0
+    statuses: set = field(default_factory=set)
+    timings: list = field(default_factory=list)
+    size: int = 0
+
+    def percentile(self, percent):
+        timings = sorted(self.timings)
+        index = max(0, round(percent / 100 * len(timings)) - 1)
+        return timings[index] * 1000
+
+    @property
+    def over_budget(self):
+        budget = self.scenario.budget
+        return budget is not None and self.queries > budget
+
+    def as_dict(self):
+        return {
+            'name': self.scenario.name,
+            'view': self.view_name,
+            'queries': self.queries,
+            'budget': self.scenario.budget,
+            'status': sorted(self.statuses),
+            'p50_ms': round(self.percentile(50), 2),
+            'p90_ms': round(self.percentile(90), 2),
+            'p99_ms': round(self.percentile(99), 2),
+            'size': self.size,
+        }
+
+
+class Dataset:
+    """Воспроизводимый набор данных для замеров."""
+
+    def __init__(self, users, recipes, ingredients, seed):
+        self.random = random.Random(seed)
+        self.counter = count()
+        password = make_password(PASSWORD)
+        default_storage.save(IMAGE_NAME, ContentFile(
+            base64.b64decode(IMAGE.split(',', 1)[1])
+        ))
+        self.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', slug=f'tag-{i}') for i in range(10)
+        )
+        self.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'продукт {i:05}', measurement_unit='г')
+            for i in range(ingredients)
+        )
+        self.users = User.objects.bulk_create(
+            User(
+                username=f'user{i}',
+                email=f'user{i}@bench.ru',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for i in range(users)
+        )
+        now = timezone.now()
+        self.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {i}',
+                author=self.random.choice(self.users),
+                image=IMAGE_NAME,
+                text='Описание рецепта. ' * 20,
+                cooking_time=self.random.randint(1, 120),
+                created_at=now - timedelta(minutes=i),
+            )
+            for i in range(recipes)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient,
+                amount=self.random.randint(1, 500)
+            )
+            for recipe in self.recipes
+            for ingredient in self.random.sample(
+                self.ingredients, self.random.randint(3, 12)
+            )
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in self.recipes
+            for tag in self.random.sample(self.tags, self.random.randint(1, 3))
+        )
+        self.user = self.users[0]
+        others = self.users[1:]
+        Subscription.objects.bulk_create(
+            Subscription(follower=self.user, author=author)
+            for author in self.random.sample(others, min(len(others), 20))
+        )
+        for model in (Favourite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=self.user, recipe=recipe)
+                for recipe in self.random.sample(
+                    self.recipes, min(len(self.recipes), 15)
+                )
+            )
+        recount(apps)
+        refresh_trending()
+        build_similar()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@bench.ru', password=PASSWORD,
+            first_name='Админ', last_name='Админ',
+        )
+        self.client = self.token_client(self.user)
+        self.anonymous = APIClient(raise_request_exception=False)
+        self.admin_client = APIClient(raise_request_exception=False)
+        self.admin_client.force_login(self.admin)
+
+    def token_client(self, user):
+        client = APIClient(raise_request_exception=False)
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def new_user(self):
+        number = next(self.counter)
+        return User.objects.create_user(
+            username=f'scratch{number}',
+            email=f'scratch{number}@bench.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+            password=PASSWORD,
+        )
+
+    def own_recipe(self):
+        recipe = Recipe.objects.create(
+            name='Свой рецепт',
+            author=self.user,
+            image=IMAGE_NAME,
+            text='Описание',
+            cooking_time=10,
+        )
+        recipe.tags.set(self.tags[:2])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in self.ingredients[:5]
+        )
+        return recipe
+
+    def recipe_payload(self, ingredients=8):
+        return {
+            'name': 'Рецепт из замера',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': IMAGE,
+            'tags': [tag.id for tag in self.tags[:3]],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 25}
+                for ingredient in self.random.sample(
+                    self.ingredients, ingredients
+                )
+            ],
+        }
+
+    def unrelated_recipe(self, model):
+        """Рецепт, которого нет у пользователя в model."""
+        recipe = self.random.choice(self.recipes)
+        model.objects.filter(user=self.user, recipe=recipe).delete()
+        return recipe
+
+    def related_recipe(self, model):
+        recipe = self.random.choice(self.recipes)
+        model.objects.get_or_create(user=self.user, recipe=recipe)
+        return recipe
+
+    def job(self):
+        name = private_storage.save(
+            'shopping_lists/x.txt', ContentFile('Список покупок'.encode())
+        )
+        return Job.objects.create(
+            name='api.tasks.render_shopping_list', user=self.user,
+            status=Job.DONE,
+            result={'file': name, 'filename': 'shopping_list.txt'},
+        )
+
+    def recipe_batch(self, model, related, size=10):
+        """id пачки рецептов, которые есть (или нет) у пользователя в model."""
+        recipes = self.random.sample(self.recipes, size)
+        links = model.objects.filter(user=self.user, recipe__in=recipes)
+        links.delete()
+        if related:
+            model.objects.bulk_create(
+                model(user=self.user, recipe=recipe) for recipe in recipes
+            )
+        return {'recipes': [recipe.id for recipe in recipes]}
+
+    def recipe_with_similar(self):
+        source = SimilarRecipe.objects.values_list(
+            'recipe_id', flat=True
+        ).first()
+        return self.recipes[0] if source is None else Recipe(pk=source)
+
+    def unfollowed_author(self):
+        author = self.random.choice(self.users[1:])
+        Subscription.objects.filter(
+            follower=self.user, author=author
+        ).delete()
+        return author
+
+    def followed_author(self):
+        author = self.random.choice(self.users[1:])
+        Subscription.objects.get_or_create(follower=self.user, author=author)
+        return author
+
+
+def build_scenarios(data):
+    """Сценарии для всех маршрутов API, короткой ссылки и админки."""
+    client, anonymous = data.client, data.anonymous
+    recipe = data.recipes[0]
+    author = data.users[1]
+
+    def get(url, http=None):
+        return lambda: (http or client, url, None)
+
+    def deep(url, depth):
+        """Курсор после depth первых записей; считается один раз."""
+        cursor = []
+        url += '&' if '?' in url else '?'
+
+        def prepare():
+            if not cursor:
+                link = client.get(f'{url}cursor=&limit={depth}').json()
+                cursor.append(quote(
+                    parse_qs(urlsplit(link['next']).query)['cursor'][0]
+                ))
+            return client, f'{url}cursor={cursor[0]}', None
+        return prepare
+
+    def scratch(method_url, payload=None):
+        def prepare():
+            user = data.new_user()
+            return data.token_client(user), method_url, payload
+        return prepare
+
+    return [
+        Scenario('api root', 'get', get('/api/'), 1),
+        Scenario('token login', 'post', lambda: (
+            anonymous, '/api/auth/token/login/',
+            {'email': data.user.email, 'password': PASSWORD}
+        ), 3),
+        Scenario('token logout', 'post', scratch('/api/auth/token/logout/'),
+                 4, 204),
+        Scenario('tags list', 'get', get('/api/tags/', anonymous), 0),
+        Scenario('tag detail', 'get',
+                 get(f'/api/tags/{data.tags[0].id}/', anonymous), 0),
+        Scenario('ingredients list', 'get',
+                 get('/api/ingredients/', anonymous), 0),
+        Scenario('ingredients search', 'get',
+                 get('/api/ingredients/?name=продукт 001', anonymous), 0),
+        Scenario('ingredient detail', 'get', get(
+            f'/api/ingredients/{data.ingredients[0].id}/', anonymous
+        ), 0),
+        Scenario('recipes list', 'get', get('/api/recipes/'), 5),
+        Scenario('recipes list limit=50', 'get',
+                 get('/api/recipes/?limit=50'), 5),
+        Scenario('recipes list cursor', 'get',
+                 get('/api/recipes/?cursor='), 5),
+        Scenario('recipes list deep cursor', 'get', deep(
+            '/api/recipes/', len(data.recipes) - 10
+        ), 5),
+        Scenario('recipes list anonymous', 'get',
+                 get('/api/recipes/', anonymous), 4),
+        Scenario('recipes list favorited', 'get',
+                 get('/api/recipes/?is_favorited=1'), 5),
+        Scenario('recipes list by tags', 'get', get(
+            f'/api/recipes/?tags={data.tags[0].slug}'
+            f'&tags={data.tags[1].slug}&author={author.id}'
+        ), 6),
+        Scenario('recipes search', 'get',
+                 get('/api/recipes/?search=рецепт 12'), 5),
+        Scenario('recipes search with tags', 'get', get(
+            f'/api/recipes/?search=описание&tags={data.tags[0].slug}'
+        ), 6),
+        Scenario('recipes by ingredients', 'get', get(
+            '/api/recipes/?ingredients_any='
+            + ','.join(str(item.id) for item in data.ingredients[:20])
+            + f'&ingredients_none={data.ingredients[20].id}'
+        ), 5),
+        Scenario('recipes from pantry', 'get', get(
+            '/api/recipes/?missing=2&ingredients_have='
+            + ','.join(str(item.id) for item in data.ingredients[:50])
+        ), 5),
+        Scenario('recipes feed', 'get', get('/api/recipes/feed/'), 6),
+        Scenario('recipes feed deep cursor', 'get',
+                 deep('/api/recipes/feed/', 50), 6),
+        Scenario('recipes trending', 'get',
+                 get('/api/recipes/?ordering=trending'), 5),
+        Scenario('recipes trending cursor', 'get', deep(
+            '/api/recipes/?ordering=trending', 50
+        ), 5),
+        Scenario('recipe detail', 'get',
+                 get(f'/api/recipes/{recipe.id}/'), 2),
+        Scenario('recipe create', 'post', lambda: (
+            client, '/api/recipes/', data.recipe_payload()
+        ), 17, 201),
+        Scenario('recipe update', 'patch', lambda: (
+            client, f'/api/recipes/{data.own_recipe().id}/',
+            data.recipe_payload()
+        ), 21),
+        Scenario('recipe delete', 'delete', lambda: (
+            client, f'/api/recipes/{data.own_recipe().id}/', None
+        ), 15, 204),
+        Scenario('recipe similar', 'get', get(
+            f'/api/recipes/{data.recipe_with_similar().id}/similar/'
+        ), 2),
+        Scenario('recipe short link', 'get',
+                 get(f'/api/recipes/{recipe.id}/get-link/'), 1),
+        Scenario('short link redirect', 'get', get(
+            f'/s/{encode_short_code(recipe.id)}/', anonymous
+        ), 0, 302),
+        Scenario('legacy short link redirect', 'get',
+                 get(f'/s/{recipe.id}/', anonymous), 0, 302),
+        Scenario('download shopping cart', 'get',
+                 get('/api/recipes/download_shopping_cart/'), 2),
+        Scenario('download shopping cart csv', 'get',
+                 get('/api/recipes/download_shopping_cart/?format=csv'), 2),
+        Scenario('download shopping cart pdf', 'get',
+                 get('/api/recipes/download_shopping_cart/?format=pdf'), 2),
+        Scenario('download shopping cart async', 'post', lambda: (
+            client, '/api/recipes/download_shopping_cart/async/',
+            {'format': 'pdf'}
+        ), 2, 202),
+        Scenario('job status', 'get',
+                 lambda: (client, f'/api/jobs/{data.job().id}/', None), 2),
+        Scenario('job download', 'get', lambda: (
+            client, f'/api/jobs/{data.job().id}/download/', None
+        ), 2),
+        Scenario('shopping cart add', 'post', lambda: (
+            client,
+            f'/api/recipes/{data.unrelated_recipe(ShoppingCart).id}'
+            '/shopping_cart/', None
+        ), 6, 201),
+        Scenario('shopping cart remove', 'delete', lambda: (
+            client,
+            f'/api/recipes/{data.related_recipe(ShoppingCart).id}'
+            '/shopping_cart/', None
+        ), 6, 204),
+        Scenario('shopping cart bulk add', 'post', lambda: (
+            client, '/api/recipes/shopping_cart/',
+            data.recipe_batch(ShoppingCart, related=False)
+        ), 6),
+        Scenario('shopping cart bulk remove', 'delete', lambda: (
+            client, '/api/recipes/shopping_cart/',
+            data.recipe_batch(ShoppingCart, related=True)
+        ), 7),
+        Scenario('favorite bulk add', 'post', lambda: (
+            client, '/api/recipes/favorite/',
+            data.recipe_batch(Favourite, related=False)
+        ), 7),
+        Scenario('favorite bulk remove', 'delete', lambda: (
+            client, '/api/recipes/favorite/',
+            data.recipe_batch(Favourite, related=True)
+        ), 17),
+        Scenario('favorite add', 'post', lambda: (
+            client,
+            f'/api/recipes/{data.unrelated_recipe(Favourite).id}/favorite/',
+            None
+        ), 7, 201),
+        Scenario('favorite remove', 'delete', lambda: (
+            client,
+            f'/api/recipes/{data.related_recipe(Favourite).id}/favorite/',
+            None
+        ), 7, 204),
+        Scenario('users list', 'get', get('/api/users/'), 4),
+        Scenario('user create', 'post', lambda: (
+            anonymous, '/api/users/', {
+                'email': f'new{next(data.counter)}@bench.ru',
+                'username': f'new{next(data.counter)}',
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'password': PASSWORD,
+            }
+        ), 5, 201),
+        Scenario('user detail', 'get',
+                 get(f'/api/users/{author.id}/'), 3),
+        Scenario('user update', 'patch', lambda: (
+            client, f'/api/users/{data.user.id}/', {'first_name': 'Имя'}
+        ), 4),
+        Scenario('user delete', 'delete', lambda: (
+            data.token_client(data.new_user()), '/api/users/me/', None
+        ), 1, 405),
+        Scenario('user me', 'get', get('/api/users/me/'), 2),
+        Scenario('avatar update', 'put', lambda: (
+            client, '/api/users/me/avatar/', {'avatar': IMAGE}
+        ), 3),
+        Scenario('avatar delete', 'delete', scratch('/api/users/me/avatar/'),
+                 1, 404),
+        Scenario('subscriptions', 'get', get(
+            '/api/users/subscriptions/?recipes_limit=3'
+        ), 3),
+        Scenario('subscriptions cursor', 'get', deep(
+            '/api/users/subscriptions/', 10
+        ), 3),
+        Scenario('subscribe', 'post', lambda: (
+            client,
+            f'/api/users/{data.unfollowed_author().id}/subscribe/'
+            '?recipes_limit=3', None
+        ), 10, 201),
+        Scenario('unsubscribe', 'delete', lambda: (
+            client, f'/api/users/{data.followed_author().id}/subscribe/',
+            None
+        ), 8, 204),
+        Scenario('set password', 'post', scratch(
+            '/api/users/set_password/',
+            {'current_password': PASSWORD, 'new_password': PASSWORD + '1'}
+        ), 2, 204),
+        Scenario('set email', 'post', scratch(
+            '/api/users/set_email/',
+            {'current_password': PASSWORD, 'new_email': 'x@bench.ru'}
+        ), 2, 400),
+        Scenario('activation', 'post', lambda: (
+            anonymous, '/api/users/activation/',
+            {'uid': 'MQ', 'token': 'bad'}
+        ), 1, 400),
+        Scenario('resend activation', 'post', lambda: (
+            anonymous, '/api/users/resend_activation/',
+            {'email': data.user.email}
+        ), 1, 400),
+        Scenario('reset password', 'post', lambda: (
+            anonymous, '/api/users/reset_password/',
+            {'email': 'nobody@bench.ru'}
+        ), 1, 204),
+        Scenario('reset password confirm', 'post', lambda: (
+            anonymous, '/api/users/reset_password_confirm/',
+            {'uid': 'MQ', 'token': 'bad', 'new_password': PASSWORD}
+        ), 1, 400),
+        Scenario('reset email', 'post', lambda: (
+            anonymous, '/api/users/reset_email/',
+            {'email': 'nobody@bench.ru'}
+        ), 1, 204),
+        Scenario('reset email confirm', 'post', lambda: (
+            anonymous, '/api/users/reset_email_confirm/',
+            {'uid': 'MQ', 'token': 'bad', 'new_email': 'y@bench.ru'}
+        ), 2, 400),
+        Scenario('admin recipes', 'get', get(
+            '/admin/recipes/recipe/', data.admin_client
+        ), 9),
+        Scenario('admin users', 'get', get(
+            '/admin/recipes/user/', data.admin_client
+        ), 6),
+        Scenario('admin tags', 'get', get(
+            '/admin/recipes/tag/', data.admin_client
+        ), 5),
+        Scenario('admin ingredients', 'get', get(
+            '/admin/recipes/ingredient/', data.admin_client
+        ), 6),
+    ]
+
+
+class Command(BaseCommand):
+    """Замер числа SQL-запросов и задержек эндпоинтов на тестовых данных.
+
+    Данные создаются во временной тестовой базе: in-memory SQLite при
+    DB_ENGINE=sqlite, иначе test_<имя базы> на настроенном PostgreSQL.
+    Команда завершается ошибкой, если эндпоинт превысил бюджет запросов
+    или какой-то маршрут API остался без сценария.
+    """
+
+    help = 'Бенчмарк эндпоинтов API: SQL-запросы, задержки, размер ответа'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients', type=int, default=2200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--only', help='Замерять только сценарии с этой подстрокой'
+        )
+        parser.add_argument('--json', help='Сохранить результаты в файл')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                # Сброс счётчиков переходов отключён, чтобы он не попадал
+                # в случайный замер редиректа. Копии картинок строятся
+                # синхронно: их запрос учитывается в сценарии загрузки.
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    PRIVATE_MEDIA_ROOT=media_root,
+                    PASSWORD_HASHERS=FAST_HASHERS,
+                    SHORT_LINK_HITS_FLUSH_SIZE=float('inf'),
+                    SHORT_LINK_HITS_FLUSH_INTERVAL=float('inf'),
+                    THUMBNAIL_WORKERS=0,
+                ):
+                    results = self.run(options)
+        finally:
+            hit_buffer.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w', encoding='UTF-8') as file:
+                json.dump(
+                    [result.as_dict() for result in results], file,
+                    ensure_ascii=False, indent=2
+                )
+        self.check_results(results, check_coverage=not options['only'])
+
+    def run(self, options):
+        cache.clear()
+        started = time.perf_counter()
+        data = Dataset(
+            options['users'], options['recipes'],
+            options['ingredients'], options['seed']
+        )
+        self.stdout.write(
+            f'{connection.vendor}: данные созданы за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+        return [
+            self.measure(scenario, options['repeat'])
+            for scenario in build_scenarios(data)
+            if not options['only'] or options['only'] in scenario.name
+        ]
+
+    def measure(self, scenario, repeat):
+        result = None
+        for _ in range(max(repeat, 1) + 1):
+            client, url, payload = scenario.prepare()
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, scenario.method)(
+                    url, payload, format='json'
+                )
+                content = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                elapsed = time.perf_counter() - started
+            if result is None:
+                # Первый прогон прогревает кеши и не входит в замер.
+                result = Result(scenario, resolve(url.split('?')[0]).view_name)
+                continue
+            result.queries = max(result.queries, len(queries))
+            result.statuses.add(response.status_code)
+            result.timings.append(elapsed)
+            result.size = len(content)
+        return result
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"сценарий":<28}{"SQL":>5}{"бюджет":>8}'
+            f'{"p50 мс":>9}{"p90 мс":>9}{"p99 мс":>9}{"байт":>9}'
+        )
+        for result in results:
+            budget = result.scenario.budget
+            line = (
+                f'{result.scenario.name:<28}{result.queries:>5}'
+                f'{"-" if budget is None else budget:>8}'
+                f'{result.percentile(50):>9.2f}{result.percentile(90):>9.2f}'
+                f'{result.percentile(99):>9.2f}{result.size:>9}'
+            )
+            self.stdout.write(
+                self.style.ERROR(line) if result.over_budget else line
+            )
+
+    def check_results(self, results, check_coverage):
+        errors = [
+            f'{result.scenario.name}: {result.queries} запросов '
+            f'при бюджете {result.scenario.budget}'
+            for result in results if result.over_budget
+        ]
+        errors.extend(
+            f'{result.scenario.name}: статус {sorted(result.statuses)}, '
+            f'ожидался {result.scenario.status}'
+            for result in results
+            if result.statuses != {result.scenario.status}
+        )
+        if check_coverage:
+            covered = {result.view_name for result in results}
+            routes = {f'api:{url.name}' for url in router.urls}
+            errors.extend(
+                f'маршрут {route} не покрыт сценарием'
+                for route in sorted(routes.union(EXTRA_ROUTES) - covered)
+            )
+        if errors:
+            raise CommandError('\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similar import CHUNK_SIZE, build_similar
+
+
+class Command(BaseCommand):
+    """Построение списков похожих рецептов по наборам продуктов.
+
+    Сигнатуры MinHash всех рецептов считаются в NumPy, кандидаты
+    находятся по корзинам LSH. Нужна после первого развёртывания и
+    после import_recipes: изменения отдельных рецептов дальше
+    подхватывают фоновые задачи refresh_similar.
+    """
+
+    help = 'Построить списки похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recipes, pairs, rows = build_similar(options['batch_size'])
+        self.stdout.write(
+            f'Рецептов: {recipes}, пар-кандидатов: {pairs}, '
+            f'похожих сохранено: {rows}. '
+            f'{time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from recipes.models import Recipe, User
+from recipes.thumbnails import run_in_worker
+
+
+class Command(BaseCommand):
+    """Построение копий для картинок, у которых их ещё нет.
+
+    Нужна после первого развёртывания и после смены THUMBNAIL_SIZES
+    (с флагом --all): новые загрузки обрабатываются пулом сами.
+    """
+
+    help = 'Построить уменьшенные копии картинок рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить копии для всех картинок'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1
+        )
+
+    def handle(self, *args, **options):
+        tasks = []
+        for model, field_name in ((Recipe, 'image'), (User, 'avatar')):
+            images = model.objects.exclude(
+                Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''})
+            )
+            if not options['all']:
+                images = images.exclude(
+                    **{f'{field_name}_thumbnailed': F(field_name)}
+                )
+            tasks.extend(
+                (model, pk, field_name, name)
+                for pk, name in images.values_list('pk', field_name)
+            )
+        with ThreadPoolExecutor(options['workers']) as executor:
+            for task in tasks:
+                executor.submit(run_in_worker, *task)
+        self.stdout.write(f'Обработано картинок: {len(tasks)}')
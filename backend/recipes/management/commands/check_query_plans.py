@@ -0,0 +1,217 @@
+import difflib
+import json
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import RequestFactory
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+from rest_framework.request import Request
+
+from api.utils import shopping_list_ingredients, shopping_list_recipes
+from api.views import RecipeViewSet
+from recipes.management.commands.benchmark_api import Dataset
+from recipes.models import Favourite, Recipe, SimilarRecipe, Tag, User
+
+SNAPSHOTS_DIR = Path(__file__).resolve().parents[2] / 'plans'
+PAGE = 7
+# Узлы плана, означающие полный проход по таблице.
+SEQ_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^\s*SCAN (\w+)$'),
+}
+
+
+def api_queryset(url, user):
+    """Queryset, который RecipeViewSet строит для GET url."""
+    request = Request(RequestFactory().get(url))
+    request.user = user
+    view = RecipeViewSet(
+        request=request, action='list', format_kwarg=None, kwargs={}
+    )
+    return view.filter_queryset(view.get_queryset())
+
+
+def hot_queries():
+    """Запросы горячих путей API в том виде, в каком их строит ORM."""
+    user = User.objects.annotate(
+        total=Count('favourites')
+    ).order_by('-total', 'pk').first()
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    middle = Recipe.objects.order_by('-created_at', 'id')[
+        Recipe.objects.count() // 2:
+    ].values('created_at', 'id').first()
+    tag_query = '&'.join(f'tags={slug}' for slug in tags)
+    return {
+        'recipes list': api_queryset('/api/recipes/', user)[:PAGE],
+        'recipes count': api_queryset('/api/recipes/', user),
+        'recipes keyset page': api_queryset(
+            '/api/recipes/', user
+        ).filter(
+            Q(created_at__lt=middle['created_at'])
+            | Q(created_at=middle['created_at'], id__gt=middle['id'])
+        )[:PAGE],
+        'recipes by tags': api_queryset(
+            f'/api/recipes/?{tag_query}', user
+        )[:PAGE],
+        'recipes by author': api_queryset(
+            f'/api/recipes/?author={user.pk}', user
+        )[:PAGE],
+        'recipes search': api_queryset(
+            '/api/recipes/?search=рецепт', user
+        )[:PAGE],
+        'recipes trending': api_queryset(
+            '/api/recipes/?ordering=trending', user
+        )[:PAGE],
+        'recipes favorited': api_queryset(
+            '/api/recipes/?is_favorited=1', user
+        )[:PAGE],
+        'recipes in shopping cart': api_queryset(
+            '/api/recipes/?is_in_shopping_cart=1', user
+        )[:PAGE],
+        'similar recipes': SimilarRecipe.objects.filter(
+            recipe_id=middle['id']
+        ).select_related('similar').order_by('-score', '-similar_id'),
+        'favourite exists': Favourite.objects.filter(
+            user=user, recipe_id=middle['id']
+        ),
+        'subscriptions': User.objects.filter(
+            authors__follower=user
+        )[:PAGE],
+        'shopping list ingredients': shopping_list_ingredients(user),
+        'shopping list recipes': shopping_list_recipes(user),
+    }
+
+
+def explain(queryset):
+    """Строки EXPLAIN для запроса queryset.
+
+    QuerySet.explain() не годится: для values()-запросов он прогоняет
+    строки плана через итератор значений и теряет их текст.
+    """
+    sql, params = queryset.query.get_compiler(
+        connection=connection
+    ).as_sql()
+    prefix = (
+        'EXPLAIN' if connection.vendor == 'postgresql'
+        else 'EXPLAIN QUERY PLAN'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_shape(plan):
+    """План без стоимостей, оценок строк и условий: только узлы."""
+    if connection.vendor == 'postgresql':
+        lines = []
+        for line in plan:
+            node = line.strip().lstrip('->').strip()
+            if ':' in node:
+                continue
+            indent = len(line) - len(line.lstrip())
+            lines.append(
+                ' ' * indent + re.sub(r'\s+\(cost=.*\)$', '', node)
+            )
+        return lines
+    return plan
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов горячих путей API.
+
+    Для каждого запроса выполняется EXPLAIN, план сводится к дереву узлов
+    и сравнивается со снимком в recipes/plans/<СУБД>.json. Команда
+    завершается ошибкой, если план изменился или в нём появился полный
+    проход по таблице, где строк не меньше --min-rows.
+    """
+
+    help = 'Сравнить планы горячих запросов со снимками (EXPLAIN)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Перезаписать снимки текущими планами'
+        )
+        parser.add_argument('--min-rows', type=int, default=10_000)
+        parser.add_argument(
+            '--dataset', action='store_true',
+            help='Построить планы на тестовой базе с данными бенчмарка'
+        )
+        parser.add_argument('--recipes', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not options['dataset']:
+            return self.compare_plans(options)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            Dataset(
+                users=options['recipes'] // 10,
+                recipes=options['recipes'],
+                ingredients=2200,
+                seed=options['seed'],
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.compare_plans(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def compare_plans(self, options):
+        path = SNAPSHOTS_DIR / f'{connection.vendor}.json'
+        snapshots = (
+            json.loads(path.read_text(encoding='UTF-8'))
+            if path.exists() else {}
+        )
+        plans = {
+            name: plan_shape(explain(queryset))
+            for name, queryset in hot_queries().items()
+        }
+        if options['update']:
+            path.parent.mkdir(exist_ok=True)
+            path.write_text(
+                json.dumps(plans, ensure_ascii=False, indent=2) + '\n',
+                encoding='UTF-8'
+            )
+            self.stdout.write(f'Снимки сохранены в {path}')
+            return
+        errors = []
+        for name, plan in plans.items():
+            if name not in snapshots:
+                errors.append(f'{name}: нет снимка, запустите с --update')
+            elif plan != snapshots[name]:
+                errors.append(f'{name}: план изменился')
+                self.stdout.write('\n'.join(difflib.unified_diff(
+                    snapshots[name], plan, 'снимок', 'сейчас', lineterm=''
+                )))
+            errors.extend(
+                f'{name}: полный проход по {table} ({rows} строк)'
+                for table, rows in self.seq_scans(plan)
+                if rows >= options['min_rows']
+            )
+        if errors:
+            raise CommandError('\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Планы совпадают со снимками.'))
+
+    def seq_scans(self, plan):
+        pattern = SEQ_SCANS[connection.vendor]
+        tables = {
+            match.group(1)
+            for match in map(pattern.search, plan) if match
+        }.intersection(connection.introspection.table_names())
+        for table in sorted(tables):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                yield table, cursor.fetchone()[0]
@@ -0,0 +1,121 @@
+import os
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import MediaBlob, Recipe, User
+from recipes.storage import content_storage
+
+UPLOAD_DIRS = tuple(
+    model._meta.get_field(field_name).upload_to.rstrip('/')
+    for model, field_name in ((Recipe, 'image'), (User, 'avatar'))
+)
+
+
+def walk(storage, path):
+    """Все файлы каталога path и его подкаталогов."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    """Сборка мусора в хранилище картинок.
+
+    Удаляются файлы, у которых в MediaBlob не осталось ссылок, вместе
+    с их уменьшенными копиями. Файл, который меняли или переиспользовали
+    позже --grace минут назад, не трогается: ссылка на него может быть
+    ещё не записана. С --orphans также находятся файлы без записи в
+    MediaBlob (загрузки из откаченных транзакций) и копии без оригинала;
+    они только перечисляются, а удаляются с --delete-orphans, когда
+    список проверен.
+    """
+
+    help = 'Удалить картинки, на которые не осталось ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=60)
+        parser.add_argument('--orphans', action='store_true')
+        parser.add_argument('--delete-orphans', action='store_true')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - timedelta(minutes=options['grace'])
+        removed = 0
+        for blob in MediaBlob.objects.filter(
+            refcount=0, updated_at__lt=self.cutoff
+        ).iterator():
+            if self.is_fresh(blob.name):
+                continue
+            if not self.dry_run and not MediaBlob.objects.filter(
+                pk=blob.pk, refcount=0
+            ).delete()[0]:
+                continue
+            removed += self.remove(blob.name, self.dry_run)
+        self.stdout.write(
+            f'{"Будет удалено" if self.dry_run else "Удалено"} '
+            f'картинок: {removed}'
+        )
+        if options['orphans'] or options['delete_orphans']:
+            dry_run = self.dry_run or not options['delete_orphans']
+            orphans = self.remove_orphans(dry_run)
+            self.stdout.write(
+                f'Картинок без записи в MediaBlob: {orphans}'
+                + (' (удалить: --delete-orphans)' if dry_run else ', удалены')
+            )
+
+    def is_fresh(self, name):
+        return (
+            content_storage.exists(name)
+            and content_storage.get_modified_time(name) >= self.cutoff
+        )
+
+    def remove(self, name, dry_run):
+        """Удаляет файл и все его копии; 1, если файл был."""
+        stem = os.path.splitext(posixpath.basename(name))[0] + '_'
+        directory = posixpath.join('thumbnails', posixpath.dirname(name))
+        thumbnails = [
+            posixpath.join(directory, file)
+            for file in (
+                default_storage.listdir(directory)[1]
+                if default_storage.exists(directory) else ()
+            )
+            if file.startswith(stem)
+        ]
+        existed = content_storage.exists(name)
+        self.stdout.write(f'- {name} (копий: {len(thumbnails)})')
+        # Файл могли переиспользовать, пока удалялась запись о нём.
+        if not dry_run and not self.is_fresh(name):
+            for path in thumbnails:
+                default_storage.delete(path)
+            content_storage.delete(name)
+        return int(existed)
+
+    def remove_orphans(self, dry_run):
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        stems = {os.path.splitext(name)[0] for name in known}
+        removed = 0
+        for upload_dir in UPLOAD_DIRS:
+            for name in walk(content_storage, upload_dir):
+                if name not in known and not self.is_fresh(name):
+                    removed += self.remove(name, dry_run)
+            for path in walk(
+                default_storage, posixpath.join('thumbnails', upload_dir)
+            ):
+                stem = path[len('thumbnails/'):].rsplit('_', 1)[0]
+                if (
+                    stem not in stems
+                    and default_storage.get_modified_time(path) < self.cutoff
+                ):
+                    self.stdout.write(f'- {path}')
+                    if not dry_run:
+                        default_storage.delete(path)
+        return removed
@@ -0,0 +1,84 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    """Выгрузка рецептов с продуктами и тегами в JSON Lines.
+
+    Одна строка — один рецепт; автор указывается email, теги — слагом,
+    продукты — названием и единицей измерения. Рецепты читаются пачками
+    по id, поэтому память не растёт с размером базы. Картинки не
+    выгружаются: в строке только имя файла в хранилище.
+    """
+
+    help = 'Выгрузить рецепты в JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['path'] == '-':
+            exported = self.export(sys.stdout, options['batch_size'])
+        else:
+            with open(options['path'], 'w', encoding='UTF-8') as file:
+                exported = self.export(file, options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено рецептов: {exported} за {elapsed:.1f} с '
+            f'({exported / max(elapsed, 1e-9):.0f} в секунду)'
+        )
+
+    def export(self, file, batch_size):
+        exported, last_id = 0, 0
+        while True:
+            recipes = list(
+                Recipe.objects.filter(id__gt=last_id).order_by('id').values(
+                    'id', 'name', 'author__email', 'text', 'cooking_time',
+                    'created_at', 'image',
+                )[:batch_size]
+            )
+            if not recipes:
+                return exported
+            ids = [recipe['id'] for recipe in recipes]
+            ingredients = {pk: [] for pk in ids}
+            for recipe_id, name, measurement_unit, amount in (
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=ids
+                ).order_by('id').values_list(
+                    'recipe_id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount',
+                )
+            ):
+                ingredients[recipe_id].append({
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                })
+            tags = {pk: [] for pk in ids}
+            for recipe_id, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids
+            ).order_by('id').values_list('recipe_id', 'tag__slug'):
+                tags[recipe_id].append(slug)
+            for recipe in recipes:
+                file.write(json.dumps({
+                    'name': recipe['name'],
+                    'author': recipe['author__email'],
+                    'text': recipe['text'],
+                    'cooking_time': recipe['cooking_time'],
+                    'created_at': recipe['created_at'].isoformat(),
+                    'image': recipe['image'],
+                    'tags': tags[recipe['id']],
+                    'ingredients': ingredients[recipe['id']],
+                }, ensure_ascii=False) + '\n')
+            exported += len(recipes)
+            last_id = ids[-1]
@@ -0,0 +1,283 @@
+import io
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.caches import bump_version
+from recipes.constans import MIN_AMOUNT, MIN_COOKING_TIME
+from recipes.counters import recount
+from recipes.inverted_index import recipe_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+from recipes.storage import change_references
+
+
+def parse(line):
+    """Проверяет строку выгрузки; ValueError описывает проблему."""
+    try:
+        record = json.loads(line)
+        tags, ingredients = record['tags'], record['ingredients']
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f'неверный формат ({error!r})')
+    # Строку или объект перебор разобрал бы на буквы или ключи.
+    if not isinstance(tags, list) or not isinstance(ingredients, list):
+        raise ValueError('tags и ingredients должны быть списками')
+    try:
+        recipe = {
+            'name': str(record['name']),
+            'author': str(record['author']),
+            'text': str(record['text']),
+            'cooking_time': int(record['cooking_time']),
+            'image': str(record['image']),
+            'tags': [str(slug) for slug in tags],
+            'ingredients': [
+                (
+                    str(item['name']),
+                    str(item['measurement_unit']),
+                    int(item['amount']),
+                )
+                for item in ingredients
+            ],
+        }
+        created_at = record.get('created_at')
+        recipe['created_at'] = (
+            parse_datetime(created_at) if created_at else timezone.now()
+        )
+    except (KeyError, TypeError, ValueError, AttributeError) as error:
+        raise ValueError(f'неверный формат ({error!r})')
+    if recipe['created_at'] is None:
+        raise ValueError('неверная дата created_at')
+    if not recipe['name'] or not recipe['image'] or not recipe['tags']:
+        raise ValueError('пустое название, картинка или список тегов')
+    if recipe['cooking_time'] < MIN_COOKING_TIME:
+        raise ValueError('время приготовления меньше минимального')
+    keys = [(name, unit) for name, unit, _ in recipe['ingredients']]
+    if len(set(keys)) != len(keys) or len(set(recipe['tags'])) != len(
+        recipe['tags']
+    ):
+        raise ValueError('повторяются продукты или теги')
+    if any(amount < MIN_AMOUNT for *_, amount in recipe['ingredients']):
+        raise ValueError('количество продукта меньше минимального')
+    return recipe
+
+
+def allocate_ids(count):
+    """Резервирует count id рецептов для вставки с явными ключами."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [Recipe._meta.db_table, Recipe._meta.pk.column, count]
+            )
+            return [pk for pk, in cursor.fetchall()]
+    # Без последовательностей (SQLite) id берутся после максимального,
+    # поэтому загрузка должна быть единственным, кто пишет рецепты:
+    # параллельная вставка займёт те же id, и пачка упадёт на ключе.
+    start = (Recipe.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    return range(start, start + count)
+
+
+def copy_field(value):
+    """Поле CSV для COPY: NULL — пустое поле без кавычек.
+
+    Остальные значения всегда в кавычках, так что пустая строка не
+    превращается в NULL.
+    """
+    if value is None:
+        return ''
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+def insert(model, objects):
+    """bulk_create, а на PostgreSQL — COPY одним потоком."""
+    if not objects:
+        return
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(objects)
+        return
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    buffer = io.StringIO()
+    for instance in objects:
+        buffer.write(','.join(
+            copy_field(field.get_db_prep_save(
+                getattr(instance, field.attname), connection
+            ))
+            for field in fields
+        ) + '\n')
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} '
+            f'({", ".join(quote(field.column) for field in fields)}) '
+            "FROM STDIN WITH (FORMAT csv, NULL '')",
+            buffer
+        )
+
+
+class Command(BaseCommand):
+    """Загрузка рецептов из JSONL, выгруженного export_recipes.
+
+    Файл читается пачками по --batch-size строк, и каждая пачка пишется
+    в своей транзакции. Авторы (по email), теги (по слагу) и продукты
+    (по названию и единице) ищутся одним запросом на пачку; найденные
+    теги и продукты запоминаются. Строки с неизвестными ссылками или
+    неверными данными пропускаются с сообщением. Файлы картинок должны
+    уже лежать в хранилище; копии для них строит build_thumbnails.
+    Повторная загрузка того же файла создаст рецепты-дубли. На SQLite
+    id рецептов выделяются после максимального, поэтому параллельно с
+    загрузкой рецепты писать нельзя.
+    """
+
+    help = 'Загрузить рецепты из JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdin'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.tags, self.ingredients = {}, {}
+        self.totals = Counter()
+        started = time.perf_counter()
+        if options['path'] == '-':
+            self.load(sys.stdin, options['batch_size'], options['verbosity'])
+        else:
+            with open(options['path'], encoding='UTF-8') as file:
+                self.load(file, options['batch_size'], options['verbosity'])
+        if self.totals['recipes']:
+            recount(apps)
+            bump_version('recipes')
+            recipe_index.reset()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено рецептов: {self.totals["recipes"]}, '
+            f'продуктов в них: {self.totals["ingredients"]}, '
+            f'тегов: {self.totals["tags"]}; '
+            f'пропущено строк: {self.totals["skipped"]}. '
+            f'{elapsed:.1f} с, '
+            f'{self.totals["recipes"] / max(elapsed, 1e-9):.0f} '
+            'рецептов в секунду'
+        )
+
+    def load(self, file, batch_size, verbosity):
+        lines = enumerate(file, 1)
+        while True:
+            batch = []
+            for number, line in islice(lines, batch_size):
+                if not line.strip():
+                    continue
+                try:
+                    batch.append((number, parse(line)))
+                except ValueError as error:
+                    self.skip(number, error)
+            if not batch:
+                return
+            started = time.perf_counter()
+            loaded = self.load_batch(batch)
+            if verbosity > 1:
+                self.stdout.write(
+                    f'Пачка до строки {batch[-1][0]}: {loaded} рецептов '
+                    f'за {time.perf_counter() - started:.2f} с'
+                )
+
+    def skip(self, number, reason):
+        self.totals['skipped'] += 1
+        self.stderr.write(f'Строка {number} пропущена: {reason}')
+
+    def resolve(self, batch):
+        """Дополняет кеш тегов и продуктов и возвращает авторов пачки."""
+        slugs = {
+            slug for _, recipe in batch for slug in recipe['tags']
+        } - self.tags.keys()
+        self.tags.update(dict.fromkeys(slugs))
+        self.tags.update(
+            Tag.objects.filter(slug__in=slugs).values_list('slug', 'id')
+        )
+        keys = {
+            (name, unit)
+            for _, recipe in batch for name, unit, _ in recipe['ingredients']
+        } - self.ingredients.keys()
+        self.ingredients.update(dict.fromkeys(keys))
+        for pk, name, unit in Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).order_by('-id').values_list('id', 'name', 'measurement_unit'):
+            if (name, unit) in keys:
+                self.ingredients[name, unit] = pk
+        return dict(User.objects.filter(
+            email__in={recipe['author'] for _, recipe in batch}
+        ).values_list('email', 'id'))
+
+    def load_batch(self, batch):
+        authors = self.resolve(batch)
+        valid = []
+        for number, recipe in batch:
+            missing = [
+                slug for slug in recipe['tags'] if not self.tags[slug]
+            ] + [
+                f'{name} ({unit})'
+                for name, unit, _ in recipe['ingredients']
+                if not self.ingredients[name, unit]
+            ]
+            if recipe['author'] not in authors:
+                missing.append(recipe['author'])
+            if missing:
+                self.skip(number, f'не найдены: {", ".join(missing)}')
+            else:
+                valid.append(recipe)
+        if not valid:
+            return 0
+        with transaction.atomic():
+            recipes = [
+                Recipe(
+                    id=pk,
+                    name=recipe['name'],
+                    author_id=authors[recipe['author']],
+                    text=recipe['text'],
+                    cooking_time=recipe['cooking_time'],
+                    created_at=recipe['created_at'],
+                    image=recipe['image'],
+                )
+                for pk, recipe in zip(allocate_ids(len(valid)), valid)
+            ]
+            insert(Recipe, recipes)
+            ingredients = [
+                RecipeIngredient(
+                    recipe_id=instance.id,
+                    ingredient_id=self.ingredients[name, unit],
+                    amount=amount,
+                )
+                for instance, recipe in zip(recipes, valid)
+                for name, unit, amount in recipe['ingredients']
+            ]
+            insert(RecipeIngredient, ingredients)
+            tags = [
+                Recipe.tags.through(
+                    recipe_id=instance.id, tag_id=self.tags[slug]
+                )
+                for instance, recipe in zip(recipes, valid)
+                for slug in recipe['tags']
+            ]
+            insert(Recipe.tags.through, tags)
+            for name, references in Counter(
+                recipe['image'] for recipe in valid
+            ).items():
+                change_references(name, references)
+        self.totals.update(
+            recipes=len(recipes), ingredients=len(ingredients), tags=len(tags)
+        )
+        return len(recipes)
@@ -1,40 +1,185 @@
+import csv
 import json
 import os
-from typing import Type
+import re
+from collections import Counter
+from functools import partial
+from itertools import islice
+from typing import Tuple, Type
 
-from django.core.management.base import BaseCommand
-from django.db import models
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from api.caches import bump_version
+
+# Пробелы и запятые между элементами JSON-массива.
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_json(file, chunk_size=1 << 16):
+    """Потоково читает объекты верхнего уровня из JSON-массива."""
+    decoder = json.JSONDecoder()
+    buffer, opened = '', False
+    for chunk in iter(partial(file.read, chunk_size), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            position = SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != '[':
+                    raise ValueError('Ожидался JSON-массив.')
+                opened, position = True, position + 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Объект прочитан не до конца — нужен следующий кусок.
+                break
+            yield item
+        buffer = buffer[position:]
+    raise ValueError('JSON-массив не закрыт или содержит ошибку.')
 
 
 class BaseImportCommand(BaseCommand):
-    """Базовый класс для импорта данных."""
+    """Базовый класс для импорта данных.
+
+    Файл CSV (колонки в порядке fields, без заголовка) или JSON-массив
+    читается потоково пачками по --batch-size записей. Каждая пачка
+    сверяется с базой одним запросом по unique_fields: новые записи
+    вставляются, изменившиеся обновляются, остальные не трогаются,
+    поэтому повторный импорт того же файла ничего не меняет. Итоги
+    считаются по строкам базы после записи; записи неверного вида и
+    те, что база не приняла (например, из-за уникальности другого
+    поля), пропускаются с сообщением.
+    """
 
     help = 'Импорт данных'
     model: Type[models.Model]
     data_file: str
+    fields: Tuple[str, ...]
+    unique_fields: Tuple[str, ...]
+    # Версии кеша, которые сбросили бы сигналы сохранения model.
+    versions: Tuple[str, ...] = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=self.data_file,
+            help='Файл .csv или .json'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
         """Тело команды."""
-        path = self.data_file
-        file_name = os.path.basename(path)
+        path = options['path']
+        self.totals = Counter()
         try:
-            with open(path, 'r', encoding='UTF-8') as file:
-                initial_count = self.model.objects.count()
-                new_notes = [
-                    self.model(**note) for note in json.load(file)
-                ]
-                self.model.objects.bulk_create(
-                    new_notes, ignore_conflicts=True
-                )
-                final_count = self.model.objects.count()
-                created_count = final_count - initial_count
-                print(
-                    f'Загрузка данных завершена\n'
-                    f'Добавлено {created_count} новых.'
-                )
-        except Exception as error:
-            print(
-                f'Ошибка при массовом добавлении.\n'
-                f'Текст - {error}\n'
-                f'Имя файла - {file_name}'
+            with open(path, 'r', encoding='UTF-8', newline='') as file:
+                records = self.read(file, os.path.splitext(path)[1].lower())
+                while True:
+                    batch = list(islice(records, options['batch_size']))
+                    if not batch:
+                        break
+                    self.upsert(batch)
+        except (OSError, ValueError) as error:
+            raise CommandError(
+                f'Ошибка при импорте файла {os.path.basename(path)}: '
+                f'{error!r}'
             )
+        finally:
+            if self.totals['inserted'] or self.totals['updated']:
+                for name in self.versions:
+                    bump_version(name)
+        self.stdout.write(
+            f'Загрузка данных завершена\n'
+            f'Добавлено {self.totals["inserted"]}, '
+            f'обновлено {self.totals["updated"]}, '
+            f'без изменений {self.totals["unchanged"]}, '
+            f'пропущено {self.totals["skipped"]}.'
+        )
+
+    def skip(self, record, reason):
+        self.totals['skipped'] += 1
+        self.stderr.write(f'Запись {record!r} пропущена: {reason}')
+
+    def read(self, file, extension):
+        if extension == '.csv':
+            rows = (
+                dict(zip(self.fields, row)) if len(row) >= len(self.fields)
+                else row
+                for row in csv.reader(file) if row
+            )
+        elif extension == '.json':
+            rows = read_json(file)
+        else:
+            raise ValueError(f'Неизвестный формат {extension}.')
+        for row in rows:
+            if not isinstance(row, dict):
+                self.skip(row, f'ожидались поля {", ".join(self.fields)}')
+            elif any(field not in row for field in self.fields):
+                self.skip(row, 'не хватает полей')
+            else:
+                yield {
+                    field: str(row[field]).strip() for field in self.fields
+                }
+
+    def key(self, values):
+        return tuple(values[field] for field in self.unique_fields)
+
+    def stored(self, records):
+        """Строки базы с ключами записей пачки: {ключ: экземпляр}."""
+        first = self.unique_fields[0]
+        return {
+            self.key(vars(instance)): instance
+            for instance in self.model.objects.filter(**{
+                f'{first}__in': {record[first] for record in records}
+            })
+        }
+
+    def upsert(self, batch):
+        """Записывает пачку и добавляет её итоги в self.totals.
+
+        Повторы ключа внутри пачки схлопываются, побеждает последний.
+        bulk_create с ignore_conflicts молча пропускает отвергнутые
+        строки, поэтому итоги считаются по базе после записи: запись
+        учтена, только если в базе теперь лежат её значения.
+        """
+        records = {self.key(record): record for record in batch}
+        existing = self.stored(records.values())
+        update_fields = [
+            field for field in self.fields if field not in self.unique_fields
+        ]
+        created, changed = [], []
+        for key, record in records.items():
+            instance = existing.get(key)
+            if instance is None:
+                created.append(self.model(**record))
+            elif any(
+                getattr(instance, field) != record[field]
+                for field in update_fields
+            ):
+                for field in update_fields:
+                    setattr(instance, field, record[field])
+                changed.append(instance)
+        with transaction.atomic():
+            self.model.objects.bulk_create(created, ignore_conflicts=True)
+            if changed:
+                self.model.objects.bulk_update(changed, update_fields)
+            stored = self.stored(records.values())
+        changed = {self.key(vars(instance)) for instance in changed}
+        for key, record in records.items():
+            instance = stored.get(key)
+            if instance is None or any(
+                getattr(instance, field) != record[field]
+                for field in self.fields
+            ):
+                self.skip(record, 'запись не принята базой')
+            elif key not in existing:
+                self.totals['inserted'] += 1
+            elif key in changed:
+                self.totals['updated'] += 1
+            else:
+                self.totals['unchanged'] += 1
@@ -7,4 +7,7 @@ class Command(BaseImportCommand):
     """Команда для импорта ингредиентов в базу."""
 
     model = Ingredient
-    data_file = 'data/ingredients.json'
+    data_file = 'data/ingredients.csv'
+    fields = ('name', 'measurement_unit')
+    unique_fields = ('name', 'measurement_unit')
+    versions = ('ingredients',)
@@ -8,3 +8,6 @@ class Command(BaseImportCommand):
 
     model = Tag
     data_file = 'data/tags.json'
+    fields = ('name', 'slug')
+    unique_fields = ('slug',)
+    versions = ('tags', 'recipes')
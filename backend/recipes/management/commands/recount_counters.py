@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    """Пересчёт денормализованных счётчиков пользователей и рецептов.
+
+    Счётчики поддерживаются сигналами, но массовые операции
+    (bulk_create, queryset.update, смена автора в админке) их обходят.
+    """
+
+    help = 'Пересчитать счётчики рецептов, подписок и избранного'
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount(apps).items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
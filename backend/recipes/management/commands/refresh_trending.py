@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    """Пересчёт популярности рецептов для сортировки ordering=trending.
+
+    Счёт складывается из добавлений в избранное и корзину, затухающих
+    со временем (см. recipes.trending). С --interval команда не
+    завершается и пересчитывает популярность каждые interval секунд.
+    """
+
+    help = 'Пересчитать популярность рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые interval секунд; 0 — один раз'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.perf_counter()
+            updated = refresh_trending()
+            self.stdout.write(
+                f'Популярность обновлена у {updated} рецептов за '
+                f'{time.perf_counter() - started:.1f} с'
+            )
+            if interval <= 0:
+                return
+            close_old_connections()
+            time.sleep(max(interval - (time.perf_counter() - started), 0))
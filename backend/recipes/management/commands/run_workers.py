@@ -0,0 +1,83 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from recipes import jobs
+
+
+def work(sleep, once, stop):
+    """Цикл воркера: берёт задачи, пока не выставлен stop."""
+    while not stop.is_set():
+        job = jobs.claim()
+        if job is not None:
+            jobs.run(job)
+            close_old_connections()
+            continue
+        if once:
+            return
+        jobs.release_stale()
+        jobs.prune()
+        close_old_connections()
+        stop.wait(sleep)
+
+
+def worker_process(sleep, once, stop):
+    # Соединения родителя после fork использовать нельзя; остановку
+    # по Ctrl+C и SIGTERM координирует родитель через stop.
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(sleep, once, stop)
+
+
+class Command(BaseCommand):
+    """Пул процессов, выполняющих задачи из очереди в базе данных.
+
+    Каждый процесс забирает задачи по приоритету (на PostgreSQL через
+    SELECT ... FOR UPDATE SKIP LOCKED), повторяет упавшие с растущей
+    задержкой и в простое разбирает задачи зависших воркеров (в очередь
+    или, если попытки исчерпаны, в упавшие) и удаляет старые результаты.
+    SIGTERM/SIGINT дают процессам доделать текущую задачу.
+    """
+
+    help = 'Запустить воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, с'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти'
+        )
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+        arguments = (options['sleep'], options['once'], stop)
+
+        def shutdown(*args):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        if options['processes'] <= 1:
+            return work(*arguments)
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=worker_process, args=arguments,
+                name=f'worker-{number}'
+            )
+            for number in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Запущено воркеров: {len(workers)}')
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(0.5)
+        self.stdout.write('Воркеры остановлены.')
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.18 on 2026-10-18 19:43
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Счётчики на момент миграции: модель, поле, связанная модель и поле
+# связи. Повторяет recipes.counters, но не зависит от его изменений.
+COUNTERS = (
+    ('User', 'recipes_count', 'Recipe', 'author'),
+    ('User', 'subscriptions_count', 'Subscription', 'follower'),
+    ('User', 'subscribers_count', 'Subscription', 'author'),
+    ('Recipe', 'favourites_count', 'Favourite', 'recipe'),
+)
+
+
+def recount_counters(apps, schema_editor):
+    for model_name, field, related_name, related_field in COUNTERS:
+        model = apps.get_model('recipes', model_name)
+        related = apps.get_model('recipes', related_name)
+        model.objects.update(**{field: Coalesce(Subquery(
+            related.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецепты'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчики'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscriptions_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписки'),
+        ),
+        migrations.RunPython(recount_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.18 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_link_hits',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходы по короткой ссылке'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.18 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_short_link_hits'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'default_related_name': 'recipes', 'ordering': ('-created_at', 'id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'рецепты'},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', 'id'], name='recipe_created_at_id_idx'),
+        ),
+    ]
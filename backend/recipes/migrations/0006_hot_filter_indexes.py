@@ -0,0 +1,25 @@
+# Generated by Django 4.2.18 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at', 'id'], name='recipe_author_created_at_idx'),
+        ),
+        # Таблица связи рецептов и тегов создаётся автоматически, поэтому
+        # индекс для фильтра по тегам задаётся SQL: (tag_id, recipe_id)
+        # отдаёт рецепты тега без обращения к самой таблице связи.
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.18 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnailed',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение, для которого построены копии'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnailed',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Аватар, для которого построены копии'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:00
+
+from collections import Counter
+
+from django.db import migrations, models
+import django.utils.timezone
+import recipes.storage
+
+
+def count_references(apps, schema_editor):
+    """Заводит MediaBlob для уже загруженных картинок и аватаров."""
+    references = Counter(
+        apps.get_model('recipes', 'Recipe').objects.values_list(
+            'image', flat=True
+        )
+    )
+    references.update(
+        apps.get_model('recipes', 'User').objects.exclude(
+            avatar__isnull=True
+        ).values_list('avatar', flat=True)
+    )
+    references.pop('', None)
+    MediaBlob = apps.get_model('recipes', 'MediaBlob')
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=name, refcount=count)
+        for name, count in references.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Путь')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'файлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/image/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default=None, null=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='users/avatar/', verbose_name='Аватар'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
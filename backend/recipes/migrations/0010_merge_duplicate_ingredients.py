@@ -0,0 +1,48 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:15
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Сливает продукты с одинаковыми названием и единицей в один.
+
+    Ссылки рецептов переводятся на продукт с меньшим id; если в рецепте
+    были оба дубля, их количества складываются.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        keep=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in groups:
+        keep = group.pop('keep')
+        group.pop('total')
+        duplicates = Ingredient.objects.filter(**group).exclude(pk=keep)
+        kept = {
+            row.recipe_id: row
+            for row in RecipeIngredient.objects.filter(ingredient_id=keep)
+        }
+        for row in RecipeIngredient.objects.filter(
+            ingredient__in=duplicates
+        ).order_by('id'):
+            if row.recipe_id in kept:
+                kept[row.recipe_id].amount += row.amount
+                kept[row.recipe_id].save(update_fields=['amount'])
+                row.delete()
+            else:
+                row.ingredient_id = keep
+                row.save(update_fields=['ingredient'])
+                kept[row.recipe_id] = row
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
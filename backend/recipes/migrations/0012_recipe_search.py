@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from recipes.search import create_search_index, drop_search_index
+
+
+def create(apps, schema_editor):
+    create_search_index(schema_editor.connection)
+
+
+def drop(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
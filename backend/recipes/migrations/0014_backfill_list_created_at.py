@@ -0,0 +1,30 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:31
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_created_at(apps, schema_editor):
+    """Старым записям избранного и корзины ставит дату создания рецепта.
+
+    Иначе все они получили бы время миграции и разом попали бы в
+    популярное.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for name in ('Favourite', 'ShoppingCart'):
+        apps.get_model('recipes', name).objects.update(created_at=Subquery(
+            Recipe.objects.filter(pk=OuterRef('recipe_id')).values(
+                'created_at'
+            )
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+    ]
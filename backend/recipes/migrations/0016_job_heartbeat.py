@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-18 21:19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_heartbeat(apps, schema_editor):
+    """Выполняющимся задачам отметкой считается время, когда их взяли."""
+    apps.get_model('recipes', 'Job').objects.filter(
+        status='running'
+    ).update(heartbeat_at=F('locked_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний сигнал воркера'),
+        ),
+        migrations.RunPython(backfill_heartbeat, migrations.RunPython.noop),
+    ]
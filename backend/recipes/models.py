@@ -15,6 +15,7 @@ from recipes.constans import (
     MIN_COOKING_TIME,
     MIN_AMOUNT,
 )
+from recipes.storage import content_storage
 
 
 class User(AbstractUser):
@@ -43,11 +44,33 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='users/avatar/',
+        storage=content_storage,
         null=True,
         blank=True,
         default=None,
         verbose_name='Аватар',
     )
+    avatar_thumbnailed = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Аватар, для которого построены копии',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецепты',
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписки',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчики',
+    )
 
     class Meta:
         ordering = ('username',)
@@ -123,6 +146,12 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Продукт'
         verbose_name_plural = 'продукты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit',
+            )
+        ]
 
     def __str__(self):
         return self.name[:LIMIT_TEXT]
@@ -140,8 +169,15 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/image/',
+        storage=content_storage,
         verbose_name='Изображение',
     )
+    image_thumbnailed = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Изображение, для которого построены копии',
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
@@ -160,12 +196,40 @@ class Recipe(models.Model):
         validators=[MinValueValidator(MIN_COOKING_TIME)],
     )
     created_at = models.DateTimeField(default=timezone.now)
+    favourites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    short_link_hits = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Переходы по короткой ссылке',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность',
+    )
 
     class Meta:
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
-        ordering = ('-created_at',)
+        ordering = ('-created_at', 'id')
+        indexes = [
+            models.Index(
+                fields=('-created_at', 'id'), name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-created_at', 'id'),
+                name='recipe_author_created_at_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-created_at', 'id'),
+                name='recipe_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name[:LIMIT_TEXT]
@@ -213,6 +277,11 @@ class UserRecipeBase(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
     )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Добавлено',
+    )
 
     class Meta:
         abstract = True
@@ -241,3 +310,154 @@ class ShoppingCart(UserRecipeBase):
         default_related_name = 'shopping_carts'
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'корзина покупок'
+
+
+class SimilarRecipe(models.Model):
+    """Рецепт, похожий на данный по набору продуктов."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'), name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class SimilarityBucket(models.Model):
+    """Корзина LSH, в которую попал рецепт: key — хеш полосы сигнатуры."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets',
+        verbose_name='Рецепт',
+    )
+    key = models.BigIntegerField(db_index=True, verbose_name='Ключ')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'корзины LSH'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.key}'
+
+
+class MediaBlob(models.Model):
+    """Файл в хранилище и число ссылающихся на него записей."""
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Путь',
+    )
+    refcount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок',
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Изменён',
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'файлы'
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе данных."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    priority = models.SmallIntegerField(default=0, verbose_name='Приоритет')
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='Максимум попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now, verbose_name='Не раньше'
+    )
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Взята в работу'
+    )
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Последний сигнал воркера'
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Создана'
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Изменена'
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'задачи'
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(
+                fields=('-priority', 'run_after', 'id'),
+                condition=models.Q(status='pending'),
+                name='job_claim_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
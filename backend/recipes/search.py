@@ -0,0 +1,137 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe
+
+# Конфигурация словаря PostgreSQL для названий и описаний рецептов.
+SEARCH_CONFIG = 'russian'
+# Слов запроса, которые учитываются; остальные отбрасываются.
+MAX_SEARCH_WORDS = 8
+
+TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+
+POSTGRESQL_INDEX = (
+    f'ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+    f"GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(text, '')), 'B')"
+    f') STORED',
+    f'CREATE INDEX IF NOT EXISTS recipe_search_idx '
+    f'ON {TABLE} USING GIN (search_vector)',
+)
+POSTGRESQL_DROP = (
+    'DROP INDEX IF EXISTS recipe_search_idx',
+    f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector',
+)
+# Внешняя FTS5-таблица хранит только индекс; строки берутся из рецептов.
+SQLITE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    f"name, text, content='{TABLE}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        f'AFTER INSERT ON {TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+        f'VALUES (new.id, new.name, new.text); END'
+    ),
+    f'{FTS_TABLE}_delete': (
+        f'AFTER DELETE ON {TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text) '
+        f"VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    f'{FTS_TABLE}_update': (
+        f'AFTER UPDATE OF name, text ON {TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text) '
+        f"VALUES ('delete', old.id, old.name, old.text); "
+        f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+        f'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+
+
+def create_search_index(connection):
+    """Создаёт поисковый индекс рецептов, если его ещё нет.
+
+    На PostgreSQL это генерируемая колонка tsvector с GIN-индексом, на
+    SQLite — FTS5-таблица, которую поддерживают триггеры. SQLite
+    теряет триггеры, когда миграция пересоздаёт таблицу рецептов,
+    поэтому функция вызывается и после каждого migrate: недостающие
+    триггеры создаются заново, а индекс перестраивается.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INDEX:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(SQLITE_TABLE)
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )
+            existing = {name for name, in cursor.fetchall()}
+            missing = SQLITE_TRIGGERS.keys() - existing
+            for name in missing:
+                cursor.execute(
+                    f'CREATE TRIGGER {name} {SQLITE_TRIGGERS[name]}'
+                )
+            if missing:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+                )
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_DROP:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def search_recipes(recipes, query):
+    """Рецепты, в названии или описании которых есть все слова query.
+
+    Каждое слово ищется и как начало более длинного. Релевантность
+    попадает в аннотацию search_rank (больше — выше), по ней выдача
+    и сортируется; совпадения в названии весят больше.
+    """
+    words = re.findall(r'\w+', query.lower())[:MAX_SEARCH_WORDS]
+    if not words:
+        return recipes.none()
+    if connection.vendor == 'postgresql':
+        tsquery = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+        terms = ' & '.join(f'{word}:*' for word in words)
+        recipes = recipes.annotate(search_rank=RawSQL(
+            f'ts_rank_cd({TABLE}.search_vector, {tsquery})', [terms],
+            output_field=FloatField()
+        )).filter(RawSQL(
+            f'{TABLE}.search_vector @@ {tsquery}', [terms],
+            output_field=BooleanField()
+        ))
+    elif connection.vendor == 'sqlite':
+        # Соединение с FTS5-таблицей: поиск идёт по индексу, а rank
+        # (bm25, меньше — лучше) доступен без подзапроса на строку.
+        recipes = recipes.extra(
+            select={'search_rank': f'-{FTS_TABLE}.rank'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {TABLE}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[' '.join(f'"{word}"*' for word in words)],
+        )
+    else:
+        condition = Q()
+        for word in words:
+            condition &= Q(name__icontains=word) | Q(text__icontains=word)
+        recipes = recipes.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    return recipes.order_by('-search_rank', *Recipe._meta.ordering)
@@ -0,0 +1,150 @@
+import string
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from api.caches import get_version
+from recipes.models import Recipe
+
+# Буквы идут первыми, чтобы код без букв можно было дополнить ведущим
+# нулём 'a' и не спутать его со старыми ссылками вида /s/<id>/.
+ALPHABET = string.ascii_letters + string.digits
+BASE = len(ALPHABET)
+DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+# Наибольший id, который помещается в bigint.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_short_code(pk):
+    """Кодирует id рецепта в base62, код всегда содержит букву."""
+    code = ''
+    while True:
+        pk, remainder = divmod(pk, BASE)
+        code = ALPHABET[remainder] + code
+        if not pk:
+            break
+    if code.isdigit():
+        code = ALPHABET[0] + code
+    return code
+
+
+MAX_CODE_LENGTH = len(encode_short_code(MAX_ID))
+
+
+def decode_short_code(code):
+    """Возвращает id рецепта, ValueError для некорректного кода."""
+    if len(code) > MAX_CODE_LENGTH:
+        raise ValueError('Слишком длинный код.')
+    pk = 0
+    for char in code:
+        if char not in DIGITS:
+            raise ValueError(f'Недопустимый символ в коде: {char}')
+        pk = pk * BASE + DIGITS[char]
+    if pk > MAX_ID:
+        raise ValueError('Код вне диапазона id.')
+    return pk
+
+
+class RecipeIdSet:
+    """Битовая карта id существующих рецептов в памяти процесса.
+
+    Строится лениво, сигналы создания и удаления рецептов поддерживают её
+    в актуальном состоянии. Рецепты, созданные в других процессах,
+    в карте отсутствуют, поэтому отрицательный ответ перепроверяется
+    по базе. Удаление рецепта сбрасывает версию recipe_ids в общем кеше,
+    и карта, построенная на старой версии, строится заново: иначе рецепт,
+    удалённый в другом процессе, остался бы в ней навсегда.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bits = self.version = None
+
+    def load(self, version):
+        ids = list(Recipe.objects.values_list('id', flat=True).order_by())
+        bits = bytearray(max(ids, default=0) // 8 + 1)
+        for pk in ids:
+            bits[pk >> 3] |= 1 << (pk & 7)
+        self.bits, self.version = bits, version
+
+    def add(self, pk):
+        with self.lock:
+            if self.bits is None:
+                return
+            if pk >> 3 >= len(self.bits):
+                self.bits.extend(bytes((pk >> 3) - len(self.bits) + 1))
+            self.bits[pk >> 3] |= 1 << (pk & 7)
+
+    def discard(self, pk):
+        with self.lock:
+            if self.bits is not None and pk >> 3 < len(self.bits):
+                self.bits[pk >> 3] &= ~(1 << (pk & 7))
+
+    def __contains__(self, pk):
+        # Версия берётся до чтения базы: удаление, закоммиченное после
+        # него, сменит версию, и карта перестроится при следующем вызове.
+        version = get_version('recipe_ids')
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.load(version)
+        bits = self.bits
+        return pk >> 3 < len(bits) and bool(bits[pk >> 3] & 1 << (pk & 7))
+
+    def exists(self, pk):
+        if not 0 < pk <= MAX_ID:
+            return False
+        if pk in self:
+            return True
+        if Recipe.objects.filter(pk=pk).exists():
+            self.add(pk)
+            return True
+        return False
+
+
+class HitBuffer:
+    """Копит переходы по коротким ссылкам и пишет их в базу пачками.
+
+    Сброс происходит, когда накопилось SHORT_LINK_HITS_FLUSH_SIZE
+    переходов или прошло SHORT_LINK_HITS_FLUSH_INTERVAL секунд, а также
+    при завершении обслуживающего запросы процесса (см. wsgi.py).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.flushed_at = time.monotonic()
+
+    def add(self, pk):
+        with self.lock:
+            self.hits[pk] += 1
+            due = (
+                sum(self.hits.values()) >= settings.SHORT_LINK_HITS_FLUSH_SIZE
+                or time.monotonic() - self.flushed_at
+                >= settings.SHORT_LINK_HITS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            hits, self.hits = self.hits, Counter()
+            self.flushed_at = time.monotonic()
+        if not hits:
+            return
+        by_count = defaultdict(list)
+        for pk, count in hits.items():
+            by_count[count].append(pk)
+        with transaction.atomic():
+            for count, ids in by_count.items():
+                Recipe.objects.filter(pk__in=ids).update(
+                    short_link_hits=F('short_link_hits') + count
+                )
+
+
+recipe_ids = RecipeIdSet()
+hit_buffer = HitBuffer()
@@ -0,0 +1,167 @@
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete, post_init, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from api.caches import bump_version
+from recipes.inverted_index import recipe_index
+from recipes.models import (
+    Favourite, Recipe, RecipeIngredient, SimilarRecipe, Subscription, User
+)
+from recipes.search import FTS_TABLE, create_search_index
+from recipes.similar import schedule_refresh
+from recipes.shortlinks import recipe_ids
+from recipes.storage import change_references
+from recipes.thumbnails import schedule_thumbnails
+
+# Поле с картинкой у моделей, чьи файлы учитываются в MediaBlob.
+MEDIA_FIELDS = {Recipe: 'image', User: 'avatar'}
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик, не опуская его ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, raw=False, **kwargs):
+    if created:
+        recipe_ids.add(instance.pk)
+    if created and not raw:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+def stored_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def media_loaded(sender, instance, **kwargs):
+    """Запоминает файл, на который запись ссылалась при загрузке.
+
+    Для отложенного поля (only()/defer()) прежний файл неизвестен:
+    его дочитает media_saving.
+    """
+    field_name = MEDIA_FIELDS[sender]
+    if field_name in instance.__dict__:
+        instance._stored_media = stored_name(instance.__dict__[field_name])
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def media_saving(sender, instance, update_fields=None, **kwargs):
+    field_name = MEDIA_FIELDS[sender]
+    if (
+        instance._state.adding
+        or hasattr(instance, '_stored_media')
+        or update_fields is not None and field_name not in update_fields
+    ):
+        return
+    instance._stored_media = stored_name(sender.objects.filter(
+        pk=instance.pk
+    ).values_list(field_name, flat=True).first())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def media_saved(sender, instance, created, raw=False, update_fields=None,
+                **kwargs):
+    field_name = MEDIA_FIELDS[sender]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    old = '' if created else getattr(instance, '_stored_media', '')
+    new = stored_name(getattr(instance, field_name))
+    if old != new:
+        change_references(old, -1)
+        change_references(new, 1)
+        instance._stored_media = new
+    if not raw:
+        schedule_thumbnails(instance, field_name)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def media_released(sender, instance, **kwargs):
+    change_references(
+        stored_name(getattr(instance, MEDIA_FIELDS[sender])), -1
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    recipe_ids.discard(instance.pk)
+    bump_version('recipe_ids')
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(instance, created, **kwargs):
+    # У изменённой строки прежний продукт неизвестен: рецепт перечитается.
+    recipe_index.publish([(
+        instance.recipe_id,
+        instance.ingredient_id if created else None,
+        True,
+    )])
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(instance, **kwargs):
+    recipe_index.publish(
+        [(instance.recipe_id, instance.ingredient_id, False)]
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, raw=False, **kwargs):
+    # Состав рецепта меняется в той же транзакции, что и сохранение:
+    # сериализатор и админка сохраняют рецепт всегда.
+    if not raw:
+        schedule_refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    # Списки, где был рецепт, потеряют строку каскадом; их пересчитаем.
+    schedule_refresh(list(SimilarRecipe.objects.filter(
+        similar=instance
+    ).values_list('recipe_id', flat=True)))
+
+
+@receiver(post_save, sender=Favourite)
+def favourite_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Recipe, instance.recipe_id, 'favourites_count', 1)
+
+
+@receiver(post_delete, sender=Favourite)
+def favourite_deleted(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favourites_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(User, instance.follower_id, 'subscriptions_count', 1)
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(instance, **kwargs):
+    change_counter(User, instance.follower_id, 'subscriptions_count', -1)
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    # Пересоздание таблицы рецептов на SQLite удаляет триггеры FTS5.
+    connection = connections[using]
+    if sender.label == 'recipes' and connection.vendor == 'sqlite' and (
+        FTS_TABLE in connection.introspection.table_names()
+    ):
+        create_search_index(connection)
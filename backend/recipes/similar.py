@@ -0,0 +1,296 @@
+import csv
+import io
+from collections import defaultdict
+from functools import partial
+from itertools import chain, islice
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count
+
+from recipes.jobs import enqueue, task
+from recipes.models import RecipeIngredient, SimilarityBucket, SimilarRecipe
+
+# Сигнатура — BANDS полос по ROWS минимальных хешей. Рецепты становятся
+# кандидатами в похожие, если совпала хотя бы одна полоса: при сходстве
+# Жаккара s это происходит с вероятностью 1 - (1 - s ** ROWS) ** BANDS,
+# то есть в половине случаев уже при s около 0,3.
+BANDS = 32
+ROWS = 3
+PERMUTATIONS = BANDS * ROWS
+# Корзины, где рецептов больше, — частые сочетания вроде «соль, сахар»:
+# о сходстве они ничего не говорят, а пар дают квадрат от размера.
+MAX_BUCKET_SIZE = 200
+# Сколько похожих рецептов хранится для каждого.
+SIMILAR_RECIPES = 10
+# Рецептов в одном куске при построении сигнатур и пар при сравнении.
+CHUNK_SIZE = 10000
+PRIME = (1 << 31) - 1
+
+
+def mix(values):
+    """Финализатор splitmix64: перемешивает биты uint64 поэлементно."""
+    values = np.asarray(values, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(
+            0xBF58476D1CE4E5B9
+        )
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(
+            0x94D049BB133111EB
+        )
+    return values ^ (values >> np.uint64(31))
+
+
+# Параметры хешей выводятся из номеров, а не из генератора случайных
+# чисел: сигнатуры совпадают во всех процессах и версиях NumPy.
+HASH_A = mix(np.arange(1, PERMUTATIONS + 1)) % np.uint64(PRIME - 1) + (
+    np.uint64(1)
+)
+HASH_B = mix(np.arange(PERMUTATIONS + 1, 2 * PERMUTATIONS + 1)) % (
+    np.uint64(PRIME)
+)
+BAND_SEEDS = mix(np.arange(2 * PERMUTATIONS + 1, 2 * PERMUTATIONS + 1 + BANDS))
+
+
+def load_signatures(rows):
+    """MinHash-сигнатуры наборов продуктов рецептов из queryset rows.
+
+    Возвращает массив id рецептов и сигнатуры формы (рецептов,
+    PERMUTATIONS): j-й элемент — минимум j-го хеша по продуктам рецепта.
+    """
+    pairs = np.fromiter(chain.from_iterable(
+        rows.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=CHUNK_SIZE)
+    ), dtype=np.int64).reshape(-1, 2)
+    if not len(pairs):
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, PERMUTATIONS), dtype=np.uint32),
+        )
+    recipes = pairs[:, 0]
+    starts = np.flatnonzero(np.r_[True, recipes[1:] != recipes[:-1]])
+    bounds = np.r_[starts[::CHUNK_SIZE], len(pairs)]
+    signatures = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        hashes = (
+            pairs[low:high, 1].astype(np.uint64)[:, None] * HASH_A + HASH_B
+        ) % np.uint64(PRIME)
+        signatures.append(np.minimum.reduceat(
+            hashes, starts[(starts >= low) & (starts < high)] - low, axis=0
+        ).astype(np.uint32))
+    return recipes[starts], np.concatenate(signatures)
+
+
+def band_keys(signatures):
+    """Ключи корзин LSH формы (рецептов, BANDS), по одному на полосу."""
+    keys = np.repeat(BAND_SEEDS[None, :], len(signatures), axis=0)
+    bands = signatures.reshape(-1, BANDS, ROWS).astype(np.uint64)
+    for row in range(ROWS):
+        keys = mix(keys ^ bands[:, :, row])
+    return keys.view(np.int64)
+
+
+def similarity(signatures, left, right):
+    """Оценка сходства Жаккара: доля совпавших элементов сигнатур."""
+    scores = [
+        (
+            signatures[left[start:start + CHUNK_SIZE]]
+            == signatures[right[start:start + CHUNK_SIZE]]
+        ).mean(axis=1)
+        for start in range(0, len(left), CHUNK_SIZE)
+    ]
+    return np.concatenate(scores) if scores else np.empty(0)
+
+
+def candidate_pairs(owners, keys):
+    """Пары (i, j), i < j, владельцев, которые делят корзину.
+
+    Корзины больше MAX_BUCKET_SIZE пропускаются. Пары внутри корзин
+    находятся сравнением отсортированных ключей со сдвигом, поэтому
+    цикл идёт по размеру корзины, а не по корзинам.
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, owners = keys[order], owners[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    small = np.repeat((sizes > 1) & (sizes <= MAX_BUCKET_SIZE), sizes)
+    keys, owners = keys[small], owners[small]
+    left, right = [], []
+    for offset in range(1, MAX_BUCKET_SIZE):
+        same = keys[offset:] == keys[:-offset]
+        if not same.any():
+            break
+        left.append(owners[:-offset][same])
+        right.append(owners[offset:][same])
+    if not left:
+        return np.empty((0, 2), dtype=np.int64)
+    left, right = np.concatenate(left), np.concatenate(right)
+    low, high = np.minimum(left, right), np.maximum(left, right)
+    # Пара кодируется одним числом: уникальность по одномерному массиву
+    # намного быстрее, чем по строкам двумерного.
+    base = int(high.max()) + 1
+    codes = np.unique((low * base + high)[low != high])
+    return np.stack([codes // base, codes % base], axis=1)
+
+
+def top_neighbours(sources, targets, scores, limit=SIMILAR_RECIPES):
+    """Не больше limit самых похожих целей для каждого источника.
+
+    При равном сходстве выше новые рецепты (с большим id).
+    """
+    order = np.lexsort((-targets, -scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+    sizes = np.diff(np.r_[starts, len(sources)])
+    keep = np.arange(len(sources)) - np.repeat(starts, sizes) < limit
+    return sources[keep], targets[keep], scores[keep]
+
+
+def similar_rows(sources, targets, scores):
+    return zip(sources.tolist(), targets.tolist(), scores.tolist())
+
+
+def bucket_rows(recipes, keys):
+    return (
+        (pk, key)
+        for pk, row in zip(recipes.tolist(), keys.tolist()) for key in row
+    )
+
+
+def insert_rows(model, fields, rows, batch_size=CHUNK_SIZE):
+    """Вставляет кортежи значений fields пачками, минуя экземпляры модели.
+
+    На PostgreSQL пачка уходит одним COPY, на остальных СУБД — executemany.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in fields
+    )
+    table = quote(model._meta.db_table)
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({", ".join(["%s"] * len(fields))})',
+                    batch
+                )
+
+
+def build_similar(batch_size=CHUNK_SIZE):
+    """Строит корзины LSH и списки похожих для всех рецептов заново.
+
+    Возвращает (рецептов с продуктами, пар-кандидатов, строк похожих).
+    """
+    recipes, signatures = load_signatures(RecipeIngredient.objects.all())
+    keys = band_keys(signatures)
+    pairs = candidate_pairs(
+        np.repeat(np.arange(len(recipes)), BANDS), keys.ravel()
+    )
+    scores = similarity(signatures, pairs[:, 0], pairs[:, 1])
+    sources, targets, scores = top_neighbours(
+        recipes[np.r_[pairs[:, 0], pairs[:, 1]]],
+        recipes[np.r_[pairs[:, 1], pairs[:, 0]]],
+        np.r_[scores, scores],
+    )
+    with transaction.atomic():
+        SimilarityBucket.objects.all().delete()
+        SimilarRecipe.objects.all().delete()
+        insert_rows(
+            SimilarityBucket, ('recipe', 'key'),
+            bucket_rows(recipes, keys), batch_size
+        )
+        insert_rows(
+            SimilarRecipe, ('recipe', 'similar', 'score'),
+            similar_rows(sources, targets, scores), batch_size
+        )
+    return len(recipes), len(pairs), len(sources)
+
+
+def bucket_members(keys):
+    """Строки (рецепт, ключ) корзин keys, кроме слишком больших."""
+    allowed = SimilarityBucket.objects.filter(key__in=keys).values(
+        'key'
+    ).annotate(size=Count('id')).filter(
+        size__lte=MAX_BUCKET_SIZE
+    ).values_list('key', flat=True)
+    return SimilarityBucket.objects.filter(
+        key__in=allowed
+    ).values_list('recipe_id', 'key')
+
+
+def rebuild_lists(recipe_ids):
+    """Пересчитывает списки похожих для recipe_ids по их корзинам."""
+    own = list(SimilarityBucket.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'key'))
+    members = defaultdict(list)
+    for pk, key in bucket_members({key for _, key in own}):
+        members[key].append(pk)
+    pairs = {
+        (source, target)
+        for source, key in own for target in members[key]
+        if source != target
+    }
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    if not pairs:
+        return
+    recipes, signatures = load_signatures(RecipeIngredient.objects.filter(
+        recipe_id__in={pk for pair in pairs for pk in pair}
+    ))
+    pairs = np.array(sorted(pairs), dtype=np.int64)
+    left = np.searchsorted(recipes, pairs[:, 0])
+    right = np.searchsorted(recipes, pairs[:, 1])
+    insert_rows(
+        SimilarRecipe, ('recipe', 'similar', 'score'),
+        similar_rows(*top_neighbours(
+            pairs[:, 0], pairs[:, 1], similarity(signatures, left, right)
+        ))
+    )
+
+
+@task
+def refresh_similar(recipe_ids):
+    """Обновляет корзины рецептов recipe_ids и затронутые списки похожих.
+
+    Кроме самих рецептов пересчитываются списки тех, с кем они делят
+    корзину или у кого они уже были в похожих.
+    """
+    with transaction.atomic():
+        recipes, signatures = load_signatures(
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        )
+        keys = band_keys(signatures)
+        SimilarityBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        insert_rows(
+            SimilarityBucket, ('recipe', 'key'), bucket_rows(recipes, keys)
+        )
+        affected = set(recipe_ids)
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        affected.update(
+            pk for pk, _ in bucket_members(keys.ravel().tolist())
+        )
+        rebuild_lists(sorted(affected))
+
+
+def schedule_refresh(recipe_ids):
+    """Ставит refresh_similar в очередь после коммита транзакции."""
+    if recipe_ids:
+        transaction.on_commit(
+            partial(enqueue, refresh_similar, recipe_ids=list(recipe_ids))
+        )
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Файл ложится в <каталог upload_to>/<первые 2 символа хеша>/<хеш>.<ext>.
+    Повторная загрузка тех же байтов ничего не пишет и возвращает
+    имеющееся имя, поэтому содержимое по ссылке никогда не меняется.
+    Файлы не удаляются при смене картинки: число ссылок на них ведёт
+    MediaBlob, а удаляет осиротевшие команда collect_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        name = posixpath.join(
+            posixpath.dirname(name),
+            digest[:2],
+            digest + os.path.splitext(name)[1].lower(),
+        )
+        try:
+            return super().save(name, content, max_length)
+        except FileExistsError:
+            # Те же байты уже сохранены, возможно, параллельной загрузкой.
+            # Свежее время изменения защищает файл от сборщика, пока
+            # новая ссылка на него ещё не записана в MediaBlob.
+            os.utime(self.path(name))
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        """Имя задаёт содержимое, поэтому суффикс к нему не добавляется.
+
+        Занятое имя значит, что файл уже есть. FileSystemStorage._save
+        открывает файл с O_EXCL и при гонке двух загрузок тоже
+        спрашивает свободное имя; исключение доходит до save().
+        """
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+@deconstructible
+class PrivateStorage(FileSystemStorage):
+    """Хранилище в PRIVATE_MEDIA_ROOT: файлы не раздаются по MEDIA_URL.
+
+    Каталог, как и MEDIA_ROOT у обычного хранилища, берётся из настроек
+    при обращении, поэтому его можно подменить override_settings.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, settings.PRIVATE_MEDIA_ROOT
+        )
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+private_storage = PrivateStorage()
+
+
+def change_references(name, delta):
+    """Атомарно меняет число ссылок на файл name, не ниже нуля.
+
+    Один запрос INSERT ... ON CONFLICT: строка заводится при первой
+    ссылке (или с нулём ссылок для неизвестного файла при отвязке).
+    """
+    if not name:
+        return
+    # Модель берётся из реестра: models импортирует этот модуль.
+    blob = apps.get_model('recipes', 'MediaBlob')._meta
+    quote = connection.ops.quote_name
+    table = quote(blob.db_table)
+    name_column, refcount, updated_at = (
+        quote(blob.get_field(field).column)
+        for field in ('name', 'refcount', 'updated_at')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({name_column}, {refcount}, {updated_at}) '
+            f'VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({name_column}) DO UPDATE SET '
+            f'{refcount} = CASE WHEN {table}.{refcount} + %s < 0 '
+            f'THEN 0 ELSE {table}.{refcount} + %s END, '
+            f'{updated_at} = excluded.{updated_at}',
+            [
+                name,
+                max(delta, 0),
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                delta,
+                delta,
+            ]
+        )
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,53 @@
+import tempfile
+from io import StringIO
+
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from recipes.management.commands.benchmark_api import (
+    FAST_HASHERS, Command, Result, Scenario
+)
+from recipes.shortlinks import hit_buffer
+
+# Меньше нельзя: сценарии с курсором листают ленту на 50 рецептов и
+# подписки на 10 авторов.
+OPTIONS = {
+    'users': 30,
+    'recipes': 300,
+    'ingredients': 100,
+    'seed': 42,
+    'repeat': 1,
+    'only': None,
+}
+
+
+class BenchmarkApiTests(TestCase):
+    """Сценарии бенчмарка укладываются в бюджеты на маленьком наборе."""
+
+    def setUp(self):
+        self.command = Command(stdout=StringIO(), stderr=StringIO())
+
+    def test_scenarios_within_budgets(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                PRIVATE_MEDIA_ROOT=media_root,
+                PASSWORD_HASHERS=FAST_HASHERS,
+                SHORT_LINK_HITS_FLUSH_SIZE=float('inf'),
+                SHORT_LINK_HITS_FLUSH_INTERVAL=float('inf'),
+            ):
+                try:
+                    results = self.command.run(OPTIONS)
+                finally:
+                    hit_buffer.flush()
+        self.command.check_results(results, check_coverage=True)
+
+    def test_errors(self):
+        scenario = Scenario('теги', 'get', None, budget=1)
+        result = Result(scenario, 'api:tags-list', queries=2, statuses={404})
+        with self.assertRaises(CommandError) as error:
+            self.command.check_results([result], check_coverage=True)
+        message = str(error.exception)
+        self.assertIn('теги: 2 запросов при бюджете 1', message)
+        self.assertIn('теги: статус [404], ожидался 200', message)
+        self.assertIn('маршрут api:recipe-list не покрыт сценарием', message)
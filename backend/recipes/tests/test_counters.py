@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Favourite, Recipe, Subscription, User
+
+
+class CountersTests(TestCase):
+    """Денормализованные счётчики: сигналы и пересчёт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.reader = User.objects.create(
+            username='reader', email='reader@example.com'
+        )
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            name='Рецепт',
+            author=self.author,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+
+    def counters(self):
+        self.author.refresh_from_db()
+        self.reader.refresh_from_db()
+        return (
+            self.author.recipes_count,
+            self.author.subscribers_count,
+            self.reader.subscriptions_count,
+        )
+
+    def test_signals(self):
+        recipe = self.create_recipe()
+        self.create_recipe()
+        subscription = Subscription.objects.create(
+            follower=self.reader, author=self.author
+        )
+        favourite = Favourite.objects.create(user=self.reader, recipe=recipe)
+        self.assertEqual(self.counters(), (2, 1, 1))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 1)
+        favourite.delete()
+        subscription.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 0)
+        recipe.delete()
+        self.assertEqual(self.counters(), (1, 0, 0))
+
+    def test_counter_never_negative(self):
+        subscription = Subscription.objects.create(
+            follower=self.reader, author=self.author
+        )
+        User.objects.update(subscriptions_count=0, subscribers_count=0)
+        subscription.delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_recount(self):
+        recipe = self.create_recipe()
+        Favourite.objects.bulk_create([
+            Favourite(user=self.reader, recipe=recipe)
+        ])
+        Subscription.objects.bulk_create([
+            Subscription(follower=self.reader, author=self.author)
+        ])
+        User.objects.update(recipes_count=7)
+        output = StringIO()
+        call_command('recount_counters', stdout=output)
+        output = output.getvalue()
+        self.assertIn('User.recipes_count: исправлено 2', output)
+        self.assertIn('Recipe.favourites_count: исправлено 1', output)
+        self.assertEqual(self.counters(), (1, 1, 1))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 1)
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import (
+    Ingredient, MediaBlob, Recipe, RecipeIngredient, Tag, User
+)
+
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def snapshot():
+    """Рецепты в виде, не зависящем от id."""
+    return sorted(
+        (
+            recipe.name,
+            recipe.author.email,
+            recipe.cooking_time,
+            recipe.created_at,
+            recipe.image.name,
+            tuple(sorted(recipe.tags.values_list('slug', flat=True))),
+            tuple(sorted(recipe.recipe_ingredients.values_list(
+                'ingredient__name', 'amount'
+            ))),
+        )
+        for recipe in Recipe.objects.all()
+    )
+
+
+class ImportExportTests(TestCase):
+    """Выгрузка рецептов в JSONL и загрузка обратно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        Tag.objects.bulk_create((
+            Tag(name='Завтрак', slug='breakfast'),
+            Tag(name='Обед', slug='lunch'),
+        ))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'продукт {pk}', measurement_unit='г')
+            for pk in range(4)
+        )
+        ingredients = list(Ingredient.objects.all())
+        tags = list(Tag.objects.all())
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}',
+                author=cls.author,
+                text='Описание',
+                cooking_time=number + 1,
+                image=f'recipes/image/{number % 2}.png',
+                image_thumbnailed=f'recipes/image/{number % 2}.png',
+                created_at=CREATED_AT + timedelta(hours=number),
+            )
+            recipe.tags.set(tags[:number % 2 + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 10
+                )
+                for ingredient in ingredients[:number % 4 + 1]
+            )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'recipes.jsonl')
+
+    def load(self, lines=None):
+        if lines is not None:
+            with open(self.path, 'w', encoding='UTF-8') as file:
+                file.write('\n'.join(lines) + '\n')
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_recipes', self.path, batch_size=2,
+            stdout=stdout, stderr=stderr
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_round_trip(self):
+        expected = snapshot()
+        call_command(
+            'export_recipes', self.path, batch_size=2, stderr=StringIO()
+        )
+        with open(self.path, encoding='UTF-8') as file:
+            self.assertEqual(len(file.readlines()), 5)
+        Recipe.objects.all().delete()
+        stdout, stderr = self.load()
+        self.assertIn('Загружено рецептов: 5', stdout)
+        self.assertEqual(stderr, '')
+        self.assertEqual(snapshot(), expected)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 5)
+        self.assertEqual(
+            MediaBlob.objects.get(name='recipes/image/0.png').refcount, 3
+        )
+
+    def test_bad_rows(self):
+        row = {
+            'name': 'Новый',
+            'author': 'author@example.com',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': 'recipes/image/0.png',
+            'tags': ['lunch'],
+            'ingredients': [
+                {'name': 'продукт 0', 'measurement_unit': 'г', 'amount': 1}
+            ],
+        }
+        stdout, stderr = self.load([
+            json.dumps(row),
+            json.dumps(dict(row, tags='lunch')),
+            json.dumps(dict(row, tags=['dinner'])),
+            json.dumps(dict(row, author='nobody@example.com')),
+            json.dumps(dict(row, cooking_time=0)),
+            '{"name":',
+        ])
+        self.assertIn('Загружено рецептов: 1', stdout)
+        self.assertIn('пропущено строк: 5', stdout)
+        for number, reason in (
+            (2, 'tags и ingredients должны быть списками'),
+            (3, 'не найдены: dinner'),
+            (4, 'не найдены: nobody@example.com'),
+            (5, 'время приготовления меньше минимального'),
+            (6, 'неверный формат'),
+        ):
+            self.assertIn(f'Строка {number} пропущена: {reason}', stderr)
+        self.assertEqual(Recipe.objects.filter(name='Новый').count(), 1)
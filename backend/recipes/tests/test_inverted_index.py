@@ -0,0 +1,157 @@
+from array import array
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.inverted_index import (
+    RecipeIngredientIndex, contains, from_bitmap, to_bitmap
+)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, User
+
+RECIPES = 70
+# Соль есть во всех рецептах, поэтому её список — битовая карта.
+SALT = 1
+
+
+class BitmapTests(TestCase):
+    """Преобразования между массивом id и битовой картой."""
+
+    def test_round_trip(self):
+        for ids in ([], [0], [1, 7, 8, 63, 64, 1000]):
+            bits = to_bitmap(array('I', ids))
+            self.assertEqual(from_bitmap(bits), ids)
+            self.assertIs(to_bitmap(bits), bits)
+
+    def test_contains(self):
+        ids = array('I', [3, 8, 100])
+        for postings in (ids, to_bitmap(ids)):
+            self.assertTrue(contains(postings, 8))
+            self.assertFalse(contains(postings, 9))
+            self.assertFalse(contains(postings, 101))
+
+
+class RecipeIngredientIndexTests(TestCase):
+    """Поиск по индексу совпадает с составом рецептов в базе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(id=pk, name=f'Продукт {pk}', measurement_unit='г')
+            for pk in range(1, 8)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+            )
+            for pk in range(1, RECIPES + 1)
+        )
+        # Продукт 2 + bit входит в рецепт, если в его id установлен бит.
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=pk, ingredient_id=ingredient, amount=1)
+            for pk in range(1, RECIPES + 1)
+            for ingredient in [SALT] + [
+                2 + bit for bit in range(6) if pk >> bit & 1
+            ]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.index = RecipeIngredientIndex()
+        # Второй экземпляр — индекс другого процесса.
+        self.other = RecipeIngredientIndex()
+        self.other.sync()
+
+    def compositions(self):
+        compositions = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ):
+            compositions.setdefault(recipe_id, set()).add(ingredient_id)
+        return compositions
+
+    def assert_searches(self, index):
+        compositions = self.compositions()
+
+        def matching(condition):
+            return sorted(
+                pk for pk, ingredients in compositions.items()
+                if condition(ingredients)
+            )
+
+        self.assertEqual(index.search(all_of=[2, 3]), (matching(
+            lambda ingredients: {2, 3} <= ingredients
+        ), False))
+        self.assertEqual(index.search(any_of=[6, 7], none_of=[2]), (matching(
+            lambda ingredients: ingredients & {6, 7} and 2 not in ingredients
+        ), False))
+        self.assertEqual(index.search(none_of=[4, 5]), (matching(
+            lambda ingredients: ingredients & {4, 5}
+        ), True))
+        for missing in range(3):
+            self.assertEqual(
+                index.search(have=[SALT, 2, 3], missing=missing),
+                (matching(
+                    lambda ingredients: len(ingredients - {SALT, 2, 3})
+                    <= missing
+                ), False)
+            )
+
+    def change(self):
+        """Добавляет, удаляет и меняет продукты рецептов через ORM."""
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe_id=1, ingredient_id=7, amount=1
+            )
+            RecipeIngredient.objects.filter(
+                recipe_id=3, ingredient_id=2
+            ).delete()
+            RecipeIngredient.objects.filter(
+                recipe_id__in=[5, 40], ingredient_id=SALT
+            ).delete()
+            replaced = RecipeIngredient.objects.get(
+                recipe_id=2, ingredient_id=3
+            )
+            replaced.ingredient_id = 4
+            replaced.save()
+
+    def test_initial_build(self):
+        self.assertIsInstance(self.other.postings[SALT], int)
+        self.assert_searches(self.index)
+
+    def test_changes_through_log(self):
+        generation = self.other.generation
+        self.change()
+        with mock.patch.object(self.other, 'build') as build:
+            self.assert_searches(self.other)
+        build.assert_not_called()
+        self.assertEqual(self.other.generation, generation)
+        # По записи журнала на каждую изменённую строку.
+        self.assertEqual(self.other.sequence, 5)
+        self.assert_searches(self.index)
+
+    def test_reset_rebuilds(self):
+        self.change()
+        self.other.reset()
+        with mock.patch.object(
+            self.other, 'build', wraps=self.other.build
+        ) as build:
+            self.assert_searches(self.other)
+        build.assert_called_once()
+
+    def test_evicted_entry_rebuilds(self):
+        self.change()
+        cache.delete(f'recipe_index:{self.other.generation}:2')
+        with mock.patch.object(
+            self.other, 'build', wraps=self.other.build
+        ) as build:
+            self.assert_searches(self.other)
+        build.assert_called_once()
@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.jobs import claim, enqueue, prune, release_stale, run, task
+from recipes.models import Job
+from recipes.storage import private_storage
+
+PRIVATE_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@task
+def add(left, right):
+    return left + right
+
+
+@task
+def explode():
+    raise RuntimeError('Сбой задачи')
+
+
+def not_registered():
+    pass
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=PRIVATE_MEDIA_ROOT)
+class JobQueueTests(TestCase):
+    """Очередь задач: выдача, повторы, брошенные задачи и очистка."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PRIVATE_MEDIA_ROOT, ignore_errors=True)
+
+    def test_enqueue_requires_registration(self):
+        with self.assertRaises(ValueError):
+            enqueue(not_registered)
+
+    def test_claim_order(self):
+        low = enqueue(add, left=1, right=2)
+        high = enqueue(add, priority=5, left=3, right=4)
+        later = enqueue(add, priority=9, left=0, right=0)
+        Job.objects.filter(pk=later.pk).update(
+            run_after=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(claim().pk, high.pk)
+        job = claim()
+        self.assertEqual(job.pk, low.pk)
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertIsNone(claim())
+
+    def test_success(self):
+        enqueue(add, left=1, right=2)
+        run(claim())
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result), (Job.DONE, 3))
+        self.assertIsNone(job.locked_at)
+
+    def test_retry_until_failed(self):
+        enqueue(explode)
+        for attempt in range(1, 4):
+            with self.assertLogs('recipes.jobs', 'ERROR'):
+                run(claim())
+            job = Job.objects.get()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('Сбой задачи', job.error)
+            if attempt < 3:
+                self.assertEqual(job.status, Job.PENDING)
+                self.assertGreater(job.run_after, timezone.now())
+                Job.objects.update(run_after=timezone.now())
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(claim())
+
+    def test_claim_skips_exhausted(self):
+        enqueue(add, left=1, right=2)
+        Job.objects.update(attempts=3)
+        self.assertIsNone(claim())
+
+    def test_release_stale(self):
+        retried, exhausted, alive = (
+            enqueue(add, left=pk, right=pk) for pk in range(3)
+        )
+        for _ in range(3):
+            claim()
+        Job.objects.filter(pk=exhausted.pk).update(attempts=3)
+        Job.objects.exclude(pk=alive.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(release_stale(), 2)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {
+            retried.pk: Job.PENDING,
+            exhausted.pk: Job.FAILED,
+            alive.pk: Job.RUNNING,
+        })
+
+    def test_released_attempt_not_written(self):
+        enqueue(add, left=1, right=2)
+        job = claim()
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        release_stale()
+        # Вторая попытка уже у другого воркера.
+        claim()
+        run(job)
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+
+    def test_prune(self):
+        name = private_storage.save('shopping_lists/x.txt', ContentFile(b'x'))
+        old = enqueue(add, left=1, right=1)
+        fresh = enqueue(add, left=2, right=2)
+        Job.objects.update(status=Job.DONE, result={'file': name})
+        Job.objects.filter(pk=old.pk).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        self.assertEqual(prune(), 1)
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)), [
+            fresh.pk
+        ])
+        self.assertFalse(private_storage.exists(name))
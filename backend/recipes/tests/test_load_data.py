@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipes.management.commands.load_data import read_json
+from recipes.models import Ingredient, Tag
+
+
+class ReadJsonTests(TestCase):
+    """Потоковое чтение JSON-массива кусками любого размера."""
+
+    def test_small_chunks(self):
+        items = [{'name': 'а, б', 'slug': 'x]'}, [1, 2], 'строка', 3]
+        text = ' [\n' + ',\n'.join(map(json.dumps, items)) + '\n] '
+        for chunk_size in (1, 3, 1 << 16):
+            self.assertEqual(
+                list(read_json(StringIO(text), chunk_size)), items
+            )
+
+    def test_errors(self):
+        for text in ('{"a": 1}', '[{"a": 1}', '[{"a": }]'):
+            with self.assertRaises(ValueError, msg=text):
+                list(read_json(StringIO(text), 4))
+
+
+class LoadDataTests(TestCase):
+    """Идемпотентная загрузка справочников из CSV и JSON."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def load(self, command, name, content, **options):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='UTF-8') as file:
+            file.write(content)
+        stdout, stderr = StringIO(), StringIO()
+        call_command(command, path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_ingredients_csv(self):
+        content = 'мука,г\nсахар,г\nсахар,г\n\nсоль\nмолоко,мл,лишнее\n'
+        stdout, stderr = self.load(
+            'load_data_ingredient', 'ingredients.csv', content, batch_size=2
+        )
+        self.assertIn(
+            'Добавлено 3, обновлено 0, без изменений 1, пропущено 1.', stdout
+        )
+        self.assertIn("['соль'] пропущена", stderr)
+        self.assertEqual(Ingredient.objects.count(), 3)
+        stdout, _ = self.load(
+            'load_data_ingredient', 'ingredients.csv', content
+        )
+        self.assertIn(
+            'Добавлено 0, обновлено 0, без изменений 3, пропущено 1.', stdout
+        )
+
+    def test_tags_json(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Tag.objects.create(name='Обед', slug='lunch')
+        stdout, stderr = self.load('load_data_tags', 'tags.json', json.dumps([
+            {'name': 'Утро', 'slug': 'breakfast'},
+            {'name': 'Обед', 'slug': 'lunch'},
+            {'name': 'Ужин', 'slug': 'dinner'},
+            # Имя занято другим тегом: база отвергнет запись.
+            {'name': 'Обед', 'slug': 'meal'},
+            {'slug': 'brunch'},
+            'snack',
+        ]))
+        self.assertIn(
+            'Добавлено 1, обновлено 1, без изменений 1, пропущено 3.', stdout
+        )
+        self.assertIn('запись не принята базой', stderr)
+        self.assertIn('не хватает полей', stderr)
+        self.assertIn("'snack' пропущена: ожидались поля name, slug", stderr)
+        self.assertEqual(
+            dict(Tag.objects.values_list('slug', 'name')),
+            {'breakfast': 'Утро', 'lunch': 'Обед', 'dinner': 'Ужин'}
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(CommandError):
+            self.load('load_data_tags', 'tags.xml', '')
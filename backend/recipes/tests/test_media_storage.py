@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.models import MediaBlob, Recipe, User
+from recipes.storage import content_storage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = b'image bytes'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+NAME = f'recipes/image/{DIGEST[:2]}/{DIGEST}.png'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    """Картинки по хешу содержимого и учёт ссылок на них."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(MEDIA_ROOT, 'recipes'), ignore_errors=True)
+
+    def create_recipe(self, content=CONTENT):
+        recipe = Recipe(
+            name='Рецепт',
+            author=self.author,
+            text='Описание',
+            cooking_time=10,
+        )
+        recipe.image.save('Photo.PNG', ContentFile(content), save=False)
+        # Копии не строятся: байты картинки ненастоящие.
+        recipe.image_thumbnailed = recipe.image.name
+        recipe.save()
+        return recipe
+
+    def refcount(self, name=NAME):
+        return MediaBlob.objects.get(name=name).refcount
+
+    def test_same_bytes_same_file(self):
+        first, second = self.create_recipe(), self.create_recipe()
+        self.assertEqual(first.image.name, NAME)
+        self.assertEqual(second.image.name, NAME)
+        self.assertEqual(
+            os.listdir(os.path.dirname(content_storage.path(NAME))),
+            [os.path.basename(NAME)]
+        )
+        self.assertEqual(self.refcount(), 2)
+
+    def test_concurrent_upload_keeps_name(self):
+        content_storage.save(NAME, ContentFile(CONTENT))
+        # Параллельная загрузка записала файл между проверкой и записью.
+        with patch.object(
+            content_storage, 'exists', side_effect=[False, True]
+        ):
+            name = content_storage.save('recipes/image/x.png', ContentFile(
+                CONTENT
+            ))
+        self.assertEqual(name, NAME)
+
+    def test_references(self):
+        recipe = self.create_recipe()
+        recipe.image.save('new.png', ContentFile(b'other'), save=False)
+        recipe.image_thumbnailed = recipe.image.name
+        recipe.save()
+        self.assertEqual(self.refcount(), 0)
+        self.assertEqual(self.refcount(recipe.image.name), 1)
+        recipe.delete()
+        self.assertEqual(self.refcount(recipe.image.name), 0)
+
+    def test_collect_media(self):
+        kept = self.create_recipe(b'kept')
+        removed = self.create_recipe()
+        removed.delete()
+        output = StringIO()
+        call_command('collect_media', grace=0, stdout=output)
+        self.assertIn('Удалено картинок: 1', output.getvalue())
+        self.assertFalse(content_storage.exists(NAME))
+        self.assertFalse(MediaBlob.objects.filter(name=NAME).exists())
+        self.assertTrue(content_storage.exists(kept.image.name))
+        self.assertEqual(self.refcount(kept.image.name), 1)
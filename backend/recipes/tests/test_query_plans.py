@@ -0,0 +1,75 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from recipes.management.commands.benchmark_api import Dataset
+from recipes.management.commands.check_query_plans import (
+    Command, explain, hot_queries
+)
+from recipes.models import Recipe
+
+# Узел плана, который ожидается у запроса на SQLite.
+SQLITE_INDEXES = {
+    'recipes list': 'recipe_created_at_id_idx',
+    'recipes by author': 'recipe_author_created_at_idx',
+    'recipes trending': 'recipe_trending_idx',
+    'similar recipes': 'similar_recipe_score_idx',
+}
+
+
+class QueryPlansTests(TestCase):
+    """Горячие запросы идут по индексам, изменения планов ловятся."""
+
+    @classmethod
+    def setUpTestData(cls):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                Dataset(users=20, recipes=300, ingredients=100, seed=42)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.command = Command(stdout=StringIO(), stderr=StringIO())
+
+    def test_indexes_used(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Имена узлов плана заданы для SQLite.')
+        queries = hot_queries()
+        for name, index in SQLITE_INDEXES.items():
+            plan = explain(queries[name])
+            self.assertIn(f'INDEX {index}', plan[0], name)
+
+    def test_changed_plan(self):
+        with tempfile.TemporaryDirectory() as snapshots:
+            path = Path(snapshots) / f'{connection.vendor}.json'
+            with patch(
+                'recipes.management.commands.check_query_plans.SNAPSHOTS_DIR',
+                Path(snapshots)
+            ):
+                self.command.compare_plans({'update': True})
+                self.command.compare_plans({'update': False, 'min_rows': 1})
+                plans = json.loads(path.read_text(encoding='UTF-8'))
+                plans['recipes by author'] = ['SCAN recipes_recipe']
+                path.write_text(json.dumps(plans), encoding='UTF-8')
+                with self.assertRaises(CommandError) as error:
+                    self.command.compare_plans(
+                        {'update': False, 'min_rows': 1}
+                    )
+        self.assertEqual(
+            str(error.exception), 'recipes by author: план изменился'
+        )
+
+    def test_seq_scans(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Имена узлов плана заданы для SQLite.')
+        self.assertEqual(list(self.command.seq_scans([
+            'SCAN recipes_recipe',
+            'SCAN recipes_recipe USING INDEX recipe_trending_idx',
+            'SEARCH recipes_tag USING INTEGER PRIMARY KEY (rowid=?)',
+        ])), [('recipes_recipe', Recipe.objects.count())])
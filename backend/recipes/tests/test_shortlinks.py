@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, override_settings
+
+from api.caches import write_version
+from recipes.models import Recipe, User
+from recipes.shortlinks import (
+    MAX_CODE_LENGTH, MAX_ID, decode_short_code, encode_short_code,
+    hit_buffer, recipe_ids
+)
+
+
+class ShortCodeTests(TestCase):
+    """Кодирование id рецепта в base62 и обратно."""
+
+    def test_round_trip(self):
+        for pk in (0, 1, 9, 61, 62, 3843, 3844, 10 ** 12, MAX_ID):
+            code = encode_short_code(pk)
+            self.assertFalse(code.isdigit(), code)
+            self.assertLessEqual(len(code), MAX_CODE_LENGTH)
+            self.assertEqual(decode_short_code(code), pk)
+
+    def test_invalid(self):
+        for code in ('a-b', 'ё', 'a' * (MAX_CODE_LENGTH + 1), '9' * 11):
+            with self.assertRaises(ValueError, msg=code):
+                decode_short_code(code)
+
+
+@override_settings(
+    SHORT_LINK_HITS_FLUSH_SIZE=2,
+    SHORT_LINK_HITS_FLUSH_INTERVAL=float('inf'),
+)
+class ShortLinkRedirectTests(TestCase):
+    """Переход по короткой ссылке и карта существующих рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.recipe = Recipe.objects.create(
+            id=12345,
+            name='Рецепт',
+            author=author,
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            image_thumbnailed='recipes/image/recipe.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+        hit_buffer.flush()
+
+    def test_redirect_counts_hits(self):
+        code = encode_short_code(self.recipe.pk)
+        for url in (f'/s/{code}/', f'/s/{self.recipe.pk}/'):
+            response = self.client.get(url)
+            self.assertRedirects(
+                response, f'/recipes/{self.recipe.pk}/',
+                fetch_redirect_response=False
+            )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.short_link_hits, 2)
+
+    def test_not_found(self):
+        for url in (
+            f'/s/{encode_short_code(self.recipe.pk + 1)}/',
+            '/s/a-b/',
+            f'/s/{"z" * (MAX_CODE_LENGTH + 1)}/',
+            f'/s/{encode_short_code(MAX_ID + 1)}/',
+            f'/s/{MAX_ID + 1}/',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_get_link(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['short-link'],
+            f'http://testserver/s/{encode_short_code(self.recipe.pk)}/'
+        )
+        response = self.client.get(f'/api/recipes/{MAX_ID + 1}/get-link/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleted_in_other_process(self):
+        self.assertTrue(recipe_ids.exists(self.recipe.pk))
+        # Другой процесс удалил рецепт: локальные сигналы не сработали,
+        # но версия recipe_ids в общем кеше сменилась.
+        Recipe.objects.filter(pk=self.recipe.pk)._raw_delete(DEFAULT_DB_ALIAS)
+        self.assertIn(self.recipe.pk, recipe_ids)
+        write_version('recipe_ids')
+        self.assertFalse(recipe_ids.exists(self.recipe.pk))
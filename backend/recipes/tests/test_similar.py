@@ -0,0 +1,126 @@
+from itertools import combinations
+
+from django.test import TestCase
+
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, SimilarityBucket, SimilarRecipe,
+    User
+)
+from recipes.similar import build_similar, refresh_similar
+
+BASES = 8
+BASE_SIZE = 10
+# Рецепты группы — основа и варианты, где столько продуктов заменено
+# своими, ни у кого больше не встречающимися.
+VARIANTS = (0, 1, 2, 3)
+# Пары с таким сходством Жаккара должны найтись почти все.
+THRESHOLD = 0.5
+
+
+def corpus():
+    """{id рецепта: набор продуктов}: группы похожих рецептов.
+
+    Соседние основы делят 4 продукта из 10 (сходство 0,25), так что
+    между группами тоже есть кандидаты. Последний рецепт — точная копия
+    первого.
+    """
+    recipes, unique = {}, 1000
+    for base in range(BASES):
+        ingredients = list(range(6 * base + 1, 6 * base + 1 + BASE_SIZE))
+        for replaced in VARIANTS:
+            kept = set(ingredients[replaced:])
+            kept.update(range(unique, unique + replaced))
+            unique += replaced
+            recipes[len(recipes) + 1] = kept
+    recipes[len(recipes) + 1] = set(recipes[1])
+    return recipes
+
+
+def jaccard(left, right):
+    return len(left & right) / len(left | right)
+
+
+class SimilarRecipesTests(TestCase):
+    """Похожие рецепты через MinHash и LSH на небольшом наборе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.corpus = corpus()
+        author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(id=pk, name=f'Продукт {pk}', measurement_unit='г')
+            for pk in set().union(*cls.corpus.values())
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=author,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+            )
+            for pk in cls.corpus
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=pk, ingredient_id=ingredient, amount=1)
+            for pk, ingredients in cls.corpus.items()
+            for ingredient in ingredients
+        )
+
+    def similar(self):
+        return {
+            (recipe, similar): score
+            for recipe, similar, score in SimilarRecipe.objects.values_list(
+                'recipe_id', 'similar_id', 'score'
+            )
+        }
+
+    def snapshot(self):
+        return self.similar(), sorted(
+            SimilarityBucket.objects.values_list('recipe_id', 'key')
+        )
+
+    def test_recall(self):
+        recipes, _, rows = build_similar()
+        self.assertEqual(recipes, len(self.corpus))
+        found = self.similar()
+        self.assertEqual(len(found), rows)
+        expected = {
+            pair
+            for left, right in combinations(self.corpus, 2)
+            if jaccard(self.corpus[left], self.corpus[right]) >= THRESHOLD
+            for pair in ((left, right), (right, left))
+        }
+        self.assertGreater(len(expected), 2 * BASES * len(VARIANTS))
+        recall = len(expected & found.keys()) / len(expected)
+        self.assertGreaterEqual(recall, 0.9)
+        for (left, right), score in found.items():
+            self.assertAlmostEqual(
+                score,
+                jaccard(self.corpus[left], self.corpus[right]),
+                delta=0.2
+            )
+
+    def test_identical_sets(self):
+        build_similar()
+        copy = len(self.corpus)
+        self.assertEqual(self.similar()[1, copy], 1.0)
+        self.assertEqual(self.similar()[copy, 1], 1.0)
+
+    def test_refresh_matches_rebuild(self):
+        build_similar()
+        # Рецепт 2 уходит из своей группы в группу рецепта 5.
+        RecipeIngredient.objects.filter(recipe_id=2).delete()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=2, ingredient_id=ingredient, amount=1)
+            for ingredient in self.corpus[5]
+        )
+        refresh_similar(recipe_ids=[2])
+        refreshed = self.snapshot()
+        self.assertEqual(refreshed[0][2, 5], 1.0)
+        self.assertLess(refreshed[0].get((1, 2), 0), THRESHOLD)
+        build_similar()
+        self.assertEqual(refreshed, self.snapshot())
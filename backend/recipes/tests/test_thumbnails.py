@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.models import Recipe, User
+from recipes.thumbnails import (
+    build_thumbnails, thumbnail_name, thumbnail_urls
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+SIZES = {'small': 50, 'medium': 120}
+
+
+def image_file(name='recipe.png', size=(300, 200), mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 10, 10, 128)[:len(mode)]).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_SIZES=SIZES, THUMBNAIL_WORKERS=0
+)
+class ThumbnailsTests(TestCase):
+    """Уменьшенные копии картинок рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def create_recipe(self, image):
+        return Recipe.objects.create(
+            name='Рецепт',
+            author=self.author,
+            text='Описание',
+            cooking_time=10,
+            image=image,
+        )
+
+    def test_built_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(image_file())
+            urls = thumbnail_urls(recipe, 'image')
+            self.assertEqual(urls['small']['webp'], recipe.image.url)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_thumbnailed, recipe.image.name)
+        urls = thumbnail_urls(recipe, 'image')
+        for size, side in SIZES.items():
+            for extension in ('webp', 'jpeg'):
+                name = thumbnail_name(recipe.image.name, side, extension)
+                self.assertEqual(
+                    urls[size][extension], default_storage.url(name)
+                )
+                with default_storage.open(name) as file:
+                    self.assertEqual(
+                        Image.open(file).size, (side, side * 2 // 3)
+                    )
+
+    def test_transparent_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(image_file(mode='RGBA'))
+        name = thumbnail_name(recipe.image.name, SIZES['small'], 'jpeg')
+        with default_storage.open(name) as file:
+            self.assertEqual(Image.open(file).mode, 'RGB')
+        name = thumbnail_name(recipe.image.name, SIZES['small'], 'webp')
+        with default_storage.open(name) as file:
+            self.assertEqual(Image.open(file).mode, 'RGBA')
+
+    def test_stale_task_does_not_mark(self):
+        # Без коммита задачи построения копий не выполняются.
+        recipe = self.create_recipe(image_file())
+        old_name = recipe.image.name
+        recipe.image = image_file(size=(80, 80))
+        recipe.save()
+        # Задача для прежней картинки выполнилась после смены картинки.
+        build_thumbnails(Recipe, recipe.pk, 'image', old_name)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_thumbnailed, '')
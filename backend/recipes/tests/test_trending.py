@@ -0,0 +1,96 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from recipes.models import Favourite, Recipe, ShoppingCart, User
+from recipes.trending import refresh_trending, trending_scores
+
+# Счёт считается по часам: событие в начале часа не затухает.
+NOW = timezone.now().replace(minute=0, second=0, microsecond=0)
+HALF_LIFE = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+
+
+class TrendingTests(APITestCase):
+    """Популярность рецептов с затуханием и сортировка ordering=trending."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(id=pk, username=f'user{pk}', email=f'{pk}@example.com')
+            for pk in range(1, 4)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                id=pk,
+                name=f'Рецепт {pk}',
+                author=users[0],
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                image_thumbnailed='recipes/image/recipe.png',
+            )
+            for pk in range(1, 5)
+        )
+        Favourite.objects.bulk_create((
+            Favourite(user=users[0], recipe_id=1, created_at=NOW),
+            *(
+                Favourite(user=user, recipe_id=3, created_at=NOW - HALF_LIFE)
+                for user in users
+            ),
+            # Старше десяти периодов полураспада: не учитывается.
+            Favourite(
+                user=users[0], recipe_id=4, created_at=NOW - 11 * HALF_LIFE
+            ),
+        ))
+        ShoppingCart.objects.create(user=users[0], recipe_id=2, created_at=NOW)
+
+    def setUp(self):
+        cache.clear()
+
+    def stored(self):
+        return dict(Recipe.objects.values_list('pk', 'trending_score'))
+
+    def test_scores(self):
+        scores = trending_scores(NOW)
+        self.assertEqual(set(scores), {1, 2, 3})
+        self.assertAlmostEqual(scores[1], 1.0)
+        self.assertAlmostEqual(scores[2], 2.0)
+        self.assertAlmostEqual(scores[3], 1.5)
+
+    def test_refresh_writes_only_changes(self):
+        self.assertEqual(refresh_trending(NOW, batch_size=2), 3)
+        self.assertEqual(self.stored(), {1: 1.0, 2: 2.0, 3: 1.5, 4: 0})
+        self.assertEqual(refresh_trending(NOW), 0)
+        Favourite.objects.filter(recipe_id=3).delete()
+        self.assertEqual(refresh_trending(NOW), 1)
+        self.assertEqual(self.stored()[3], 0)
+        # Через полураспад счёт вдвое меньше у всех оставшихся.
+        self.assertEqual(refresh_trending(NOW + HALF_LIFE), 2)
+        self.assertEqual(self.stored(), {1: 0.5, 2: 1.0, 3: 0, 4: 0})
+
+    def test_ordering(self):
+        refresh_trending(NOW)
+        response = self.client.get('/api/recipes/?ordering=trending')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [2, 3, 1, 4]
+        )
+        response = self.client.get('/api/recipes/?ordering=name')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('refresh_trending', stdout=stdout)
+        self.assertIn('Популярность обновлена у 3 рецептов', stdout.getvalue())
+        self.assertEqual(
+            list(Recipe.objects.order_by('-trending_score').values_list(
+                'pk', flat=True
+            )[:3]),
+            [2, 3, 1]
+        )
@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Расширение файла и формат Pillow для каждого варианта.
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+QUALITY = 80
+
+# Отправляется, когда уменьшенные копии картинки записаны и отмечены
+# в модели: кеши с исходной картинкой вместо копий пора сбросить.
+thumbnails_ready = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def thumbnail_name(name, side, extension):
+    """Путь копии: thumbnails/<путь оригинала без расширения>_<сторона>.
+
+    Сторона в пикселях входит в имя, поэтому содержимое по одной ссылке
+    не меняется и при смене THUMBNAIL_SIZES.
+    """
+    return 'thumbnails/{}_{}.{}'.format(
+        os.path.splitext(name)[0], side, extension
+    )
+
+
+def thumbnail_urls(instance, field_name):
+    """Ссылки {размер: {формат: url}} для картинки из поля field_name.
+
+    Пока копии не построены, на их месте отдаётся исходная картинка.
+    """
+    image = getattr(instance, field_name)
+    if not image:
+        return None
+    if getattr(instance, f'{field_name}_thumbnailed') != image.name:
+        return {
+            size: {extension: image.url for extension, _ in FORMATS}
+            for size in settings.THUMBNAIL_SIZES
+        }
+    return {
+        size: {
+            extension: default_storage.url(
+                thumbnail_name(image.name, side, extension)
+            )
+            for extension, _ in FORMATS
+        }
+        for size, side in settings.THUMBNAIL_SIZES.items()
+    }
+
+
+def render_thumbnails(storage, name):
+    """Строит недостающие копии картинки name из storage.
+
+    Копии с тем же именем уже построены по тем же байтам: одинаковые
+    загрузки хранилище сводит к одному файлу.
+    """
+    sides = [
+        side for side in settings.THUMBNAIL_SIZES.values()
+        if not all(
+            default_storage.exists(thumbnail_name(name, side, extension))
+            for extension, _ in FORMATS
+        )
+    ]
+    if not sides:
+        return
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info
+            or image.mode in ('RGBA', 'LA') else 'RGB'
+        )
+    for side in sides:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((side, side), Image.LANCZOS)
+        for extension, image_format in FORMATS:
+            if image_format == 'JPEG' and thumbnail.mode == 'RGBA':
+                flat = Image.new('RGB', thumbnail.size, 'white')
+                flat.paste(thumbnail, mask=thumbnail.getchannel('A'))
+            else:
+                flat = thumbnail
+            buffer = BytesIO()
+            flat.save(buffer, image_format, quality=QUALITY)
+            path = thumbnail_name(name, side, extension)
+            default_storage.delete(path)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def build_thumbnails(model, pk, field_name, name):
+    """Строит копии и отмечает их в записи, если картинка не сменилась."""
+    render_thumbnails(model._meta.get_field(field_name).storage, name)
+    marked = model.objects.filter(pk=pk, **{field_name: name}).update(
+        **{f'{field_name}_thumbnailed': name}
+    )
+    if marked:
+        thumbnails_ready.send(sender=model, pk=pk)
+
+
+def try_build_thumbnails(model, pk, field_name, name):
+    """Ошибка картинки не должна ронять запрос или пул: только в лог."""
+    try:
+        build_thumbnails(model, pk, field_name, name)
+    except Exception:
+        logger.exception('Не удалось построить копии картинки %s', name)
+
+
+def run_in_worker(*task):
+    """Задача пула: соединение потока с базой закрывается после неё.
+
+    Иначе потоки пула держали бы свои соединения открытыми (а на SQLite
+    и блокировки таблиц) до конца процесса.
+    """
+    try:
+        try_build_thumbnails(*task)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def schedule_thumbnails(instance, field_name):
+    """Ставит построение копий в пул после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 копии строятся сразу, в том же потоке.
+    """
+    name = getattr(instance, field_name).name
+    if not name or getattr(instance, f'{field_name}_thumbnailed') == name:
+        return
+    task = (type(instance), instance.pk, field_name, name)
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: try_build_thumbnails(*task))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_worker, *task)
+        )
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from recipes.models import Favourite, Recipe, ShoppingCart
+
+# Вес события: добавление в корзину ближе к «буду готовить».
+WEIGHTS = ((Favourite, 1.0), (ShoppingCart, 2.0))
+# События старше стольких периодов полураспада не учитываются: их
+# вклад меньше 0,1%.
+HALF_LIVES = 10
+
+
+def trending_scores(now=None):
+    """Популярность рецептов на момент now: {id рецепта: счёт}.
+
+    Каждое добавление в избранное или корзину даёт вес, который убывает
+    вдвое за TRENDING_HALF_LIFE. События сгруппированы по рецепту и
+    часу, поэтому возраст учитывается с точностью до часа, а база
+    отдаёт по строке на рецепт и час, а не на событие.
+    """
+    now = now or timezone.now()
+    half_life = settings.TRENDING_HALF_LIFE
+    since = now - timedelta(seconds=half_life * HALF_LIVES)
+    scores = defaultdict(float)
+    for model, weight in WEIGHTS:
+        rows = model.objects.filter(created_at__gt=since).annotate(
+            hour=TruncHour('created_at')
+        ).order_by().values('recipe_id', 'hour').annotate(
+            events=Count('pk')
+        ).values_list('recipe_id', 'hour', 'events')
+        for recipe_id, hour, events in rows.iterator():
+            age = max((now - hour).total_seconds(), 0)
+            scores[recipe_id] += weight * events * 0.5 ** (age / half_life)
+    return scores
+
+
+def refresh_trending(now=None, batch_size=1000):
+    """Записывает популярность в Recipe.trending_score.
+
+    Обновляются только рецепты, чей счёт изменился; рецептам без
+    недавних событий счёт обнуляется. Возвращает число обновлённых.
+    """
+    scores = {
+        pk: round(score, 6) for pk, score in trending_scores(now).items()
+    }
+    with transaction.atomic():
+        stored = dict(Recipe.objects.filter(
+            trending_score__gt=0
+        ).values_list('pk', 'trending_score'))
+        changed = [
+            Recipe(pk=pk, trending_score=scores.get(pk, 0))
+            for pk in stored.keys() | scores.keys()
+            if stored.get(pk, 0) != scores.get(pk, 0)
+        ]
+        Recipe.objects.bulk_update(
+            changed, ['trending_score'], batch_size=batch_size
+        )
+    return len(changed)
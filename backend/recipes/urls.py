@@ -1,6 +1,6 @@
 from django.urls import path
 
-from recipes.views import redirect_short_link
+from recipes.views import redirect_recipe, redirect_short_link
 
 app_name = 'recipes'
 
@@ -8,6 +8,11 @@ app_name = 'recipes'
 urlpatterns = [
     path(
         's/<int:pk>/',
+        redirect_recipe,
+        name='redirect_recipe'
+    ),
+    path(
+        's/<str:code>/',
         redirect_short_link,
         name='redirect_short_link'
     ),
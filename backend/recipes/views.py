@@ -1,11 +1,21 @@
 from django.shortcuts import redirect
 from django.http import Http404
 
-from .models import Recipe
+from .shortlinks import decode_short_code, hit_buffer, recipe_ids
 
 
-def redirect_short_link(request, pk):
+def redirect_short_link(request, code):
     """Перенаправляет на полный URL рецепта."""
-    if not Recipe.objects.filter(id=pk).exists():
+    try:
+        pk = decode_short_code(code)
+    except ValueError:
+        raise Http404(f'Некорректная короткая ссылка {code}.')
+    return redirect_recipe(request, pk)
+
+
+def redirect_recipe(request, pk):
+    """Перенаправляет по старой ссылке вида /s/<id>/."""
+    if not recipe_ids.exists(pk):
         raise Http404(f'Рецепт c id {pk} не найден.')
+    hit_buffer.add(pk)
     return redirect(f'/recipes/{pk}/')